@@ -0,0 +1,3 @@
+"""
+Benchmark suite of the demand forecast pipeline, see benchmarks/run_benchmarks.py
+"""
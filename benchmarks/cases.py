@@ -0,0 +1,130 @@
+"""
+Benchmark cases of the demand forecast pipeline.
+
+Each case is a function taking the scenario of the benchmark and returning the callable to time:
+the preparation done by the case function itself (loading inputs) is not timed.
+Cases are run in the order of CASES, each one uses the scenario files written by the previous ones.
+"""
+
+import collections
+import pathlib as pl
+
+from src.context.prediction_context import PredictionContext
+from src.context.training_context import TrainingContext
+from src.data.mock_data.seed import seed_tables
+from src.demand_forecast.demand_forecast import DemandForecast
+from src.demand_forecast.processing.data_pipeline import DataPipeline
+from src.demand_forecast.processing.feature_engineering import FeatureEng
+from src.services.constant.fields import Fields
+from src.services.filesystem.scenario import Scenario
+from src.services.service_provider import ServiceProviderHandler
+from src.tasks import demand_forecast as tasks
+from src.tasks.stages import Stage
+
+SERVICE = ServiceProviderHandler()
+
+SCENARIO_NAME = "scenario"
+
+
+def get_scenario(workdir: pl.Path) -> Scenario:
+    """Load the scenario of the benchmark, or create it"""
+    if (workdir / SCENARIO_NAME / Scenario.INFO).is_file():
+        return Scenario.load(scenario_path=workdir / SCENARIO_NAME)
+    scenario = Scenario(input_path=str(workdir), name=SCENARIO_NAME, config=SERVICE.config)
+    scenario.save()
+    return scenario
+
+
+def operator_case(operator, context_cls=None):
+    """Case running an Operator of the demand forecast pipeline, then saving the scenario stage"""
+
+    def case(scenario):
+        def run():
+            context = context_cls() if context_cls is not None else None
+            operator(scenario=scenario, stage=get_stage(scenario), context=context)
+            scenario.stage = operator.final_stage.name
+            scenario.save_info()
+
+        return run
+
+    return case
+
+
+def get_stage(scenario: Scenario) -> Stage:
+    """Get the current stage of the scenario as a Stage object"""
+    return scenario.get_stage(scenario.stage) if isinstance(scenario.stage, str) else scenario.stage
+
+
+def seed_case(scenario):
+    """Generate the synthetic dataset in the database"""
+    return seed_tables
+
+
+def run_step_case(scenario):
+    """Run the sales features step of the training data pipeline"""
+    context = TrainingContext()
+    demand_forecast = DemandForecast()
+    pipeline = DataPipeline(scenario=scenario, context=context, scope="training")
+    pipeline.granularity = demand_forecast.granularity
+    pipeline.input_data = demand_forecast.input_data
+    pipeline.pipeline = demand_forecast.pipeline
+    feature = [feature for feature in pipeline.pipeline if feature.id == "sales_features"][0]
+
+    def run():
+        pipeline.run_step(context=context, feature=feature, scope="training", trained_data={})
+
+    return run
+
+
+def _load_aggregated(scenario, data_name: str, **load):
+    """Load and aggregate an input data of the demand forecast for the training scope"""
+    context = TrainingContext()
+    data = [data for data in DemandForecast.input_data if data.name == data_name][0]
+    return data.load_aggregated(context=context, scenario=scenario, scope="training", **load)
+
+
+def pivot_values_case(scenario):
+    """Pivot the weekly sales of the training data"""
+    df = _load_aggregated(scenario, Fields.TRANSACTION_TABLE, start="start_date", end="information_horizon",
+                          columns=[Fields.NB_SOLD_PIECES])
+
+    def run():
+        FeatureEng.pivot_values(df, index=[Fields.PRODUCT_ID, Fields.WEEK], col=[Fields.NB_SOLD_PIECES],
+                                agg="sum")
+
+    return run
+
+
+def encode_data_case(scenario):
+    """Encode the categorical features of the products"""
+    df = _load_aggregated(scenario, Fields.PRODUCT_TABLE, start="start_date", end="information_horizon")
+
+    def run():
+        FeatureEng.encode_data(df, is_training=True, trained=True)
+
+    return run
+
+
+def scenario_compare_case(scenario):
+    """Compare the scenario with itself up to the predictions"""
+    reference = Scenario.load(scenario_path=scenario.location)
+
+    def run():
+        scenario.compare(stage=scenario.get_stage(Stage.PREDICTION_PREDICTED), scenario=reference)
+
+    return run
+
+
+# Cases in order of execution
+CASES = collections.OrderedDict([
+    ("seed", seed_case),
+    ("fetch_training", operator_case(tasks.FETCH_TRAINING_DATA_OPERATOR)),
+    ("train", operator_case(tasks.TRAIN_DEMAND_OPERATOR, TrainingContext)),
+    ("fetch_prediction", operator_case(tasks.FETCH_PREDICTION_DATA_OPERATOR, PredictionContext)),
+    ("predict", operator_case(tasks.PREDICT_DEMAND_OPERATOR, PredictionContext)),
+    ("evaluate", operator_case(tasks.EVALUATE_OPERATOR, PredictionContext)),
+    ("run_step", run_step_case),
+    ("pivot_values", pivot_values_case),
+    ("encode_data", encode_data_case),
+    ("scenario_compare", scenario_compare_case),
+])
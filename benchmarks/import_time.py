@@ -0,0 +1,86 @@
+"""
+Benchmark of the import time of the CLI and the package.
+
+Each target is imported in a new process with `python -X importtime`, the import time is the
+best of several runs. The heavy dependencies (matplotlib, sklearn, xgboost, ...) must be imported
+by the code which uses them, not when the package is imported: a target importing one of them,
+or exceeding its budget, fails the benchmark.
+
+    python -m benchmarks.import_time --repeat 5
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+
+from benchmarks.run_benchmarks import ROOT_DIR
+
+# Modules imported by the targets, and import time budget in seconds
+TARGETS = {
+    "run.py --help": 0.3,
+    "src.tasks.demand_forecast": 1.0,
+    "src.services.service_provider": 1.0,
+}
+
+# Modules which must only be imported when the code using them runs
+HEAVY_MODULES = ["matplotlib", "sklearn", "xgboost", "git", "sqlalchemy", "jinja2"]
+
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_command(target: str) -> list:
+    """Get the command importing a target: a script and its arguments, or a module"""
+    if target.split()[0].endswith(".py"):
+        return [sys.executable, "-X", "importtime"] + target.split()
+    return [sys.executable, "-X", "importtime", "-c", f"import {target}"]
+
+
+def measure(target: str) -> dict:
+    """
+    Import a target in a new process
+
+    :param target: script with its arguments, or module
+    :return: import time in seconds (sum of the top level imports) and heavy modules imported
+    """
+    process = subprocess.run(import_command(target), cwd=str(ROOT_DIR), stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    total_us, imported = 0, set()
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match is None:
+            continue
+        cumulative, indent, module = int(match.group(2)), len(match.group(3)), match.group(4)
+        if indent == 1:
+            total_us += cumulative
+        imported.add(module.split(".")[0])
+    return {"import_time_s": total_us / 1e6, "heavy_modules": sorted(imported.intersection(HEAVY_MODULES))}
+
+
+def main(targets: dict, repeat: int) -> bool:
+    """
+    Measure the import time of the targets and print it
+
+    :param targets: dictionary target: import time budget in seconds
+    :param repeat: number of imports of each target, the best time is kept
+    :return: whether every target is within its budget and imports no heavy module
+    """
+    success = True
+    for target, budget in targets.items():
+        measures = [measure(target) for _ in range(repeat)]
+        import_time = min(measure_["import_time_s"] for measure_ in measures)
+        heavy_modules = measures[0]["heavy_modules"]
+        status = "ok" if import_time <= budget and not heavy_modules else "failed"
+        success &= status == "ok"
+        print(f"{target:<32} {status:<7} {import_time:>7.3f} s (budget {budget:.1f} s)"
+              + (f"  imports {', '.join(heavy_modules)}" if heavy_modules else ""))
+    return success
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Import time of the CLI and the package")
+    PARSER.add_argument("--repeat", type=int, default=3, help="number of imports of each target")
+    PARSER.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS),
+                        help="targets to import")
+    ARGS = PARSER.parse_args()
+    sys.exit(0 if main({target: TARGETS[target] for target in ARGS.targets}, ARGS.repeat) else 1)
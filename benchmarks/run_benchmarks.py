@@ -0,0 +1,208 @@
+"""
+Main script to run the benchmarks of the demand forecast pipeline.
+
+For each scale of benchmarks/scales.yaml, a synthetic dataset is generated with the mock seeder in
+a SQLite data warehouse, then each case of benchmarks/cases.py is run in its own process, so that
+its peak memory is measured independently. Wall time and peak RSS are appended to a JSON history,
+and compared with the last run of the same scale and case.
+
+    python -m benchmarks.run_benchmarks --scales small medium --history benchmarks/history.json
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import pathlib as pl
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+import yaml
+
+BENCHMARKS_DIR = pl.Path(__file__).resolve().parent
+ROOT_DIR = BENCHMARKS_DIR.parent
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of the process, in MB"""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes on Linux
+    return max_rss / 1024 ** 2 if sys.platform == "darwin" else max_rss / 1024
+
+
+def prepare_workdir(workdir: pl.Path, scale: dict) -> None:
+    """
+    Create the working directory of a scale: configs (model config of the repo, infra config of the
+    benchmarks with a SQLite data warehouse in the working directory) and config of the mock data
+
+    :param workdir: working directory of the scale, removed if it exists
+    :param scale: scale factors of the mock data
+    """
+    if workdir.exists():
+        shutil.rmtree(workdir)
+    (workdir / "configs").mkdir(parents=True)
+
+    shutil.copyfile(ROOT_DIR / "configs" / "model_config.yaml", workdir / "configs" / "model_config.yaml")
+    with open(BENCHMARKS_DIR / "configs" / "infra_config.yaml", "r") as stream:
+        infra_config = yaml.safe_load(stream)
+    infra_config["db"]["url"] = f"sqlite:///{workdir / 'warehouse.db'}"
+    with open(workdir / "configs" / "infra_config.yaml", "w") as stream:
+        yaml.safe_dump(infra_config, stream, default_flow_style=False)
+
+    with open(ROOT_DIR / "src" / "data" / "mock_data" / "mock_data" / "transactions_mock_config.yaml",
+              "r") as stream:
+        mock_config = yaml.safe_load(stream)
+    mock_config["scale"] = {"products": scale.get("products", 1), "stores": scale.get("stores", 1)}
+    for key in ("start_date", "end_date", "seasonality"):
+        if key in scale:
+            mock_config[key] = scale[key]
+    with open(workdir / "transactions_mock_config.yaml", "w") as stream:
+        yaml.safe_dump(mock_config, stream, default_flow_style=False)
+
+
+def run_case(case: str, workdir: pl.Path) -> dict:
+    """
+    Run a case in the current process, with the configs of the working directory
+
+    :param case: name of the case
+    :param workdir: working directory of the scale
+    :return: measures of the case
+    """
+    # The configs of the benchmark must be loaded before any module of src reads the config
+    from src.services.config.config_handler import ConfigHandler
+    ConfigHandler(yaml_directory=workdir / "configs")
+
+    from src.data.mock_data import seed
+    seed.MOCK_CONFIG = str(workdir / "transactions_mock_config.yaml")
+
+    from benchmarks.cases import CASES, get_scenario
+
+    scenario = get_scenario(workdir)
+    func = CASES[case](scenario)
+
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    func()
+    wall_time = time.perf_counter() - start
+
+    return {"wall_time_s": round(wall_time, 4), "peak_rss_mb": round(peak_rss_mb(), 1),
+            "rss_before_mb": round(rss_before, 1)}
+
+
+def spawn_case(case: str, workdir: pl.Path) -> dict:
+    """
+    Run a case in a new process
+
+    :return: measures of the case, with its status
+    """
+    process = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run_benchmarks", "--case", case, "--workdir", str(workdir)],
+        cwd=str(ROOT_DIR), stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+    results = [line[len(RESULT_PREFIX):] for line in process.stdout.splitlines()
+               if line.startswith(RESULT_PREFIX)]
+    if process.returncode != 0 or not results:
+        logging.error(f"Case {case} failed:\n{process.stderr[-5000:]}")
+        return {"status": "failed"}
+    return {"status": "ok", **json.loads(results[-1])}
+
+
+def git_hash() -> str:
+    """Get the current commit hash, None outside of a git repository"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=str(ROOT_DIR),
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def last_record(history: list, scale: str, case: str) -> dict:
+    """Get the last successful record of a scale and case in the history"""
+    for record in reversed(history):
+        if record["scale"] == scale and record["case"] == case and record["status"] == "ok":
+            return record
+    return None
+
+
+def main(scales: list, cases: list, history_path: pl.Path, workdir: pl.Path) -> list:
+    """
+    Run the benchmarks, append the results to the history and print them
+
+    :param scales: names of the scales to run
+    :param cases: names of the cases to run (the cases are always run in the order of CASES)
+    :param history_path: path of the JSON history
+    :param workdir: working directory of the benchmarks
+    :return: records of the run
+    """
+    with open(BENCHMARKS_DIR / "scales.yaml", "r") as stream:
+        all_scales = yaml.safe_load(stream)
+    from benchmarks.cases import CASES
+
+    history = json.loads(history_path.read_text()) if history_path.is_file() else []
+    run = {"timestamp": datetime.datetime.now().isoformat(timespec="seconds"), "git_hash": git_hash()}
+
+    records = []
+    for scale in scales:
+        scale_workdir = workdir / scale
+        prepare_workdir(scale_workdir, all_scales[scale])
+        # A case needs the outputs of the previous cases, every case up to the last one requested is run
+        last_case = max(list(CASES).index(case) for case in cases)
+        for case in list(CASES)[:last_case + 1]:
+            record = {**run, "scale": scale, "case": case, **spawn_case(case, scale_workdir)}
+            if case in cases:
+                records.append(record)
+            if record["status"] != "ok":
+                break
+
+    for record in records:
+        previous = last_record(history, record["scale"], record["case"])
+        change = ""
+        if previous is not None and record["status"] == "ok":
+            change = f"{record['wall_time_s'] / max(previous['wall_time_s'], 1e-9):.2f}x previous"
+        print(f"{record['scale']:<8} {record['case']:<18} {record['status']:<7} "
+              f"{record.get('wall_time_s', float('nan')):>10.3f} s "
+              f"{record.get('peak_rss_mb', float('nan')):>9.1f} MB  {change}")
+
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    history_path.write_text(json.dumps(history + records, indent=2))
+    return records
+
+
+def cli_set_up() -> argparse.ArgumentParser:
+    """Set up the CLI of the benchmarks"""
+    from benchmarks.cases import CASES
+
+    parser = argparse.ArgumentParser(description="Benchmarks of the demand forecast pipeline")
+    parser.add_argument("--scales", nargs="+", default=["small"], help="scales of benchmarks/scales.yaml")
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES),
+                        help="cases to measure")
+    parser.add_argument("--history", type=pl.Path, default=BENCHMARKS_DIR / "history.json",
+                        help="JSON file where the results are appended")
+    parser.add_argument("--workdir", type=pl.Path, default=ROOT_DIR / "tmp" / "benchmarks",
+                        help="working directory of the benchmarks")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    return parser
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    ARGS = sys.argv[1:]
+
+    if "--case" in ARGS:
+        # Child process: run a single case
+        PARSER = argparse.ArgumentParser()
+        PARSER.add_argument("--case", required=True)
+        PARSER.add_argument("--workdir", type=pl.Path, required=True)
+        CHILD_ARGS = PARSER.parse_args(ARGS)
+        print(RESULT_PREFIX + json.dumps(run_case(CHILD_ARGS.case, CHILD_ARGS.workdir.resolve())))
+    else:
+        # benchmarks.cases reads the config at import: the configs of the repo are used for the CLI
+        from src.services.config.config_handler import ConfigHandler
+        ConfigHandler(yaml_directory=ROOT_DIR / "configs")
+        PARSED_ARGS = cli_set_up().parse_args(ARGS)
+        main(scales=PARSED_ARGS.scales, cases=PARSED_ARGS.cases, history_path=PARSED_ARGS.history,
+             workdir=PARSED_ARGS.workdir.resolve())
@@ -1,25 +1,31 @@
 """"
 Main script to run demand forecast pipeline
+
+The modules of the pipeline are imported after the CLI is read, so that `python run.py --help`
+doesn't import them. See benchmarks/import_time.py for the import time of the CLI and the package.
 """
 
 import importlib
 import logging
 
-from src.services.filesystem.scenario import Scenario
-from src.services.service_provider import ServiceProviderHandler
 from src.utils.cli import cli_set_up, cli_read
 
 # 1. Set the log
 logging.basicConfig(level=logging.DEBUG)
 
-# 2. Set the Service
-SERVICE = ServiceProviderHandler()
-
-# 3. Set up the CLI
+# 2. Set up the CLI
 parser = cli_set_up()
 
-# 4. Read the CLI
-scenario_path, scenario_name, final_stage = cli_read(parser=parser)
+# 3. Read the CLI
+scenario_path, scenario_name, final_stage, profile = cli_read(parser=parser)
+
+# 4. Set the Service
+from src.services.filesystem.scenario import Scenario
+from src.services.service_provider import ServiceProviderHandler
+
+SERVICE = ServiceProviderHandler()
+if profile:
+    SERVICE.profiler.configure(cprofile=True, tracemalloc=True)
 
 # 5. Instantiate scenario
 if scenario_path is not None:
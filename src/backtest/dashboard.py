@@ -5,7 +5,6 @@ This script generates an HTML report with metrics (in backtest)
 import os
 import pathlib as pl
 
-import matplotlib.pyplot as plt
 import pandas as pd
 
 from src.services.service_provider import ServiceProviderHandler
@@ -48,7 +47,7 @@ class Dashboard():
         self.save_figure(figure=fig, fig_name="sales_evol.png")
 
 
-    def save_figure(self, figure: plt.Figure, fig_name: str):
+    def save_figure(self, figure: "plt.Figure", fig_name: str):
         """
         Save a matplotlib figure
         """
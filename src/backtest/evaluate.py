@@ -83,7 +83,8 @@ class Evaluation:
             DataPipeline.Feature(
                 id="actuals",
                 data_name=Fields.TRANSACTION_TABLE,
-                load={"start": "information_horizon", "end": "end_date"},
+                load={"start": "information_horizon", "end": "end_date",
+                      "columns": [Fields.NB_SOLD_PIECES]},
                 transformer={"transformers": [{"transformer": FeatureEng.rename,
                                                "col": Fields.NB_SOLD_PIECES,
                                                "new_col": "demand_act"},
@@ -131,7 +132,7 @@ class Evaluation:
         Save evaluation DataFrame
         """
         # Define path to save predictions
-        fmt = "csv"
+        fmt = scenario.data_format
         dst = scenario.DEMAND_BACKTEST
         dst = scenario.relpath(path=dst, stage=Stage.PREDICTION_BACKTESTED)
         # Save data
@@ -2,7 +2,6 @@
 This script contains useful function to evaluate predictions
 """
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
@@ -45,10 +44,12 @@ def calculate_smape(x, y):
     return np.sum(np.abs(x - y) / np.sum((x + y) / 2))
 
 
-def plot_metrics(metrics: Metrics) -> plt.Figure:
+def plot_metrics(metrics: Metrics) -> "plt.Figure":
     """
     Plot global metrics
     """
+    import matplotlib.pyplot as plt
+
     fig = plt.figure(figsize=(5, 5))
     ax = fig.add_subplot(1, 1, 1)
     ax.set_xticks([])
@@ -64,10 +65,12 @@ def plot_metrics(metrics: Metrics) -> plt.Figure:
     return fig
 
 
-def plot_sales_evol(df: pd.DataFrame) -> plt.Figure:
+def plot_sales_evol(df: pd.DataFrame) -> "plt.Figure":
     """
     Plot prediction and actual evolution
     """
+    import matplotlib.pyplot as plt
+
     # Aggregate prediction and actual
     df_agg = (
         df
@@ -34,19 +34,16 @@ class MetaContext(ABC):
         self._start_date = None
         self._end_date = None
         self._information_horizon = None
-        self.location_value = SERVICE.config.demand_forecast[name].location.value
-        self.products_value = SERVICE.config.demand_forecast[name].products.value
-        self._location = '(' + ','.join(
-            map(str, SERVICE.config.demand_forecast[name].location.value)) + \
-                         ')' if SERVICE.config.demand_forecast[
-                                    name].location.value is not None else None
-        self._products = '(' + ','.join(
-            map(str, SERVICE.config.demand_forecast[name].products.value)) + \
-                         ')' if SERVICE.config.demand_forecast[
-                                    name].products.value is not None else None
-        self._location_granularity = SERVICE.config.demand_forecast[name].location.granularity
-        self._products_granularity = SERVICE.config.demand_forecast[name].products.granularity
-        self.time_granularity = SERVICE.config.demand_forecast[name].time.granularity
+        context_config = getattr(SERVICE.snapshot, name)
+        self.location_value = context_config.location.value
+        self.products_value = context_config.products.value
+        self._location = '(' + ','.join(map(str, self.location_value)) + ')' \
+            if self.location_value is not None else None
+        self._products = '(' + ','.join(map(str, self.products_value)) + ')' \
+            if self.products_value is not None else None
+        self._location_granularity = context_config.location.granularity
+        self._products_granularity = context_config.products.granularity
+        self.time_granularity = context_config.time.granularity
 
     def __str__(self):
         return self._name
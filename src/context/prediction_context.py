@@ -22,18 +22,19 @@ class PredictionContext(MetaContext):
         super().__init__(PredictionContext.__module_name__)
 
         # Define global parameters
+        config = SERVICE.snapshot
         self._is_training = False
-        self._is_backtest = SERVICE.config.run_info.run_mode == "backtest"
+        self._is_backtest = config.run_mode == "backtest"
         self._information_horizon = pd.to_datetime(
-            SERVICE.config.run_info.information_horizon
+            config.information_horizon
         )
 
         # Define scope parameters
         self._start_date = self.information_horizon - pd.to_timedelta(
-            7 * SERVICE.config.demand_forecast.range_week_sales - 1, unit="days"
+            7 * config.range_week_sales - 1, unit="days"
         )
         self._end_date = self.information_horizon + pd.to_timedelta(
-            7 * SERVICE.config.demand_forecast.prediction_context.time.time_range, unit="days"
+            7 * config.prediction_context.time.time_range, unit="days"
         ) if self.is_backtest else None
 
     def time_index(self, granularity):
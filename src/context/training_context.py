@@ -31,20 +31,21 @@ class TrainingContext(MetaContext):
         super().__init__(TrainingContext.__module_name__)
 
         # Define global parameters
+        config = SERVICE.snapshot
         self._is_training = True
         self._information_horizon = (
-            pd.to_datetime(SERVICE.config.run_info.information_horizon) -
+            pd.to_datetime(config.information_horizon) -
             pd.to_timedelta(
-                7 * SERVICE.config.demand_forecast.training_context.time.time_range, unit="days"
+                7 * config.training_context.time.time_range, unit="days"
             )
         )
 
         # Define scope parameters
         self._start_date = self._information_horizon - pd.to_timedelta(
-            7 * SERVICE.config.demand_forecast.range_week_sales - 1, unit="days"
+            7 * config.range_week_sales - 1, unit="days"
         )
         self._end_date = self._information_horizon + pd.to_timedelta(
-            7 * SERVICE.config.demand_forecast.training_context.time.time_range, unit="days"
+            7 * config.training_context.time.time_range, unit="days"
         )
 
     def time_index(self, granularity):
@@ -0,0 +1,123 @@
+"""
+This script contains the in-process cache of the DataFrames loaded by the data pipeline
+"""
+
+import collections
+import threading
+
+import pandas as pd
+
+from src.services.service_provider import ServiceProviderHandler
+
+SERVICE = ServiceProviderHandler()
+
+
+class DataCache:
+    """
+    Size-bounded LRU cache of DataFrames, scoped to a scenario.
+
+    Entries are evicted, least recently used first, as soon as the total size of the cached
+    DataFrames exceeds max_bytes. Cached DataFrames are copied when they are returned, so that the
+    pipeline steps can't modify the cached entries.
+    """
+
+    # Caches by scenario location
+    _caches = {}
+    _registry_lock = threading.Lock()
+
+    # Default size of the cache if not set in the infra config
+    DEFAULT_MAX_SIZE_MB = 1024
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+    @classmethod
+    def get_cache(cls, scenario) -> "DataCache":
+        """
+        Return the cache of the scenario, created on first access with the size of the infra config
+
+        :param scenario: scenario of the run
+        :return: DataCache object
+        """
+        location = str(scenario.location)
+        with cls._registry_lock:
+            if location not in cls._caches:
+                cache_config = SERVICE.infra_config.get("data_cache") or {}
+                max_size_mb = cache_config.get("max_size_mb", cls.DEFAULT_MAX_SIZE_MB)
+                cls._caches[location] = cls(max_bytes=int(max_size_mb * 1024 ** 2))
+            return cls._caches[location]
+
+    @classmethod
+    def drop_cache(cls, scenario) -> None:
+        """Remove the cache of the scenario"""
+        with cls._registry_lock:
+            cls._caches.pop(str(scenario.location), None)
+
+    @property
+    def enabled(self) -> bool:
+        """return whether the cache can store DataFrames"""
+        return self.max_bytes > 0
+
+    @property
+    def stats(self) -> dict:
+        """return the counters of the cache"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._entries), "size_mb": round(self.nbytes / 1024 ** 2, 2)}
+
+    def get(self, key) -> pd.DataFrame:
+        """
+        Get a copy of the cached DataFrame
+
+        :param key: hashable key of the entry
+        :return: DataFrame, None if the key is not cached
+        """
+        if key is None or not self.enabled:
+            return None
+
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            df, _ = self._entries[key]
+        return df.copy()
+
+    def put(self, key, df: pd.DataFrame) -> bool:
+        """
+        Cache a DataFrame, then evict the least recently used entries to fit in max_bytes.
+        The DataFrame is not copied: it must not be modified in place afterwards.
+
+        :param key: hashable key of the entry
+        :param df: DataFrame to cache
+        :return: whether the DataFrame has been cached
+        """
+        if key is None or not self.enabled:
+            return False
+
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        if nbytes > self.max_bytes:
+            return False
+
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (df, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (__, evicted_bytes) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_bytes
+                self.evictions += 1
+        return True
+
+    def clear(self) -> None:
+        """Remove every entry of the cache"""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
@@ -1,14 +1,23 @@
+import functools
+import hashlib
+import json
 import os
 import pathlib as pl
+import threading
+from typing import Callable, Iterator, Optional
 
 import pandas as pd
-from jinja2 import Template
 
+from src.data.data_fetch.cache import DataCache
 from src.data.mock_data.seed import seed_tables
 from src.demand_forecast.processing.feature_engineering import Agg
+from src.demand_forecast.processing.keys import group_by_keys
+from src.services.constant.fields import Fields
+from src.services.filesystem.partition import PartitionedData
 from src.services.service_provider import ServiceProviderHandler
 from src.tasks.stages import Stage
-from src.utils.func_utils import get_init_column, get_index_from_granularity
+from src.utils.func_utils import get_init_column, get_index_from_granularity, get_data_types, \
+    apply_types
 
 SERVICE = ServiceProviderHandler()
 
@@ -18,6 +27,10 @@ class DataProcess:
     Class to manage Data object.
     """
 
+    # Locks by destination file, so that concurrent loads don't fetch the same file together
+    _fetch_locks = {}
+    _fetch_locks_lock = threading.Lock()
+
     def __init__(self, name: str, data_granularity: dict, granularity: dict, data=None):
         self.name = name
         self.data_granularity = data_granularity
@@ -26,6 +39,7 @@ class DataProcess:
                             granularity in self.data_granularity.keys() if
                             self.granularity[granularity]['value'] is not None]
         self.data_features = None
+        self.data_types = get_data_types(name)
         self._data = data
 
         # Check if the chosen granularity is implemented
@@ -36,53 +50,204 @@ class DataProcess:
                         f"{value} granularity has not been implemented for data {name}")
 
 
-    def fetch_data(self, context, dst: str, fmt: str = "csv") -> pd.DataFrame:
+    def fetch_data(self, context, dst: str, fmt: str = None, partition: str = None,
+                   load: bool = True) -> Optional[pd.DataFrame]:
         """
-        Get transactions DataFrame
+        Get transactions DataFrame. The result of the query is streamed by chunks, written to the
+        destination file as they come, so that the whole result is never held in memory.
+
         :param context: contains information to retrieve data
         :param dst: destination path to write
-        :param fmt: writing format
-        :return: transactions DataFrame filtered
+        :param fmt: writing format, if None it is deduced from the destination extension
+        :param partition: frequency of the date partitions (see `get_partition`). If None, the
+               whole time horizon is fetched and written in a single file
+        :param load: whether the data fetched is read back and returned
+        :return: transactions DataFrame filtered, None if load is False
         """
+        fmt = fmt or pl.Path(dst).suffix[1:]
 
         # Create table if not exist
         seed_tables()
 
+        if partition is not None:
+            self.fetch_partitions(context=context, dst=dst, fmt=fmt, partition=partition)
+
+        else:
+            # A single file replaces the partitions of a previous run
+            SERVICE.fs.partitions(dst, fmt=fmt).reset()
+
+            nb_rows = SERVICE.fs.write_chunks(
+                self.query_chunks(context=context, start=context.start_date, end=context.end_date),
+                dst,
+                fmt=fmt,
+                index=False,
+            )
+            SERVICE.log.debug(f"Data fetched, {nb_rows} rows written")
+
+        if not load:
+            return None
+
+        return SERVICE.fs.read(dst, fmt=fmt, **self.read_types(fmt=fmt))
+
+    def fetch_partitions(self, context, dst: pl.Path, fmt: str, partition: str, start=None,
+                         end=None) -> None:
+        """
+        Fetch the data in date partitions: only the date ranges of the context not covered by the
+        watermark of the partitions are queried, then merged into the partitions.
+        Each partition is queried separately, so that only one partition is held in memory.
+
+        If a shared fetch store is set in the infra config, the missing ranges are fetched into the
+        store first (only the dates the store doesn't cover are queried), then copied from it:
+        the scenarios whose data windows overlap share the fetched data.
+
+        :param context: contains information to retrieve data
+        :param dst: directory of the partitions
+        :param fmt: format of the partitions
+        :param partition: frequency of the partitions
+        :param start: first date to fetch, if None the start date of the context
+        :param end: last date to fetch, if None the end date of the context
+        """
+        partitions = SERVICE.fs.partitions(dst, fmt=fmt)
+        start = pd.Timestamp(context.start_date if start is None else start)
+        end = pd.Timestamp(context.end_date if end is None else end)
+        filters = self.get_query_args(context=context)
+        store = self.get_store(filters=filters, fmt=fmt, partition=partition)
+        if store is not None and pl.Path(store) == pl.Path(dst):
+            store = None
+
+        for range_start, range_end in partitions.missing_ranges(start=start, end=end, freq=partition,
+                                                                filters=filters):
+            if store is None:
+                SERVICE.log.info(f"Fetching {self.name} from {range_start.date()} to {range_end.date()}")
+                self._fetch_range(dst=dst, fmt=fmt, partition=partition, start=range_start, end=range_end,
+                                  filters=filters, period_data=functools.partial(self.query, context))
+                continue
+
+            with SERVICE.fs.partitions(store, fmt=fmt).lock():
+                self.fetch_partitions(context=context, dst=store, fmt=fmt, partition=partition,
+                                      start=range_start, end=range_end)
+                SERVICE.log.info(f"Copying {self.name} from {range_start.date()} to {range_end.date()} "
+                                 f"from the fetch store")
+                self._fetch_range(dst=dst, fmt=fmt, partition=partition, start=range_start, end=range_end,
+                                  filters=filters, period_data=functools.partial(self.read_store, store, fmt))
+
+    def _fetch_range(self, dst: pl.Path, fmt: str, partition: str, start: pd.Timestamp,
+                     end: pd.Timestamp, filters: dict, period_data: Callable) -> None:
+        """
+        Write the data of a date range in the partitions, one partition at a time, then extend the
+        watermark
+
+        :param dst: directory of the partitions
+        :param fmt: format of the partitions
+        :param partition: frequency of the partitions
+        :param start: first date of the range
+        :param end: last date of the range
+        :param filters: filters of the query, stored in the watermark
+        :param period_data: function returning the data between two dates, period_data(start, end)
+        """
+        max_date = None
+        for period in pd.period_range(start=start, end=end, freq=PartitionedData.FREQUENCIES[partition]):
+            period_start = max(start, period.start_time)
+            period_end = min(end, period.end_time.normalize())
+            data = period_data(period_start, period_end)
+            SERVICE.fs.write_partitions(data, dst, start=period_start, end=period_end,
+                                        column=Fields.DATE, freq=partition, fmt=fmt,
+                                        read_kwargs=self.read_types(fmt=fmt), index=False)
+            if len(data):
+                max_date = data[Fields.DATE].max()
+
+        # The watermark is updated once the whole range is written
+        SERVICE.fs.partitions(dst, fmt=fmt).update_watermark(start=start, end=end, column=Fields.DATE,
+                                                             freq=partition, filters=filters,
+                                                             max_date=max_date)
+
+    def query(self, context, start, end) -> pd.DataFrame:
+        """Run the query of the data between two dates, see query_chunks"""
+        return pd.concat(list(self.query_chunks(context=context, start=start, end=end)), ignore_index=True)
+
+    def read_store(self, store: pl.Path, fmt: str, start, end) -> pd.DataFrame:
+        """Read the data between two dates from the partitions of the fetch store"""
+        return SERVICE.fs.read(store, fmt=fmt, filters=[(Fields.DATE, ">=", start), (Fields.DATE, "<=", end)],
+                               **self.read_types(fmt=fmt))
+
+    def get_store(self, filters: dict, fmt: str, partition: str) -> Optional[pl.Path]:
+        """
+        Get the partitions of the data in the shared fetch store of the infra config, named after the
+        data and a hash of its query filters and partition frequency
+
+        :param filters: filters of the query
+        :param fmt: format of the partitions
+        :param partition: frequency of the partitions
+        :return: directory of the partitions in the store, None if there is no store
+        """
+        store_config = SERVICE.infra_config.get("fetch_store") or {}
+        if not store_config.get("path"):
+            return None
+        digest = hashlib.md5(json.dumps([filters, partition], sort_keys=True, default=str).encode("utf8"))
+        return pl.Path(store_config["path"]) / f"{self.name}-{digest.hexdigest()[:16]}.{fmt}"
+
+    def get_query_args(self, context, start=None, end=None) -> dict:
+        """
+        Get the parameters of the query from the context
+
+        :param context: contains information to retrieve data
+        :param start: first date to fetch, if None the time parameters are not returned
+        :param end: last date to fetch
+        :return: dictionary of the query parameters
+        """
+        query_args = {}
+        for granularity in self.granularity:
+            if granularity == "time":
+                if start is None:
+                    continue
+                query_args.update(getattr(context, granularity)(start=start, end=end))
+            else:
+                query_args.update(getattr(context, granularity)())
+        return query_args
+
+    def query_chunks(self, context, start, end) -> Iterator[pd.DataFrame]:
+        """
+        Run the query of the data between two dates, streaming the result by chunks
+
+        :param context: contains information to retrieve data
+        :param start: first date to fetch
+        :param end: last date to fetch
+        :return: generator of DataFrame chunks cleaned
+        """
         # Load query
         # Get query path
         path_query = pl.Path(__file__).resolve().parent / "queries" / f"query_{self.name}.sql"
         query = SERVICE.fs.read(dst=path_query, fmt=path_query.suffix[1:])
 
         # Fill query with parameters
-        query_args = {}
-        for granularity in self.granularity:
-            kwargs = {}
-            if granularity == "time":
-                kwargs = {"start": context.start_date, "end": context.end_date}
-            query_args.update(getattr(context, granularity)(**kwargs))
+        from jinja2 import Template
 
-        query_to_run = Template(query).render(**query_args).strip()
+        query_to_run = Template(query).render(dialect=SERVICE.db.dialect,
+                                              **self.get_query_args(context=context, start=start,
+                                                                    end=end)).strip()
         SERVICE.log.debug(f"Running query \n{query_to_run}")
 
         # Run query
-        data = SERVICE.db.read(sql=query_to_run)
-        SERVICE.log.debug(f"Data loaded, shape is {data.shape}")
+        for chunk in SERVICE.db.read_chunks(sql=query_to_run):
+            SERVICE.log.debug(f"Chunk loaded, shape is {chunk.shape}")
 
-        # Clean data
-        SERVICE.log.debug("Cleaning data")
-        if "time" in self.data_granularity.keys() and "date" in get_init_column(self.data_granularity):
-            data["date"] = pd.to_datetime(data["date"])
+            # Clean data: cast columns with the types of type.yml, so that typed formats keep them
+            yield apply_types(chunk, self.data_types)
 
-        SERVICE.fs.write(
-            data,
-            dst,
-            fmt=fmt,
-            index=False,
-        )
+    def get_partition(self, scenario) -> Optional[str]:
+        """
+        Get the frequency of the date partitions of the fetched data, from the run_param
+        `fetch_partition` of the scenario config. Data without date are never partitioned.
 
-        return data
+        :param scenario: scenario of the run
+        :return: partition frequency, None if the data is fetched in a single file
+        """
+        if not self.has_date:
+            return None
+        return scenario.config.run_param.get("fetch_partition")
 
-    def load(self, context=None, scenario=None, start=None, end=None, scope=None, fmt: str = "csv", **kwargs):
+    def load(self, context=None, scenario=None, start=None, end=None, scope=None, fmt: str = None,
+             columns: list = None, **kwargs):
 
         """
         Get DataFrame :
@@ -94,52 +259,201 @@ class DataProcess:
         :param start: start date of the specific data frame
         :param end: end date of the specific dataframe
         :param scope: training, prediction or evaluation
-        :param fmt: format of the saved dataframe
+        :param fmt: format of the saved dataframe, if None the data format of the scenario is used
+        :param columns: feature columns to load (index columns are always loaded), if None the
+               features of the config are used, or every column when the config has none
 
         :return input dataframe (pd.DataFrame)
 
-        When the data are fetched, the time horizon is the widest as possible
+        When the data are fetched, the time horizon is the widest as possible.
+        When the data are read from the scenario, the column projection and the date range are
+        pushed down into the reader, so only the columns and the rows needed are materialized.
+        Loaded DataFrames are kept in the data cache of the scenario.
         """
         if self._data is None:
 
+            fmt = fmt or scenario.data_format
+            columns = self.get_columns(columns=columns)
+            filters = self.get_date_filters(context=context, start=start, end=end)
             stage_fetched, dst, need_to_be_fetched = self.is_input_file_exists(scope=scope, scenario=scenario,
                                                                                context=context, file_name=self.name,
-                                                                               strict=False)
+                                                                               fmt=fmt, strict=False)
+
+            cache = DataCache.get_cache(scenario)
+            cache_key = None if need_to_be_fetched or kwargs else self.cache_key(stage=stage_fetched, dst=dst,
+                                                                                 filters=filters, columns=columns)
+            data = cache.get(cache_key)
+            if data is not None:
+                SERVICE.log.debug(f"Loading {self.name} from the data cache, stage={stage_fetched}")
+                return data
 
             if need_to_be_fetched:
                 SERVICE.log.info(f"Fetching {self.name} data")
 
-                data = self.fetch_data(
-                    context=context, dst=dst, fmt=fmt
-                )
+                # The fetched data is streamed to the file, then read back as any saved data
+                with self.fetch_lock(dst):
+                    self.fetch_data(
+                        context=context, dst=dst, fmt=fmt, partition=self.get_partition(scenario),
+                        load=False
+                    )
                 SERVICE.log.info(
                     f"Saved {self.name} under {dst}, scenario={str(scenario)}, stage={stage_fetched}")
 
-
-            else:
-                if "time" in self.data_granularity.keys() and "date" in get_init_column(self.data_granularity):
-                    date_parser_args = {
-                        "parse_dates": ["date"],
-                        "date_parser": lambda x: pd.datetime.strptime(x, "%Y-%m-%d")}
-                else:
-                    date_parser_args = {}
-
-                SERVICE.log.info(
-                    f"Loading {self.name} from {dst}, scenario={str(scenario)}, stage={stage_fetched}")
-                data = SERVICE.fs.read(
-                    dst,
-                    fmt=fmt,
-                    **kwargs,
-                    **date_parser_args
-                )
-
-            if "time" in self.data_granularity.keys() and "date" in get_init_column(self.data_granularity):
-                data = data[(data.date <= getattr(context, end)) & (data.date >= getattr(context, start))]
+            SERVICE.log.info(
+                f"Loading {self.name} from {dst}, scenario={str(scenario)}, stage={stage_fetched}")
+            data = SERVICE.fs.read(
+                dst,
+                fmt=fmt,
+                columns=columns,
+                filters=filters,
+                **kwargs,
+                **self.read_types(fmt=fmt, columns=columns)
+            )
+
+            if not kwargs and cache.put(self.cache_key(stage=stage_fetched, dst=dst, filters=filters,
+                                                       columns=columns), data):
+                data = data.copy()
 
             return data
         else:
             return self._data
 
+    def load_aggregated(self, context=None, scenario=None, scope=None, **load_kwargs) -> pd.DataFrame:
+        """
+        Load and aggregate the data (see `load` and `aggregate`).
+        The aggregated DataFrame is kept in the data cache of the scenario, so that the features
+        of the pipelines using the same data, window and granularity don't aggregate it again.
+
+        :param context: input context that contains information to retrieve data
+        :param scenario: input scenario of the run
+        :param scope: training, prediction or evaluation
+        :param load_kwargs: other parameters of `load` (start, end, columns, ...)
+        :return: aggregated DataFrame
+        """
+        if self._data is not None:
+            return self.aggregate(df=self.load(context=context, scenario=scenario, scope=scope,
+                                               **load_kwargs), context=context)
+
+        cache = DataCache.get_cache(scenario)
+        cache_key = self.aggregate_cache_key(context=context, scenario=scenario, scope=scope, **load_kwargs)
+        df = cache.get(cache_key)
+        if df is not None:
+            SERVICE.log.debug(f"Loading aggregated {self.name} from the data cache")
+            return df
+
+        with SERVICE.profiler.profile("load") as record:
+            df = self.load(context=context, scenario=scenario, scope=scope, **load_kwargs)
+            record.rows_out = len(df)
+        with SERVICE.profiler.profile("aggregate", rows_in=len(df)) as record:
+            df = self.aggregate(df=df, context=context)
+            record.rows_out = len(df)
+        if cache.put(cache_key or self.aggregate_cache_key(context=context, scenario=scenario, scope=scope,
+                                                           **load_kwargs), df):
+            df = df.copy()
+        return df
+
+    def cache_key(self, stage: str, dst: pl.Path, filters: list = None, columns: list = None) -> tuple:
+        """
+        Key of the loaded data in the data cache: data name, stage, file version, date window
+        and columns
+
+        :param stage: stage where the data is stored
+        :param dst: path of the file
+        :param filters: date filters of the data
+        :param columns: columns loaded
+        :return: tuple, None if the file doesn't exist
+        """
+        try:
+            stat = SERVICE.fs.stat(dst)
+        except FileNotFoundError:
+            return None
+        window = tuple(value for _, __, value in filters) if filters else None
+        return (self.name, str(stage), str(dst), stat.st_mtime_ns, stat.st_size, window,
+                tuple(columns) if columns is not None else None)
+
+    def aggregate_cache_key(self, context=None, scenario=None, scope=None, start=None, end=None,
+                            fmt: str = None, columns: list = None, **kwargs) -> tuple:
+        """
+        Key of the aggregated data in the data cache: key of the loaded data, granularity and
+        information horizon (used to compute time index)
+
+        :return: tuple, None if the data needs to be fetched
+        """
+        fmt = fmt or scenario.data_format
+        stage_fetched, dst, need_to_be_fetched = self.is_input_file_exists(scope=scope, scenario=scenario,
+                                                                           context=context, file_name=self.name,
+                                                                           fmt=fmt, strict=False)
+        if need_to_be_fetched or kwargs:
+            return None
+
+        load_key = self.cache_key(stage=stage_fetched, dst=dst,
+                                  filters=self.get_date_filters(context=context, start=start, end=end),
+                                  columns=self.get_columns(columns=columns))
+        if load_key is None:
+            return None
+        granularity = tuple(sorted(get_index_from_granularity(self.granularity).items()))
+        return load_key + ("aggregated", granularity, context.information_horizon)
+
+    def get_columns(self, columns: list = None) -> Optional[list]:
+        """
+        Get the columns to load: the index columns of the data and the feature columns.
+
+        :param columns: feature columns, if None the features of the config for this data are used
+        :return: list of columns, None if every column has to be loaded
+        """
+        if columns is None:
+            columns = SERVICE.snapshot.features.get(self.name)
+            if not columns:
+                return None
+
+        index_columns = list(dict.fromkeys(get_init_column(self.data_granularity)))
+        return index_columns + [column for column in columns if column not in index_columns]
+
+    @classmethod
+    def fetch_lock(cls, dst) -> threading.Lock:
+        """Get the lock of the fetch of a destination file"""
+        with cls._fetch_locks_lock:
+            return cls._fetch_locks.setdefault(str(dst), threading.Lock())
+
+    @property
+    def has_date(self) -> bool:
+        """Return whether the data has a date column"""
+        return "time" in self.data_granularity.keys() and \
+            Fields.DATE in get_init_column(self.data_granularity)
+
+    def get_date_filters(self, context, start: str, end: str) -> Optional[list]:
+        """
+        Get the date range predicate of the data, to be pushed down into the reader
+
+        :param context: context of the run, containing the dates
+        :param start: name of the context attribute with the start date
+        :param end: name of the context attribute with the end date
+        :return: list of filters, None if the data has no date
+        """
+        if not self.has_date:
+            return None
+        return [(Fields.DATE, ">=", getattr(context, start)), (Fields.DATE, "<=", getattr(context, end))]
+
+    def read_types(self, fmt: str, columns: list = None) -> dict:
+        """
+        Reader arguments to get typed columns from type.yml.
+        Only csv files need it, parquet and feather files store their schema.
+        :param fmt: format of the file to read
+        :param columns: columns read, None means every column
+        :return: dictionary of arguments to be passed to the reader
+        """
+        if fmt != "csv" or not self.data_types:
+            return {}
+
+        data_types = {column: type_ for column, type_ in self.data_types.items()
+                      if columns is None or column in columns}
+        date_columns = [column for column, type_ in data_types.items() if type_.startswith("datetime")]
+        read_args = {"dtype": {column: type_ for column, type_ in data_types.items()
+                               if column not in date_columns}}
+        if date_columns:
+            read_args["parse_dates"] = date_columns
+        return read_args
+
     def aggregate(self, df, context):
         """
         Aggregate based on index and granularity of the data
@@ -159,13 +473,14 @@ class DataProcess:
                 granularity_item = self.data_granularity[granularity][gran_value]
 
                 if isinstance(granularity_item, Agg):
-                    df[granularity_item.column] = granularity_item.func(df=df, init_column=granularity_item.init_column,
-                                                                        context=context,
-                                                                        granularity=self.granularity[granularity][
-                                                                            'value'])
+                    # assign doesn't modify the input DataFrame, which can be in the data cache
+                    df = df.assign(**{granularity_item.column: granularity_item.func(
+                        df=df, init_column=granularity_item.init_column, context=context,
+                        granularity=self.granularity[granularity]['value'])})
                     df = df.drop(columns=[granularity_item.init_column])
-                    df = df.groupby(self.index_names, as_index=False)[data_features].agg(
-                        granularity_item.agg)
+                    # Grouped by the combined codes of the index, see group_by_keys
+                    df = group_by_keys(df, keys=self.index_names, columns=data_features,
+                                       agg=granularity_item.agg)
 
         return df
 
@@ -180,7 +495,7 @@ class DataProcess:
         return df
 
     @staticmethod
-    def is_input_file_exists(scope, scenario, context, file_name, fmt: str = "csv", strict: bool = True):
+    def is_input_file_exists(scope, scenario, context, file_name, fmt: str = None, strict: bool = True):
         """Check if file needs to be fetched"""
         if scope == "training":
             stage_fetched = Stage.TRAINING_FETCHED
@@ -198,7 +513,8 @@ class DataProcess:
         else:
             data_context = {}
 
-        dst = scenario.relpath(path=file_name + "." + fmt, stage=stage_fetched)
+        fmt = fmt or scenario.data_format
+        dst = scenario.relpath(path=file_name + scenario.DATA_FORMATS[fmt], stage=stage_fetched)
 
         # It needs to be fetched if the file doesn't exist or the context is different
         if data_context:
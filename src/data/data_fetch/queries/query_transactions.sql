@@ -5,5 +5,5 @@ SELECT product_id,
 
 FROM transactions
 
-WHERE date BETWEEN CAST('{{start_date}}' as date) AND CAST('{{end_date}}' as date) {% if products %} AND {{products_name}} in {{products}}{% endif %}
+WHERE {% if dialect == 'sqlite' %}date(date) BETWEEN '{{start_date}}' AND '{{end_date}}'{% else %}date BETWEEN CAST('{{start_date}}' as date) AND CAST('{{end_date}}' as date){% endif %} {% if products %} AND {{products_name}} in {{products}}{% endif %}
     {% if location %} AND {{location_name}} in {{location}}{% endif %}
\ No newline at end of file
@@ -1,3 +1,5 @@
+import threading
+
 import numpy as np
 import pandas as pd
 import yaml
@@ -9,6 +11,43 @@ from src.services.service_provider import ServiceProviderHandler
 SERVICE = ServiceProviderHandler()
 
 
+# Lock of the seeding of the tables
+SEED_LOCK = threading.Lock()
+
+MOCK_CONFIG = "src/data/mock_data/mock_data/transactions_mock_config.yaml"
+
+
+def read_mock_config() -> Box:
+    """
+    Read the config of the mock data generation
+    """
+    with open(MOCK_CONFIG, "r") as stream:
+        return Box(yaml.load(stream, yaml.SafeLoader), default_box=True, default_box_attr=None)
+
+
+def scale_table(df: pd.DataFrame, id_column: str, name_column: str, scale: int) -> pd.DataFrame:
+    """
+    Replicate the rows of a mock table `scale` times, with new ids and names
+
+    :param df: mock table
+    :param id_column: id column of the table
+    :param name_column: unique name column of the table
+    :param scale: number of replicates
+    :return: scaled table
+    """
+    if not scale or scale <= 1:
+        return df
+
+    replicates = []
+    for replicate in range(scale):
+        df_ = df.copy()
+        df_[id_column] = df[id_column] + replicate * df[id_column].max()
+        if replicate > 0:
+            df_[name_column] = df[name_column].astype(str) + f" #{replicate}"
+        replicates.append(df_)
+    return pd.concat(replicates, ignore_index=True)
+
+
 def seed_product_table():
 
     SERVICE.log.info('Create SQL product table')
@@ -22,7 +61,8 @@ def seed_product_table():
     df = pd.read_csv('src/data/mock_data/mock_data/product_mock.csv')
     df["gross_price"] = df.gross_price.apply(
         lambda x: float(x[1:].replace(',', '.')))
-    SERVICE.db.write(df, Fields.PRODUCT_TABLE, if_exists='replace', index=False)
+    df = scale_table(df, Fields.PRODUCT_ID, "product_name", read_mock_config().scale.products)
+    SERVICE.db.bulk_write(df, Fields.PRODUCT_TABLE, if_exists='replace', index=False)
 
 
 def seed_store_table():
@@ -36,7 +76,54 @@ def seed_store_table():
 
     # 2. fill the table with data
     df = pd.read_csv('src/data/mock_data/mock_data/store_mock.csv')
-    SERVICE.db.write(df, Fields.STORE_TABLE, if_exists='replace', index=False)
+    df = scale_table(df, Fields.STORE_ID, "city", read_mock_config().scale.stores)
+    SERVICE.db.bulk_write(df, Fields.STORE_TABLE, if_exists='replace', index=False)
+
+
+def get_seasonality(dates: pd.DatetimeIndex, seasonality: Box) -> np.ndarray:
+    """
+    Multiplicative seasonality of the sales: 1 + amplitude * sin(2 * pi * t / period)
+    for the weekly and yearly periods of the config
+
+    :param dates: dates of the transactions
+    :param seasonality: amplitudes of the weekly and yearly seasonality
+    :return: array of factors, with the dates shape, None if there is no seasonality
+    """
+    weekly = seasonality.weekly or 0
+    yearly = seasonality.yearly or 0
+    if not weekly and not yearly:
+        return None
+
+    return (1 + weekly * np.sin(2 * np.pi * dates.dayofweek.values / 7)) * \
+           (1 + yearly * np.sin(2 * np.pi * dates.dayofyear.values / 365.25))
+
+
+def generate_transactions(product_ids: np.ndarray, store_ids: np.ndarray, dates: pd.DatetimeIndex,
+                          lam: np.ndarray, random_state: np.random.RandomState,
+                          seasonality: np.ndarray = None) -> pd.DataFrame:
+    """
+    Draw the products x stores x dates sales in one shot, from a poisson distribution of
+    parameter lam by product. The rows are ordered by product, store and date.
+
+    :param product_ids: ids of the products
+    :param store_ids: ids of the stores
+    :param dates: dates of the transactions
+    :param lam: poisson parameter of each product
+    :param random_state: random generator
+    :param seasonality: factor of the poisson parameter for each date
+    :return: transactions DataFrame
+    """
+    lam = lam[:, np.newaxis, np.newaxis]
+    if seasonality is not None:
+        lam = lam * seasonality[np.newaxis, np.newaxis, :]
+    shape = (len(product_ids), len(store_ids), len(dates))
+
+    return pd.DataFrame({
+        Fields.PRODUCT_ID: np.repeat(product_ids, len(store_ids) * len(dates)),
+        Fields.STORE_ID: np.tile(np.repeat(store_ids, len(dates)), len(product_ids)),
+        Fields.DATE: np.tile(dates.values, len(product_ids) * len(store_ids)),
+        Fields.NB_SOLD_PIECES: random_state.poisson(lam=np.broadcast_to(lam, shape)).ravel()
+    })
 
 
 def seed_transactions():
@@ -49,51 +136,55 @@ def seed_transactions():
     stores = SERVICE.db.read("""SELECT * FROM stores""")
 
     # read config to generate data
-    with open(
-        "src/data/mock_data/mock_data/transactions_mock_config.yaml", "r"
-    ) as stream:
-        config = Box(yaml.load(stream, yaml.SafeLoader))
+    config = read_mock_config()
 
     # Sales for each product will be generated using a poisson distribution
     # The parameter of the poisson distribution is given randomly generated
-    np.random.seed(42)
-    products['poisson_parameter'] = np.random.uniform(
+    random_state = np.random.RandomState(config.seed or 42)
+    poisson_parameter = random_state.uniform(
         low=0,
         high=5,
         size=len(products)
     )
 
-    # For each day, product sample from the given distribution
-    transactions = []
-    products = products.to_dict('records')
-    stores = stores.to_dict('records')
+    # The sales are drawn by blocks of products, in the order of the products, so that the draws
+    # don't depend on the block size
     dates = pd.date_range(start=config.start_date, end=config.end_date)
+    seasonality = get_seasonality(dates, config.seasonality)
+    product_ids = products[Fields.PRODUCT_ID].values
+    store_ids = stores[Fields.STORE_ID].values
+    block_size = max(1, (config.block_size or 5000000) // max(1, len(store_ids) * len(dates)))
 
-    SERVICE.log.info(f"Creating data for {len(products)} products")
-    for product in products:
-        SERVICE.log.debug(f"Creating data for product {product['product_name']}")
-        for store in stores:
-            transactions.append(
-                pd.DataFrame({
-                    Fields.PRODUCT_ID: product[Fields.PRODUCT_ID],
-                    Fields.STORE_ID: store[Fields.STORE_ID],
-                    Fields.DATE: dates.copy(),
-                    Fields.NB_SOLD_PIECES: np.random.poisson(
-                        lam=product["poisson_parameter"], size=len(dates))
-                })
-            )
-    transactions = pd.concat(transactions)
+    SERVICE.log.info(f"Creating data for {len(products)} products, {len(stores)} stores "
+                     f"and {len(dates)} days")
+    nb_transactions = 0
+    for block_start in range(0, len(product_ids), block_size):
+        block = slice(block_start, block_start + block_size)
+        transactions = generate_transactions(product_ids[block], store_ids, dates,
+                                             lam=poisson_parameter[block], random_state=random_state,
+                                             seasonality=seasonality)
 
-    # Save the table using odo (adapted to large size tables)
-    SERVICE.log.info(f"Transactions table contains {len(transactions)} entries")
-    SERVICE.log.info("Saving transaction table")
+        # Save the table with a bulk load (COPY on postgres, adapted to large size tables)
+        SERVICE.log.debug(f"Saving {len(transactions)} transactions")
+        SERVICE.db.bulk_write(transactions, Fields.TRANSACTION_TABLE,
+                              if_exists='replace' if block_start == 0 else 'append', index=False)
+        nb_transactions += len(transactions)
 
-    SERVICE.db.write(transactions, Fields.TRANSACTION_TABLE, if_exists='replace', index=False)
+    SERVICE.log.info(f"Transactions table contains {nb_transactions} entries")
 
 
 def seed_tables():
     """
-    Main method to fill DataBase with mock_data
+    Main method to fill DataBase with mock_data.
+    Concurrent calls (i.e from operators running together) seed the tables once.
+    """
+    with SEED_LOCK:
+        _seed_tables()
+
+
+def _seed_tables():
+    """
+    Seed the tables which don't exist
     """
 
     # 1. seed product table
@@ -2,7 +2,8 @@
 Script containing main demand forecast module to perform training and prediction
 """
 
-from typing import Tuple, Optional
+import itertools
+from typing import Iterator, Tuple, Optional
 
 import pandas as pd
 
@@ -16,7 +17,11 @@ from src.services.constant.fields import Fields
 from src.services.service_provider import ServiceProviderHandler
 from src.tasks.stages import Stage
 from src.utils.func_utils import filter_target, transform_date
+from src.utils.parallel import run_parallel
 from .ml_model.demand_ml_model import DemandMLModel
+from .ml_model.feature_matrix import compact_dtypes
+from .ml_model.models.model import ModelUnpickler
+from .ml_model.search import HyperparameterSearch
 from .params.module_params import DemandParams
 from .processing.feature_engineering import FeatureEng, Map, Agg
 
@@ -57,7 +62,9 @@ class DemandForecast:
 
         # Instantiate demand forecast machine learning chosen among factory
         self.ml_model = DemandMLModel(
-            name=self.params.model_name, params=self.params.model_params
+            name=self.params.model_name, params=self.params.model_params,
+            entry_point=self.params.model_entry_point, n_threads=self.params.model_threads,
+            matrix_format=self.params.model_matrix
         )
 
         # Define granularity for the model
@@ -86,7 +93,8 @@ class DemandForecast:
             DataPipeline.Feature(
                 id="target",
                 data_name="transactions",
-                load={"start": "information_horizon", "end": "end_date"},
+                load={"start": "information_horizon", "end": "end_date",
+                      "columns": [self.params.target]},
                 filter={"func": filter_target, "level": self.params.min_sales},
                 scope=["training"]
 
@@ -106,16 +114,13 @@ class DemandForecast:
             DataPipeline.Feature(
                 id="sales_features",
                 data_name=Fields.TRANSACTION_TABLE,
-                load={"start": "start_date", "end": "information_horizon"},
-                transformer={"transformers": [{"transformer": FeatureEng.pivot_values,
+                load={"start": "start_date", "end": "information_horizon",
+                      "columns": [Fields.NB_SOLD_PIECES]},
+                transformer={"transformers": [{"transformer": FeatureEng.pivot_with_totals,
                                                "index": [Fields.PRODUCT_ID, Fields.WEEK],
                                                "col": [Fields.NB_SOLD_PIECES],
-                                               "agg": "sum"},
-                                              {"transformer": FeatureEng.agg_value,
-                                               "index": [Fields.PRODUCT_ID],
-                                               "col": [Fields.NB_SOLD_PIECES],
                                                "agg": "sum"}],
-                             "type": "parallel"},
+                             "type": "series"},
                 scope=["training", "prediction"]
             )
         ]
@@ -152,26 +157,62 @@ class DemandForecast:
         self.save_data(data=data_train, scenario=scenario, context=train_context)
 
         # 8. Split training data
-        _, x_train, y_train = self.split_dataset(data=data_train,
-                                                 index=training_pipeline.index_names,
-                                                 context=train_context)
-
-        # 9. Train model
-        self.ml_model.fit(x_train, y_train)
+        scope, x_train, y_train = self.split_dataset(data=data_train,
+                                                     index=training_pipeline.index_names,
+                                                     context=train_context)
+        # The training data is saved: only the compact features are kept in memory
+        del data_train
+
+        # 9. Search the parameters of the model if enabled, the rows are split in time by the
+        # time_series splitter of the cross validation
+        dates = scope[Fields.WEEK] if Fields.WEEK in scope else None
+        search = HyperparameterSearch.from_config(ml_model=self.ml_model)
+        if search is not None:
+            self.search_params(search=search, x_train=x_train, y_train=y_train, dates=dates,
+                               scenario=scenario)
+
+        # 10. Train model
+        self.ml_model.fit(x_train, y_train, dates=dates)
+
+        # 11. Save the metrics of the cross validation
+        if self.ml_model.cv_metrics is not None:
+            self.save_cv_metrics(scenario=scenario)
+
+    def search_params(self, search: HyperparameterSearch, x_train: pd.DataFrame, y_train: pd.Series,
+                      dates: Optional[pd.Series], scenario: Scenario) -> None:
+        """
+        Search the parameters of the model, then use the best ones: they are written in the config
+        of the scenario, and the trials are saved with the trained model
 
-    def predict(self, prediction_context: PredictionContext, scenario: "Scenario") -> pd.DataFrame:
+        :param search: hyperparameter search of the model
+        :param x_train: training data
+        :param y_train: target data
+        :param dates: time of the rows
+        :param scenario: input scenario
         """
-        Main method to predict demand with previously trained model
+        result = search.run(x_train, y_train, dates=dates)
+        params = {**self.ml_model.params, **result["best_params"]}
+        SERVICE.log.info(f"Best parameters of {self.ml_model.name}: {params}")
+        self.ml_model = DemandMLModel(name=self.ml_model.name, params=params,
+                                      entry_point=self.params.model_entry_point,
+                                      n_threads=self.params.model_threads,
+                                      matrix_format=self.params.model_matrix)
+
+        dst = scenario.relpath(path=scenario.SEARCH, stage=Stage.TRAINING_TRAINED)
+        SERVICE.fs.write(result, dst, fmt="yaml")
+        scenario.output["search"] = {key: result[key] for key in ("metric", "best_score", "best_params")}
+        scenario.update_config({"demand_forecast.model.params": params})
+
+    def prediction_pipeline(self, prediction_context: PredictionContext,
+                            scenario: "Scenario") -> DataPipeline:
+        """
+        Set the data pipeline of the prediction, its index is all combinations of the products,
+        stores and weeks of the prediction context
 
-        :param pred_context: context of the prediction containing scope information
+        :param prediction_context: context of the prediction containing scope information
         :param scenario: input scenario of the run
-        :return: DataFrame containing demand prediction
+        :return: prediction data pipeline
         """
-        SERVICE.log.info(f"Predicting with demand module")
-
-        # 0. Check that ML model is already fitted
-        assert self.ml_model.is_fitted, "Demand ML model is not yet fitted"
-
         # 1. Set prediction data pipeline
         prediction_pipeline = DataPipeline(scenario=scenario, context=prediction_context,
                                            scope="prediction")
@@ -218,6 +259,25 @@ class DemandForecast:
             scope=["prediction"]
         )}, "from": "data"}
 
+        return prediction_pipeline
+
+    def predict(self, prediction_context: PredictionContext, scenario: "Scenario") -> pd.DataFrame:
+        """
+        Main method to predict demand with previously trained model
+
+        :param pred_context: context of the prediction containing scope information
+        :param scenario: input scenario of the run
+        :return: DataFrame containing demand prediction
+        """
+        SERVICE.log.info(f"Predicting with demand module")
+
+        # 0. Check that ML model is already fitted
+        assert self.ml_model.is_fitted, "Demand ML model is not yet fitted"
+
+        # 1. - 6. Set prediction data pipeline
+        prediction_pipeline = self.prediction_pipeline(prediction_context=prediction_context,
+                                                       scenario=scenario)
+
         # 7. Run the data processing pipeline
         self.trained_data, data_pred = prediction_pipeline.run(scope="prediction",
                                                                trained_data=self.trained_data)
@@ -240,12 +300,65 @@ class DemandForecast:
 
         return df_demand
 
+    def predict_chunks(self, prediction_context: PredictionContext, scenario: "Scenario",
+                       chunk_size: int, workers: int = 1) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Predict demand by chunks of rows of the prediction index: the features of each chunk are
+        built, then predicted. The chunks of a wave of `workers` chunks are predicted concurrently
+        with the executor of the parallel infra config (a process executor gets a copy of the model
+        for each chunk), so that at most `workers` chunks are in memory.
+
+        :param prediction_context: context of the prediction containing scope information
+        :param scenario: input scenario of the run
+        :param chunk_size: number of rows of the prediction index by chunk
+        :param workers: number of chunks predicted concurrently
+        :return: iterator of the prediction data and the demand prediction of each chunk, in the
+                 order of the prediction index
+        """
+        SERVICE.log.info(f"Predicting with demand module by chunks of {chunk_size} rows")
+        assert self.ml_model.is_fitted, "Demand ML model is not yet fitted"
+
+        prediction_pipeline = self.prediction_pipeline(prediction_context=prediction_context,
+                                                       scenario=scenario)
+        self.trained_data, chunks = prediction_pipeline.run_chunks(scope="prediction", chunk_size=chunk_size,
+                                                                   trained_data=self.trained_data)
+        nb_rows = 0
+        while True:
+            wave = list(itertools.islice(chunks, max(1, workers)))
+            if not wave:
+                break
+            predictions = run_parallel(self.predict_chunk, [
+                {"data_pred": data_pred, "index": prediction_pipeline.index_names,
+                 "prediction_context": prediction_context} for data_pred in wave], max_workers=workers)
+            for data_pred, df_demand in zip(wave, predictions):
+                nb_rows += len(df_demand)
+                yield data_pred, df_demand
+
+        # Sanity check
+        assert nb_rows == len(prediction_pipeline.index_builder), (
+            f"shape is not the same : demand {nb_rows}, scope {len(prediction_pipeline.index_builder)}"
+        )
+
+    def predict_chunk(self, data_pred: pd.DataFrame, index: list,
+                      prediction_context: PredictionContext) -> pd.DataFrame:
+        """
+        Predict demand of a chunk of the prediction data
+
+        :param data_pred: prediction data of the chunk, its target is removed
+        :param index: index names of the prediction pipeline
+        :param prediction_context: context of the prediction
+        :return: DataFrame containing demand prediction of the chunk
+        """
+        x_scope, x_pred = self.split_dataset(data=data_pred, index=index, context=prediction_context)
+        return pd.concat([x_scope, pd.DataFrame({"demand": self.ml_model.predict(x_pred)})], axis=1)
+
     @staticmethod
     def split_dataset(
             data: pd.DataFrame, index: list, context: MetaContext
     ) -> Tuple[pd.DataFrame, pd.DataFrame, Optional[pd.Series]]:
         """
-        Split whole DataFrame in scope, features and target
+        Split whole DataFrame in scope, features and target.
+        The features are downcast to compact types, see compact_dtypes
         """
         SERVICE.log.info(
             f"Splitting DataFrame into scope, features and target")
@@ -254,13 +367,14 @@ class DemandForecast:
         # Getting target in training mode
         if isinstance(context, PredictionContext):
             try:
-                target = data.pop(SERVICE.config.demand_forecast.target)
+                target = data.pop(SERVICE.snapshot.target)
             except KeyError:
                 pass
         else:
-            target = data.pop(SERVICE.config.demand_forecast.target)
+            target = data.pop(SERVICE.snapshot.target)
 
-        features = data.drop([Fields.PRODUCT_ID], axis=1)
+        # Downcast before dropping, so that only the compact columns are copied
+        features = compact_dtypes(data).drop([Fields.PRODUCT_ID], axis=1)
 
         if isinstance(context, TrainingContext):
             return scope, features, target
@@ -290,6 +404,17 @@ class DemandForecast:
 
         SERVICE.log.info(f"Sanity check passed !")
 
+    def save_cv_metrics(self, scenario: Scenario) -> None:
+        """
+        Save the metrics of the cross validation by fold with the trained model, and their mean in
+        the output of the scenario
+        """
+        dst = scenario.relpath(path=scenario.CV_METRICS, stage=Stage.TRAINING_TRAINED)
+        SERVICE.log.info(f"Saving cross-validation metrics under {dst}")
+        SERVICE.fs.write(self.ml_model.cv_metrics, dst, fmt="yaml")
+        scenario.output["cross_validation"] = {key: self.ml_model.cv_metrics[key]
+                                               for key in ("splitter", "Bias", "Smape")}
+
     def save_cls(self, scenario: Scenario) -> None:
         """Save module class"""
 
@@ -327,9 +452,11 @@ class DemandForecast:
         src = scenario.relpath(path=file_name, stage=stage)
 
         # obj = cls()
+        # The models pickled by the previous versions are resolved by ModelUnpickler
         obj = SERVICE.fs.read(
             src,
             fmt=fmt,
+            unpickler=ModelUnpickler,
         )
 
         obj.context = context
@@ -341,7 +468,7 @@ class DemandForecast:
     def save_predictions(self, df: pd.DataFrame, scenario: "Scenario") -> None:
         """Save DataFrame as csv file"""
         # Define path to save predictions
-        fmt = "csv"
+        fmt = scenario.data_format
         dst = scenario.DEMAND_PREDICTION
 
         # Save data
@@ -357,20 +484,40 @@ class DemandForecast:
         )
 
         # Needed for the backtesting
+        self.copy_predictions_for_backtest(src=dst_path, scenario=scenario)
+
+    def save_prediction_chunks(self, chunks: Iterator[Tuple[pd.DataFrame, pd.DataFrame]],
+                               scenario: "Scenario") -> None:
+        """
+        Save the prediction data and the predictions of each chunk as they come, see predict_chunks
+        """
+        fmt = scenario.data_format
+        dst = scenario.DEMAND_PREDICTION
+
+        SERVICE.log.info(
+            f"Saving {self.__class__.__name__} predictions by chunks under {dst}")
+
+        data_path = scenario.relpath(path=scenario.DATA_INPUT, stage=Stage.PREDICTION_PREPROCESSED)
+        dst_path = scenario.relpath(path=dst, stage=Stage.PREDICTION_PREDICTED)
+        nb_rows = SERVICE.fs.write_chunks_many(chunks, [data_path, dst_path], fmt=fmt, index=False)
+        SERVICE.log.info(f"{nb_rows[1]} predictions saved")
+
+        # Needed for the backtesting
+        self.copy_predictions_for_backtest(src=dst_path, scenario=scenario)
+
+    @staticmethod
+    def copy_predictions_for_backtest(src, scenario: "Scenario") -> None:
+        """Copy the predictions file with the backtesting data, in backtest mode"""
         if SERVICE.config.run_info.run_mode == "backtest":
-            dst_path = scenario.relpath(path=dst, stage=Stage.PREDICTION_BACKTESTINGFETCHED)
-            SERVICE.fs.write(
-                df,
-                dst_path,
-                fmt=fmt,
-                index=False,
-            )
+            dst_path = scenario.relpath(path=scenario.DEMAND_PREDICTION,
+                                        stage=Stage.PREDICTION_BACKTESTINGFETCHED)
+            SERVICE.fs.copy(src, dst_path)
 
     @classmethod
     def load_predictions(cls, scenario: "Scenario") -> pd.DataFrame:
         """Load predictions previously saved"""
         # Define path to load predictions
-        fmt = "csv"
+        fmt = scenario.data_format
         file_name = scenario.DEMAND_PREDICTION
 
         # Load predictions
@@ -388,7 +535,7 @@ class DemandForecast:
     def save_data(self, data: pd.DataFrame, scenario: "Scenario", context: "MetaContext") -> None:
         """Save features data in training or prediction"""
         # Define path to save data
-        fmt = "csv"
+        fmt = scenario.data_format
         dst = scenario.DATA_INPUT
         stage = (Stage.TRAINING_PREPROCESSED if context.name == 'training_context'
                  else Stage.PREDICTION_PREPROCESSED)
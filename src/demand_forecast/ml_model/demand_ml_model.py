@@ -2,34 +2,53 @@
 This script contains machine learning models factory for demand forecast module
 """
 
+import contextlib
+import time
+from typing import Union
+
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import KFold
 
 from src.backtest.utils import calculate_bias, calculate_smape
 from src.services.service_provider import ServiceProviderHandler
+from src.utils.parallel import available_cores, get_parallel_config
+from .feature_matrix import nbytes, to_matrix
 from .models.model import MetaModel
 
 SERVICE = ServiceProviderHandler()
 
+CV_SPLITTERS = ["kfold", "time_series"]
+# joblib backend of each executor of the parallel infra config
+JOBLIB_BACKENDS = {"thread": "threading", "process": "loky"}
+
 
 class DemandMLModel:
     """
     Class allowing to train and predict demand with a machine learning model
     """
 
-    def __init__(self, name: str, params: dict):
+    def __init__(self, name: str, params: dict, entry_point: str = None, n_threads: int = None,
+                 matrix_format: str = "dense"):
+        """
+        :param name: name of the model in configuration, see MetaModel
+        :param params: parameters of the model
+        :param entry_point: "module:class" of the model, if it isn't registered under its name
+        :param n_threads: number of threads of the model, if None the number of cores available.
+        Not used if the threads are set in the parameters of the model
+        :param matrix_format: format of the feature matrix given to the model, dense or sparse
+        """
         super().__init__()
 
         # Input
         self.name = name
         self.params = params
+        self.matrix_format = matrix_format
 
-        # instantiate the model
-        try:
-            self.model = getattr(MetaModel, self.name)(**self.params)
-        except KeyError:
-            raise ValueError(f"model_name {self.name} is not yet supported")
+        # instantiate the model, the threads set by the parameter of its backend
+        self.model_cls = MetaModel.get(self.name, entry_point=entry_point)
+        self.n_threads = int(n_threads or available_cores())
+        self.threads_param = MetaModel.threads_param(self.model_cls)
+        self.model = self.build_model()
 
         # Cross-validation
         self.use_cross_val = bool(
@@ -37,25 +56,79 @@ class DemandMLModel:
         )
         self.nb_folds = int(SERVICE.config.run_param.nb_folds) \
             if self.use_cross_val else None
+        self.cv_splitter = SERVICE.config.run_param.get("cv_splitter") or "kfold"
+        self.cv_metrics = None  # metrics of the cross validation
 
         self.columns = None  # column used when training the model
         self.is_fitted = False  # to check if model is fitted
 
-    def fit(self, x_train: pd.DataFrame, target: pd.Series):
+    def __setstate__(self, state: dict):
+        """
+        Restore a pickled model. The attributes added since the models pickled by the previous
+        versions are set to their defaults, so that these models still predict.
+        """
+        self.__dict__.update(state)
+        if "model_cls" not in state:
+            self.model_cls = type(self.model)
+        if "threads_param" not in state:
+            self.threads_param = MetaModel.threads_param(self.model_cls)
+        if "n_threads" not in state:
+            self.n_threads = available_cores()
+        self.__dict__.setdefault("matrix_format", "dense")
+        self.__dict__.setdefault("cv_splitter", "kfold")
+        self.__dict__.setdefault("cv_metrics", None)
+
+    def build_model(self, params: dict = None, n_workers: int = 1):
+        """
+        Instantiate an unfitted model
+
+        :param params: parameters of the model, if None the parameters of the DemandMLModel
+        :param n_workers: number of models fitted at the same time, sharing the threads
+        :return: the model, its threads set unless the parameters set them
+        """
+        params = dict(self.params if params is None else params)
+        if self.threads_param is not None:
+            params.setdefault(self.threads_param, max(1, self.n_threads // n_workers))
+        return self.model_cls(**params)
+
+    def fold_threads(self, n_workers: int):
+        """Get the threads of a model fitted in a worker, to limit with threadpoolctl in fit_fold
+        (None if they are set by the parameters of the model)"""
+        if self.threads_param is not None:
+            return None
+        return max(1, self.n_threads // n_workers)
+
+    @staticmethod
+    def get_n_workers(n_tasks: int) -> int:
+        """Get the number of workers to run tasks concurrently, from the parallel infra config"""
+        parallel_config = get_parallel_config()
+        if parallel_config["executor"] == "serial":
+            return 1
+        return max(1, min(n_tasks, parallel_config["max_workers"]))
+
+    def fit(self, x_train: pd.DataFrame, target: pd.Series, dates: pd.Series = None):
         """
         Train machine learning model
+
+        :param x_train: training data
+        :param target: target data
+        :param dates: time of the rows (i.e week), used by the time_series splitter of the cross
+        validation
         """
         SERVICE.log.info(f"Training of model {self.name}")
 
-        features = x_train.copy()
-        self.columns = list(features.columns)
+        # The feature matrix is shared by the cross validation and the training
+        self.columns = list(x_train.columns)
+        features = to_matrix(x_train, matrix_format=self.matrix_format)
+        SERVICE.log.info(f"Training set shape is {features.shape}, "
+                         f"{nbytes(features) / 1024 ** 2:.1f} MB {self.matrix_format} matrix")
 
         if self.use_cross_val:
-            self.cross_validate(features, target)
+            self.cross_validate(features, target, dates=dates)
 
         # Training model
-        SERVICE.log.info(f"Training set shape is {features.shape}")
-        self.model.fit(features, target)
+        with self.limit_threads():
+            self.model.fit(features, target.to_numpy())
         self.is_fitted = True
         SERVICE.log.info("Model fitted")
 
@@ -68,45 +141,150 @@ class DemandMLModel:
         SERVICE.log.info(f"Predicting with trained model {self.name}...")
         assert set(x_pred.columns) == set(self.columns), \
             set(x_pred.columns).symmetric_difference(set(self.columns))
-        x_pred = x_pred[self.columns]
-        predictions = self.model.predict(x_pred)
+        x_pred = to_matrix(x_pred[self.columns], matrix_format=self.matrix_format)
+        with self.limit_threads():
+            predictions = self.model.predict(x_pred)
         return predictions
 
-    def cross_validate(self, features: pd.DataFrame,
-                       y_train: pd.Series) -> None:
+    def to_matrix(self, features: Union[pd.DataFrame, np.ndarray]):
+        """Get the feature matrix of features, converted if they are a DataFrame"""
+        if isinstance(features, pd.DataFrame):
+            return to_matrix(features, matrix_format=self.matrix_format)
+        return features
+
+    def limit_threads(self):
+        """
+        Limit the threads of the model, to use with 'with', if its backend has no parameter to set
+        them (i.e the OpenMP threads of hist_gb) and threadpoolctl is installed
+        """
+        if self.threads_param is not None:
+            return contextlib.ExitStack()
+        try:
+            from threadpoolctl import threadpool_limits
+        except ImportError:
+            return contextlib.ExitStack()
+        return threadpool_limits(limits=self.n_threads)
+
+    def cross_validate(self, features: Union[pd.DataFrame, np.ndarray], y_train: pd.Series,
+                       dates: pd.Series = None) -> dict:
         """
-        Perform cross validation
+        Perform cross validation: the folds are fitted concurrently on new instances of the model,
+        with the executor of the parallel infra config (see run_folds)
+
+        :param features: training data, DataFrame or feature matrix (see to_matrix)
+        :param y_train: target data
+        :param dates: time of the rows (i.e week), to split the folds in time with the
+        time_series splitter
+        :return: metrics of the folds and their mean, also kept in self.cv_metrics
         """
+        x_data = self.to_matrix(features)
+        target = np.ascontiguousarray(y_train.to_numpy())
+        folds = list(self.split(x_data, dates=dates))
         SERVICE.log.info(
-            f"Performing cross validation on {self.nb_folds} folds...")
-        kf = KFold(n_splits=self.nb_folds)
+            f"Performing cross validation on {len(folds)} folds ({self.cv_splitter} splitter)...")
 
-        x_data, target = features.copy(), y_train.copy()
+        fold_metrics = self.run_folds(x_data, target, folds=folds,
+                                      fits=[(None, fold) for fold in range(len(folds))])
+        for metrics in fold_metrics:
+            SERVICE.log.info(f"{metrics['fold']} : train shape is {metrics['train_size']}, "
+                             f"test shape is {metrics['test_size']}")
 
-        # Train and predict in each fold to compute metrics
-        biases, smapes = [], []
-        for i, (train_index, test_index) in enumerate(kf.split(x_data)):
-            # Define subset to train and predict with
-            x_train = x_data.loc[x_data.index.isin(train_index)]
-            y_train = target.loc[target.index.isin(train_index)]
-            x_test = x_data.loc[x_data.index.isin(test_index)]
-            y_test = target.loc[target.index.isin(test_index)]
+        self.cv_metrics = {
+            "splitter": self.cv_splitter,
+            "Bias": float(np.mean([metrics["bias"] for metrics in fold_metrics])),
+            "Smape": float(np.mean([metrics["smape"] for metrics in fold_metrics])),
+            "folds": fold_metrics,
+        }
+        SERVICE.log.info(f"Cross-validation metrics : {(self.cv_metrics['Bias'], self.cv_metrics['Smape'])}")
+        return self.cv_metrics
 
-            SERVICE.log.info(
-                f"{i + 1} : train shape is {x_train.shape[0]}, "
-                f"test shape is {x_test.shape[0]}"
-            )
+    def run_folds(self, x_data: np.ndarray, target: np.ndarray, folds: list, fits: list) -> list:
+        """
+        Fit models on folds and evaluate them, concurrently with the executor of the parallel infra
+        config: joblib threads (thread), loky processes (process), or one at a time (serial).
+        The cores are shared by the models fitted at the same time.
 
-            # Fit and predict
-            self.model.fit(x_train, y_train)
-            predictions = self.model.predict(x_test)
+        :param x_data: feature matrix
+        :param target: target data
+        :param folds: list of (train positions, test positions)
+        :param fits: list of (parameters of the model, None for the parameters of the DemandMLModel;
+        index of the fold)
+        :return: metrics of each fit, see fit_fold
+        """
+        from joblib import Parallel, delayed
+
+        executor = get_parallel_config()["executor"]
+        if executor != "serial" and executor not in JOBLIB_BACKENDS:
+            raise ValueError(f"Executor {executor} unknown, use one of {list(JOBLIB_BACKENDS) + ['serial']}")
+        n_workers = self.get_n_workers(len(fits))
 
-            # Evaluate
-            biases.append(calculate_bias(predictions, y_test))
-            smapes.append(calculate_smape(predictions, y_test))
+        # With the process executor, joblib memory-maps the arrays larger than its max_nbytes (1MB)
+        # instead of sending a copy to each worker
+        return Parallel(n_jobs=n_workers, backend=JOBLIB_BACKENDS.get(executor, "loky"))(
+            delayed(fit_fold)(model=self.build_model(params=params, n_workers=n_workers), x_data=x_data,
+                              target=target, train_index=folds[fold][0], test_index=folds[fold][1],
+                              fold=fold, n_threads=self.fold_threads(n_workers))
+            for params, fold in fits)
 
-        train_metrics = (np.mean(biases), np.mean(smapes))
-        SERVICE.log.info(f"Cross-validation metrics : {train_metrics}")
+    def split(self, x_data: np.ndarray, dates: pd.Series = None, n_splits: int = None):
+        """
+        Split the rows in folds
+
+        :param x_data: training data
+        :param dates: time of the rows, required by the time_series splitter
+        :param n_splits: number of folds, if None nb_folds
+        :return: generator of (train positions, test positions)
+        """
+        n_splits = n_splits or self.nb_folds
+        if self.cv_splitter == "kfold":
+            from sklearn.model_selection import KFold
+            yield from KFold(n_splits=n_splits).split(x_data)
+        elif self.cv_splitter == "time_series":
+            # The folds are split on the periods, so that the rows of a period are in a single fold,
+            # and each fold is tested on the periods following its training periods
+            from sklearn.model_selection import TimeSeriesSplit
+            if dates is None:
+                raise ValueError("The time of the rows is required by the time_series splitter")
+            periods, inverse = np.unique(np.asarray(dates), return_inverse=True)
+            for train_periods, test_periods in TimeSeriesSplit(n_splits=n_splits).split(periods):
+                yield (np.flatnonzero(inverse <= train_periods[-1]),
+                       np.flatnonzero((inverse >= test_periods[0]) & (inverse <= test_periods[-1])))
+        else:
+            raise ValueError(f"Cross-validation splitter {self.cv_splitter} unknown, use one of {CV_SPLITTERS}")
 
     def __eq__(self, other):
         return self.__dict__ == other.__dict__
+
+
+def fit_fold(model, x_data: np.ndarray, target: np.ndarray, train_index: np.ndarray,
+             test_index: np.ndarray, fold: int, n_threads: int = None) -> dict:
+    """
+    Fit a model on the training rows of a fold and evaluate it on its test rows
+
+    :param model: unfitted model
+    :param x_data: training data
+    :param target: target data
+    :param train_index: positions of the training rows of the fold
+    :param test_index: positions of the test rows of the fold
+    :param fold: number of the fold
+    :param n_threads: threads of the model limited with threadpoolctl, if the model has no
+    parameter to set them
+    :return: metrics of the fold
+    """
+    limits = contextlib.ExitStack()
+    if n_threads is not None:
+        try:
+            from threadpoolctl import threadpool_limits
+            limits = threadpool_limits(limits=n_threads)
+        except ImportError:
+            pass
+
+    start = time.perf_counter()
+    with limits:
+        model.fit(x_data[train_index], target[train_index])
+        predictions = model.predict(x_data[test_index])
+    y_test = target[test_index]
+    return {"fold": fold + 1, "train_size": int(len(train_index)), "test_size": int(len(test_index)),
+            "bias": float(calculate_bias(predictions, y_test)),
+            "smape": float(calculate_smape(predictions, y_test)),
+            "wall_time_s": round(time.perf_counter() - start, 4)}
@@ -0,0 +1,68 @@
+"""
+This script contains the compact representation of the feature matrices given to the models
+
+The features are downcast (float32, int32, one-hot columns to uint8), then converted once to a
+float32 matrix: a C-contiguous numpy array, or a CSR matrix for wide one-hot features. The tree
+based models compute on float32 features, so the matrix isn't copied again by the estimator.
+"""
+
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+MATRIX_FORMATS = ["dense", "sparse"]
+DTYPE = np.float32
+
+INT32 = np.iinfo(np.int32)
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Downcast the numeric columns of a DataFrame: boolean and 0 / 1 columns (one-hot) to uint8,
+    integers to int32 if they fit, floats to float32. The other columns are kept.
+
+    :param df: DataFrame of features
+    :return: DataFrame with the compact types
+    """
+    dtypes = {}
+    for column, dtype in df.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            dtypes[column] = np.uint8
+        elif pd.api.types.is_integer_dtype(dtype) and dtype.itemsize > 1:
+            values = df[column]
+            low, high = (values.min(), values.max()) if len(values) else (0, 0)
+            if low >= 0 and high <= 1:
+                dtypes[column] = np.uint8
+            elif dtype.itemsize > 4 and INT32.min <= low and high <= INT32.max:
+                dtypes[column] = np.int32
+        elif pd.api.types.is_float_dtype(dtype) and dtype.itemsize > 4:
+            dtypes[column] = np.float32
+    return df.astype(dtypes) if dtypes else df
+
+
+def to_matrix(df: pd.DataFrame, matrix_format: str = "dense") -> Union[np.ndarray, "scipy.sparse.csr_matrix"]:
+    """
+    Convert a DataFrame of features to the float32 matrix given to the models
+
+    :param df: DataFrame of features
+    :param matrix_format: dense (C-contiguous numpy array) or sparse (CSR matrix)
+    :return: the matrix, rows and columns in the order of the DataFrame
+    """
+    if matrix_format == "dense":
+        return np.ascontiguousarray(df.to_numpy(dtype=DTYPE))
+    if matrix_format == "sparse":
+        from scipy import sparse
+        # Built by column, so that the dense float matrix is never allocated
+        columns = [sparse.csc_matrix(df[column].to_numpy(dtype=DTYPE).reshape(-1, 1)) for column in df]
+        if not columns:
+            return sparse.csr_matrix((len(df), 0), dtype=DTYPE)
+        return sparse.hstack(columns, format="csr", dtype=DTYPE)
+    raise ValueError(f"Matrix format {matrix_format} unknown, use one of {MATRIX_FORMATS}")
+
+
+def nbytes(matrix: Union[np.ndarray, "scipy.sparse.spmatrix"]) -> int:
+    """Get the memory of a dense or sparse matrix, in bytes"""
+    if isinstance(matrix, np.ndarray):
+        return matrix.nbytes
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
@@ -0,0 +1,23 @@
+"""
+This script contains the histogram-based gradient boosting demand machine learning model of sklearn
+"""
+
+try:
+    from sklearn.ensemble import HistGradientBoostingRegressor
+except ImportError:  # sklearn < 1.0, the estimator is experimental
+    from sklearn.experimental import enable_hist_gradient_boosting  # noqa: F401 pylint: disable=unused-import
+    from sklearn.ensemble import HistGradientBoostingRegressor
+
+from .model import MetaModel
+
+
+class HistGradientBoostingDemandModel(HistGradientBoostingRegressor, MetaModel):
+    """
+        Model from sklearn.ensemble.HistGradientBoostingRegressor
+
+        Name in configuration : hist_gb
+        Its OpenMP threads have no parameter, they are limited with threadpoolctl
+    """
+
+    __module_name__ = "hist_gb"
+    __threads_param__ = None
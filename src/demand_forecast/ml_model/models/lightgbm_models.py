@@ -0,0 +1,19 @@
+"""
+This script contains the gradient boosting demand machine learning model of lightgbm
+(optional backend, not installed with the package)
+"""
+
+from lightgbm import LGBMRegressor
+
+from .model import MetaModel
+
+
+class LightGBMDemandModel(LGBMRegressor, MetaModel):
+    """
+        Model from lightgbm.LGBMRegressor
+
+        Name in configuration : lightgbm
+    """
+
+    __module_name__ = "lightgbm"
+    __threads_param__ = "n_jobs"
@@ -1,25 +1,172 @@
 """
-This script contains tree based demand machine learning models
+This script contains the registry of the tree based demand machine learning models
+
+A model is registered under its name in configuration with an entry point "module:class", and
+its backend (sklearn, xgboost, ...) is only imported on first use of the model, i.e
+MetaModel.get("xgboost") or MetaModel.xgboost. The models of the package are registered in
+MODELS, other models are plugged without editing this module:
+    - by a package, with an entry point of the group "demand_forecast.models" in its setup.py:
+        entry_points={"demand_forecast.models": ["my_model = my_package.models:MyDemandModel"]}
+    - by the config, with the entry point of the model:
+        model:
+          name: my_model
+          entry_point: my_package.models:MyDemandModel
+    - by code, with MetaModel.register("my_model", "my_package.models:MyDemandModel")
+
+A model is an estimator with the sklearn API (fit, predict, get_params). Its threads are set by
+the parameter of __threads_param__ (i.e n_jobs, nthread), found in the signature of its
+constructor if not set, None if the backend has no such parameter (its threads are then limited
+with threadpoolctl).
+
+The models pickled when the models of the package were defined in this module are loaded with
+ModelUnpickler, which maps their former class paths to the entry points of MODELS.
 """
 
-from abc import ABC, abstractmethod
+import importlib
+import inspect
+import pickle
+from abc import ABC, ABCMeta, abstractmethod
+from typing import Dict, Optional
 
 import pandas as pd
-from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
-from xgboost import XGBRegressor
 
+ENTRY_POINTS_GROUP = "demand_forecast.models"
 
-class MetaModel(ABC):
+# Entry points of the models of the package, by name in configuration
+MODELS = {
+    "random_forest": f"{__package__}.sklearn_models:RandomForestDemandModel",
+    "extra_tree": f"{__package__}.sklearn_models:ExtraTreeDemandModel",
+    "hist_gb": f"{__package__}.hist_gb_models:HistGradientBoostingDemandModel",
+    "xgboost": f"{__package__}.xgboost_models:XGBoostDemandModel",
+    "lightgbm": f"{__package__}.lightgbm_models:LightGBMDemandModel",
+}
+
+# Entry points of the models pickled when they were defined in this module, by class name
+LEGACY_MODELS = {
+    "RandomForestDemandModel": MODELS["random_forest"],
+    "ExtraTreeDemandModel": MODELS["extra_tree"],
+    "XGBoostDemandModel": MODELS["xgboost"],
+}
+
+# Parameters setting the number of threads of the usual backends
+THREADS_PARAMS = ["n_jobs", "nthread", "num_threads", "thread_count"]
+
+
+def load_entry_point(entry_point: str) -> type:
+    """
+    Import the class of an entry point
+
+    :param entry_point: "module:class"
+    :return: the class
+    """
+    module, _, attribute = entry_point.partition(":")
+    obj = importlib.import_module(module)
+    for name in attribute.split("."):
+        obj = getattr(obj, name)
+    return obj
+
+
+def installed_entry_points() -> Dict[str, str]:
+    """Get the entry points of the models plugged by the installed packages, by name"""
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:  # python < 3.8
+        import pkg_resources
+        return {entry_point.name: f"{entry_point.module_name}:{'.'.join(entry_point.attrs)}"
+                for entry_point in pkg_resources.iter_entry_points(ENTRY_POINTS_GROUP)}
+    entry_points_ = entry_points()
+    if hasattr(entry_points_, "select"):
+        entry_points_ = entry_points_.select(group=ENTRY_POINTS_GROUP)
+    else:
+        entry_points_ = entry_points_.get(ENTRY_POINTS_GROUP, [])
+    return {entry_point.name: entry_point.value for entry_point in entry_points_}
+
+
+class LazyModelMeta(ABCMeta):
+    """
+    Metaclass giving access to the registered models as attributes, i.e MetaModel.xgboost
+    """
+
+    def __getattr__(cls, name):
+        if not name.startswith("_") and name in cls.names():
+            return cls.get(name)
+        raise AttributeError(f"type object '{cls.__name__}' has no attribute '{name}'")
+
+
+class MetaModel(ABC, metaclass=LazyModelMeta):
     """
-    Main class to train a tree based ML model
+    Main class to train a tree based ML model, and registry of the models
     """
     __module_name__ = None
+    __threads_param__ = None
+
+    # Entry points by name, and models loaded by name
+    _entry_points = dict(MODELS)
+    _models = {}
+    _installed = None
 
     @classmethod
     def __init_subclass__(cls):
-        super.__init_subclass__()
-        setattr(MetaModel, cls.__module_name__, cls)
+        super().__init_subclass__()
+        MetaModel._models[cls.__module_name__] = cls
+
+    @classmethod
+    def register(cls, name: str, entry_point: str) -> None:
+        """
+        Register a model, imported on first use
 
+        :param name: name of the model in configuration
+        :param entry_point: "module:class" of the model
+        """
+        cls._entry_points[name] = entry_point
+        cls._models.pop(name, None)
+
+    @classmethod
+    def names(cls) -> list:
+        """Get the names of the models registered, or plugged by the installed packages"""
+        if cls._installed is None:
+            cls._installed = installed_entry_points()
+        return sorted(set(cls._entry_points) | set(cls._installed) | set(cls._models))
+
+    @classmethod
+    def get(cls, name: str, entry_point: Optional[str] = None) -> type:
+        """
+        Get the class of a model, importing its backend on first use
+
+        :param name: name of the model in configuration
+        :param entry_point: "module:class" of the model, registered under the name if set
+        :return: the class of the model
+        """
+        if entry_point is not None and cls._entry_points.get(name) != entry_point:
+            cls.register(name, entry_point)
+        if name not in cls._models:
+            if name not in cls.names():
+                raise ValueError(f"model_name {name} is not yet supported, use one of {cls.names()}")
+            entry_point = cls._entry_points.get(name) or cls._installed[name]
+            try:
+                model = load_entry_point(entry_point)
+            except ImportError as error:
+                raise ImportError(f"The backend of the model {name} ({entry_point}) is not installed: "
+                                  f"{error}") from error
+            cls._models[name] = model
+        return cls._models[name]
+
+    @staticmethod
+    def threads_param(model: type) -> Optional[str]:
+        """
+        Get the parameter setting the number of threads of a model
+
+        :param model: class of the model
+        :return: __threads_param__ of the model, or the first parameter of THREADS_PARAMS in the
+        signature of its constructor, None if the model has none
+        """
+        if getattr(model, "__threads_param__", None):
+            return model.__threads_param__
+        try:
+            params = inspect.signature(model.__init__).parameters
+        except (TypeError, ValueError):
+            return None
+        return next((param for param in THREADS_PARAMS if param in params), None)
 
     @abstractmethod
     def fit(self, x_train: pd.DataFrame, target: pd.Series):
@@ -41,30 +188,12 @@ class MetaModel(ABC):
         raise RuntimeError('Not implemented')
 
 
-class RandomForestDemandModel(RandomForestRegressor, MetaModel):
+class ModelUnpickler(pickle.Unpickler):
     """
-        Model from sklearn.ensemble.RandomForestRegressor
-
-        Name in configuration : random_forest
-    """
-
-    __module_name__ = "random_forest"
-
-
-class ExtraTreeDemandModel(ExtraTreesRegressor, MetaModel):
-    """
-        Model from sklearn.ensemble.ExtraTreesRegressor
-
-        Name in configuration : extra_tree
-    """
-    __module_name__ = "extra_tree"
-
-
-class XGBoostDemandModel(XGBRegressor, MetaModel):
-    """
-        Model from sklearn.ensemble.ExtraTreesRegressor
-
-        Name in configuration : xgboost
+    Unpickler loading the models pickled when they were defined in this module from their entry points
     """
 
-    __module_name__ = "xgboost"
+    def find_class(self, module, name):
+        if module == __name__ and name in LEGACY_MODELS:
+            return load_entry_point(LEGACY_MODELS[name])
+        return super().find_class(module, name)
@@ -0,0 +1,28 @@
+"""
+This script contains the tree based demand machine learning models of sklearn
+"""
+
+from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
+
+from .model import MetaModel
+
+
+class RandomForestDemandModel(RandomForestRegressor, MetaModel):
+    """
+        Model from sklearn.ensemble.RandomForestRegressor
+
+        Name in configuration : random_forest
+    """
+
+    __module_name__ = "random_forest"
+    __threads_param__ = "n_jobs"
+
+
+class ExtraTreeDemandModel(ExtraTreesRegressor, MetaModel):
+    """
+        Model from sklearn.ensemble.ExtraTreesRegressor
+
+        Name in configuration : extra_tree
+    """
+    __module_name__ = "extra_tree"
+    __threads_param__ = "n_jobs"
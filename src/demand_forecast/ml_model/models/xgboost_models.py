@@ -0,0 +1,18 @@
+"""
+This script contains the tree based demand machine learning models of xgboost
+"""
+
+from xgboost import XGBRegressor
+
+from .model import MetaModel
+
+
+class XGBoostDemandModel(XGBRegressor, MetaModel):
+    """
+        Model from xgboost.XGBRegressor
+
+        Name in configuration : xgboost
+    """
+
+    __module_name__ = "xgboost"
+    __threads_param__ = "n_jobs"
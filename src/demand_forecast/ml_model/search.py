@@ -0,0 +1,159 @@
+"""
+This script contains the hyperparameter search of the demand machine learning model
+
+Parameter sets are sampled from the search space of the config, and evaluated by cross
+validation on the training feature matrix, converted once to numpy arrays shared by the trials.
+The (trial, fold) fits run concurrently with the workers of the parallel infra config, as the folds of
+the cross validation (see DemandMLModel.run_folds).
+
+    search:
+      enabled: True
+      method: halving   # random: every trial is evaluated on every fold
+                        # halving: the trials are evaluated on 1, factor, factor ** 2, ... folds,
+                        #          only the best 1 / factor of the trials go to the next rung
+      n_trials: 9
+      factor: 3
+      metric: smape     # smape, or bias (absolute)
+      space:            # list of values, or {low: , high: , log: , int: } for a uniform sample
+        n_estimators: [50, 100, 200]
+        max_features: {low: 0.3, high: 1.0}
+"""
+
+import math
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.services.service_provider import ServiceProviderHandler
+from .demand_ml_model import DemandMLModel
+
+SERVICE = ServiceProviderHandler()
+
+METHODS = ["random", "halving"]
+METRICS = {"smape": lambda metrics: metrics["smape"], "bias": lambda metrics: abs(metrics["bias"])}
+
+
+class HyperparameterSearch:
+    """
+    Search of the parameters of a DemandMLModel minimizing a cross-validation metric
+    """
+
+    def __init__(self, ml_model: DemandMLModel, space: dict, method: str = "random", n_trials: int = 10,
+                 factor: int = 3, metric: str = "smape", n_folds: int = 5, random_state: int = None):
+        """
+        :param ml_model: model whose parameters are searched, the sampled parameters override its
+        parameters
+        :param space: search space, dictionary parameter: list of values or {low, high, log, int}
+        :param method: random or halving
+        :param n_trials: number of parameter sets sampled
+        :param factor: halving factor of the trials (and growth factor of the folds evaluated)
+        :param metric: smape or bias
+        :param n_folds: number of folds of the cross validation
+        :param random_state: seed of the sampling
+        """
+        if method not in METHODS:
+            raise ValueError(f"Search method {method} unknown, use one of {METHODS}")
+        if metric not in METRICS:
+            raise ValueError(f"Search metric {metric} unknown, use one of {list(METRICS)}")
+        self.ml_model = ml_model
+        self.space = space
+        self.method = method
+        self.n_trials = n_trials
+        self.factor = max(2, factor)
+        self.metric = metric
+        self.n_folds = n_folds
+        self.random_state = random_state
+
+    @classmethod
+    def from_config(cls, ml_model: DemandMLModel) -> Optional["HyperparameterSearch"]:
+        """Get the search of the model config, None if it is disabled"""
+        search_config = SERVICE.config.demand_forecast.model.get("search") or {}
+        if not search_config.get("enabled"):
+            return None
+        return cls(ml_model=ml_model, space=search_config.space.to_dict(),
+                   method=search_config.get("method") or "random",
+                   n_trials=search_config.get("n_trials") or 10,
+                   factor=search_config.get("factor") or 3,
+                   metric=search_config.get("metric") or "smape",
+                   n_folds=int(SERVICE.config.run_param.nb_folds),
+                   random_state=SERVICE.config.run_param.random_seed)
+
+    def sample(self) -> List[dict]:
+        """Sample the parameter sets of the trials, without duplicates"""
+        random = np.random.RandomState(self.random_state)
+        samples = []
+        # Bounded number of draws, in case the space has less than n_trials distinct sets
+        for _ in range(self.n_trials * 10):
+            params = {}
+            for name, values in self.space.items():
+                if isinstance(values, dict):
+                    low, high = float(values["low"]), float(values["high"])
+                    if values.get("log"):
+                        value = float(np.exp(random.uniform(np.log(low), np.log(high))))
+                    else:
+                        value = float(random.uniform(low, high))
+                    params[name] = int(round(value)) if values.get("int") else value
+                else:
+                    value = values[random.randint(len(values))]
+                    params[name] = value.item() if isinstance(value, np.generic) else value
+            if params not in samples:
+                samples.append(params)
+            if len(samples) == self.n_trials:
+                break
+        return samples
+
+    def rungs(self) -> List[int]:
+        """Get the number of folds the trials are evaluated on, by rung"""
+        if self.method == "random":
+            return [self.n_folds]
+        rungs, n_folds = [], 1
+        while n_folds < self.n_folds:
+            rungs.append(n_folds)
+            n_folds *= self.factor
+        return rungs + [self.n_folds]
+
+    def run(self, features: pd.DataFrame, target: pd.Series, dates: pd.Series = None) -> dict:
+        """
+        Search the best parameters
+
+        :param features: training data, DataFrame or feature matrix (see to_matrix)
+        :param target: target data
+        :param dates: time of the rows, used by the time_series splitter
+        :return: dictionary with the best parameters, their score and the trials
+        """
+        x_data = self.ml_model.to_matrix(features)
+        y_data = np.ascontiguousarray(target.to_numpy())
+        folds = list(self.ml_model.split(x_data, dates=dates, n_splits=self.n_folds))
+        score = METRICS[self.metric]
+
+        trials = [{"trial": index + 1, "params": params, "folds": [], "status": "running"}
+                  for index, params in enumerate(self.sample())]
+        running = list(trials)
+        SERVICE.log.info(f"Searching the parameters of {self.ml_model.name}: {len(trials)} trials, "
+                         f"{self.method} method, {len(folds)} folds")
+
+        for rung, n_folds in enumerate(self.rungs()):
+            tasks = [(trial, fold) for trial in running for fold in range(len(trial["folds"]), n_folds)]
+            results = self.ml_model.run_folds(x_data, y_data, folds=folds, fits=[
+                ({**self.ml_model.params, **trial["params"]}, fold) for trial, fold in tasks])
+            for (trial, _), metrics in zip(tasks, results):
+                trial["folds"].append(metrics)
+            for trial in running:
+                trial["score"] = float(np.mean([score(metrics) for metrics in trial["folds"]]))
+
+            # Early stopping: only the best trials are evaluated on more folds
+            running.sort(key=lambda trial: trial["score"])
+            if n_folds < len(folds):
+                n_kept = max(1, int(math.ceil(len(running) / self.factor)))
+                for trial in running[n_kept:]:
+                    trial["status"] = f"stopped at rung {rung}"
+                running = running[:n_kept]
+            SERVICE.log.info(f"Search rung {rung} on {n_folds} folds: best {self.metric} "
+                             f"{running[0]['score']:.4f} with {running[0]['params']}")
+
+        best = running[0]
+        for trial in running:
+            trial["status"] = "completed"
+        return {"method": self.method, "metric": self.metric, "best_params": best["params"],
+                "best_score": best["score"], "trials": trials}
@@ -23,6 +23,9 @@ class DemandParams:
         # Model parameters
         self._model_name = SERVICE.config.demand_forecast.model.name
         self._model_params = SERVICE.config.demand_forecast.model.params
+        self.model_entry_point = SERVICE.config.demand_forecast.model.get("entry_point")
+        self.model_threads = SERVICE.config.demand_forecast.model.get("n_threads")
+        self.model_matrix = SERVICE.config.demand_forecast.model.get("matrix") or "dense"
 
         # Features parameters
         self._features = SERVICE.config.demand_forecast.features
@@ -1,12 +1,16 @@
 from collections import namedtuple
 from functools import reduce
-from typing import Union
+from typing import Iterator, Optional, Tuple, Union
 
 import pandas as pd
 
 from src.context.meta import MetaContext
+from src.data.data_fetch.cache import DataCache
 from src.services.service_provider import ServiceProviderHandler
 from src.utils.func_utils import get_index_from_granularity
+from src.utils.parallel import run_parallel
+from .index_builder import IndexBuilder
+from .keys import KeyEncoder
 
 SERVICE = ServiceProviderHandler()
 
@@ -17,8 +21,11 @@ class DataPipeline:
     this class is defined on four main properties : index, pipeline, input_data and granularity
     """
 
-    Feature = namedtuple("Feature", "id data_name load aggregate transformer filter merge scope")
-    Feature.__new__.__defaults__ = ("-", "-", {}, {}, {}, {}, {}, [])
+    # `depends` lists the ids of the features that must be processed before the feature
+    Feature = namedtuple("Feature", "id data_name load aggregate transformer filter merge scope depends")
+    Feature.__new__.__defaults__ = ("-", "-", {}, {}, {}, {}, {}, [], [])
+    # To be picklable by process executors
+    Feature.__qualname__ = "DataPipeline.Feature"
 
     def __init__(self, scenario, context, scope):
 
@@ -36,6 +43,8 @@ class DataPipeline:
         self._input_data = {}
         self._pipeline = None
         self._index = None
+        self._index_builder = None
+        self._index_df = None
         self.scope = scope
 
     @property
@@ -71,22 +80,35 @@ class DataPipeline:
               the specific input data (index_data). If multiple sources of data are provided, the
               index is built as all combination of all different index values.
 
+        The index is built once, see index_builder.
+
         :return:
         """
         if self.from_index == "feature":
             return f"Index in {self._index}"
 
-        index_series = []
-        for gran, index in self._index.items():
-            if gran in list(get_index_from_granularity(self.granularity).keys()):
-                trained_data, df, index_names = self.run_step(context=self._context,
-                                                              feature=index,
-                                                              scope=self.scope)
-                index_series.append(df[index_names])
-        return reduce(
-            lambda a, b: a.eval("key=1").merge(b.eval("key=1"), on="key", how="inner").drop(
-                ["key"], axis=1),
-            index_series)
+        if self._index_df is None:
+            with SERVICE.profiler.profile("index") as record:
+                self._index_df = self.index_builder.build()
+                record.rows_out = len(self._index_df)
+        return self._index_df
+
+    @property
+    def index_builder(self) -> IndexBuilder:
+        """
+        Builder of the index created with the input data, as all combination of the index values of
+        each granularity. The index data are processed once, the builder can give the index by chunks.
+        """
+        if self._index_builder is None:
+            index_series = []
+            for gran, index in self._index.items():
+                if gran in list(get_index_from_granularity(self.granularity).keys()):
+                    trained_data, df, index_names = self.run_step(context=self._context,
+                                                                  feature=index,
+                                                                  scope=self.scope)
+                    index_series.append(df[index_names])
+            self._index_builder = IndexBuilder(frames=index_series)
+        return self._index_builder
 
     @index.setter
     def index(self, index: dict):
@@ -116,6 +138,8 @@ class DataPipeline:
 
         self._index = index_data
         self.from_index = from_index
+        self._index_builder = None
+        self._index_df = None
 
     @property
     def pipeline(self):
@@ -163,23 +187,144 @@ class DataPipeline:
             else:
                 raise NotImplementedError
 
-            for feature in pipeline:
-                if scope in feature.scope:
-                    trained_data, df, index_names = self.run_step(context=self._context,
-                                                                  feature=feature, scope=scope,
-                                                                  trained_data=trained_data)
-                    final_df = final_df.merge(df, **feature.merge,
-                                              on=list(
-                                                  set(self.index_names).intersection(index_names)))
-
-                # assert len(
-                # data) == len_data_check, 'the number of rows has changed after feature adding'
+            # The features are processed concurrently, then merged in the order of the pipeline
+            features = [feature for feature in pipeline if scope in feature.scope]
+            trained_data, outputs = self.run_steps(features=features, scope=scope,
+                                                   trained_data=trained_data)
+
+            # The keys are encoded with the values of the index, and decoded in the output
+            keys = self.key_encoder(final_df=final_df, features=features)
+            final_df = self.merge_features(final_df, features=features,
+                                           outputs=self.encode_outputs(keys=keys, outputs=outputs), keys=keys)
+            SERVICE.log.info(f"Data cache of the scenario: {DataCache.get_cache(self.scenario).stats}")
             return trained_data, final_df
 
         else:
             raise NotImplementedError(
                 f"{[prop for prop in required_property if prop is None]} has not been implemented")
 
+    def run_chunks(self, scope: str, chunk_size: int,
+                   trained_data: dict = None) -> Tuple[dict, Iterator[pd.DataFrame]]:
+        """
+        Run the pipeline by chunks of rows of the index: the feature engineering steps are run once,
+        then their features are merged to each chunk of the index as the chunks are consumed, so
+        that a single chunk of the output is in memory. The index must come from the data.
+
+        :param scope: "training", "prediction" or "evaluation" (str)
+        :param chunk_size: number of rows of the index by chunk
+        :param trained_data: dictionary with the trained data of feature engineering step
+        :return: trained_data and iterator of the output chunks, in the order of the index rows
+        """
+        if self.from_index != "data":
+            raise NotImplementedError("Only an index created from the data can be run by chunks")
+
+        features = [feature for feature in self.pipeline if scope in feature.scope]
+        trained_data, outputs = self.run_steps(features=features, scope=scope, trained_data=trained_data)
+        keys = self.key_encoder(final_df=self.index_builder.take(0, 0), features=features)
+        outputs = self.encode_outputs(keys=keys, outputs=outputs)
+        chunks = (self.merge_features(chunk, features=features, outputs=outputs, keys=keys)
+                  for chunk in self.index_builder.chunks(chunk_size))
+        return trained_data, chunks
+
+    def merge_features(self, final_df: pd.DataFrame, features: list, outputs: dict,
+                       keys: Optional[KeyEncoder]) -> pd.DataFrame:
+        """
+        Merge the features to the index, in the order of the pipeline
+
+        :param final_df: index of the pipeline (or chunk of the index)
+        :param features: list of Feature objects
+        :param outputs: dictionary of feature id: (DataFrame, index names), see encode_outputs
+        :param keys: encoding of the keys of the merges, None to merge on the values
+        :return: DataFrame with all features
+        """
+        if keys is not None:
+            final_df = keys.encode(final_df)
+        for feature in features:
+            df, index_names = outputs[feature.id]
+            on = list(set(self.index_names).intersection(index_names))
+            with SERVICE.profiler.profile(f"merge {feature.id}", rows_in=len(final_df)) as record:
+                if keys is not None:
+                    final_df = keys.join(final_df, df, on=on, how=feature.merge.get("how", "inner"))
+                else:
+                    final_df = final_df.merge(df, **feature.merge, on=on)
+                record.rows_out = len(final_df)
+
+            # assert len(
+            # data) == len_data_check, 'the number of rows has changed after feature adding'
+        if keys is not None:
+            final_df = keys.decode(final_df)
+        return final_df
+
+    def encode_outputs(self, keys: Optional[KeyEncoder], outputs: dict) -> dict:
+        """Encode the keys of the merges of the features outputs, the rows with unknown keys are dropped"""
+        if keys is None:
+            return outputs
+        encoded = {}
+        for feature_id, (df, index_names) in outputs.items():
+            on = list(set(self.index_names).intersection(index_names))
+            encoded[feature_id] = (keys.encode(df, keys=on, drop_unknown=True), index_names)
+        return encoded
+
+    def key_encoder(self, final_df: pd.DataFrame, features: list) -> Optional[KeyEncoder]:
+        """
+        Get the dictionary encoding of the index keys used by the merges of the features. The rows
+        of the features whose keys are not in the index are never merged, so the keys are only
+        encoded when every merge is an inner or left merge.
+
+        :param final_df: index of the pipeline
+        :param features: features merged to the index
+        :return: KeyEncoder fitted on the index, None if the merges can't use it
+        """
+        keys = [key for key in self.index_names if key in final_df.columns]
+        if not keys or any(set(feature.merge) - {"how"}
+                           or feature.merge.get("how", "inner") not in ("inner", "left")
+                           for feature in features):
+            return None
+        if self.from_index == "data":
+            # The values of the keys are those of the DataFrames of the cartesian index
+            vocabularies = {}
+            for frame in self.index_builder.frames:
+                frame_keys = [key for key in keys if key in frame.columns]
+                vocabularies.update(KeyEncoder.fit(frame, keys=frame_keys).vocabularies)
+            return KeyEncoder(vocabularies={key: vocabularies[key] for key in keys})
+        return KeyEncoder.fit(final_df, keys=keys)
+
+    def run_steps(self, features: list, scope: str, trained_data: dict = None) -> Tuple[dict, dict]:
+        """
+        Run the processing steps of the features. The features are run by waves: each wave runs
+        concurrently the features whose dependencies (`depends`) have been processed.
+
+        :param features: list of Feature objects
+        :param scope: scope of the run (either "training", "prediction", "evaluation")
+        :param trained_data: data dictionary with the trained data from feature engineering steps,
+               updated with the trained data of each feature in the order of the features
+        :return: trained data and dictionary of feature id: (DataFrame, index names)
+        """
+        trained_data = {} if trained_data is None else trained_data
+        feature_ids = {feature.id for feature in features}
+        outputs = {}
+        pending = list(features)
+
+        while pending:
+            wave = [feature for feature in pending
+                    if all(dependency in outputs or dependency not in feature_ids
+                           for dependency in feature.depends)]
+            if not wave:
+                raise ValueError(f"Cyclic dependencies between features {[feature.id for feature in pending]}")
+
+            SERVICE.log.debug(f"Processing features {[feature.id for feature in wave]}")
+            # Each step gets its own trained data, so that concurrent steps don't share a dictionary
+            results = run_parallel(self.run_step, [
+                {"context": self._context, "feature": feature, "scope": scope,
+                 "trained_data": dict(trained_data)} for feature in wave])
+
+            for feature, (step_trained_data, df, index_names) in zip(wave, results):
+                trained_data.update(step_trained_data)
+                outputs[feature.id] = (df, index_names)
+            pending = [feature for feature in pending if feature.id not in outputs]
+
+        return trained_data, outputs
+
     def run_step(self, context: MetaContext, feature: Feature, scope: str = None,
                  trained_data: dict = None):
         """
@@ -202,61 +347,91 @@ class DataPipeline:
                 2. `parallel`. It means that all transformation will be perform in parallel so from
                     the same starting data frame
 
+        The step and each of its sub-steps (load, aggregate, transform, filter) are profiled.
+
         :param context: context of the run
         :param feature: feature is a Feature object from DataPipeline class
         :param scope: scope of the run (either "training", "prediction", "evaluation"
         :param trained_data: data dictionary with the trained data from feature engineering steps
         :return:
         """
+        with SERVICE.profiler.profile(f"step {feature.id}") as record:
+            trained_data, df, index_names = self._run_step(context=context, feature=feature, scope=scope,
+                                                           trained_data=trained_data)
+            record.rows_out = len(df)
+        return trained_data, df, index_names
+
+    def _run_step(self, context: MetaContext, feature: Feature, scope: str = None,
+                  trained_data: dict = None):
+        """Run a processing step, see run_step"""
         # 1 . get Data object
         data = self.input_data[feature.data_name]
 
-        # 2. Load data
+        # 2. Load data and 3. Aggregate data (mandatory step), through the data cache
         if feature.load:
-            df = data.load(scenario=self.scenario, context=context, scope=self.scope,
-                           **feature.load)
-
-        # 3. Aggregate data
-        df = data.aggregate(df=df, context=context)  # mandatory step
+            df = data.load_aggregated(scenario=self.scenario, context=context, scope=self.scope,
+                                      **feature.load)
 
         # 4. Remove undesirable features
-        if data.name in SERVICE.config.demand_forecast.features.keys():
-            features = SERVICE.config.demand_forecast.features[data.name]
+        if data.name in SERVICE.snapshot.features.keys():
+            features = SERVICE.snapshot.features[data.name]
             if len(features) > 0:
                 df = df[data.index_names + list(features)]
 
         # 5. Transform the data frame with feature engineering methods
         if feature.transformer:
-            if feature.transformer["type"] == "series":
-                for transf_ in feature.transformer["transformers"]:
-                    if "trained" in transf_.keys():
-                        if transf_["trained"] and scope == "training":
-                            output_trained_data, df = \
-                                data.transformer(df=df,
-                                                 is_training=context.is_training,
-                                                 **transf_)
-                            trained_data[transf_["transformer"].__name__] = output_trained_data
-                        elif transf_["trained"] and scope == "prediction":
-                            df = data.transformer(df=df, is_training=context.is_training,
-                                                  trained_data=trained_data[
-                                                      transf_["transformer"].__name__], **transf_)
-                    else:
-                        df = data.transformer(df=df, **transf_)
-            elif feature.transformer["type"] == "parallel":
-                df_partial_list = [data.transformer(df=df, **transf_) for transf_ in
-                                   feature.transformer["transformers"]]
-                df = reduce(lambda left, right: pd.merge(left, right, on=list(
-                    set(data.index_names).intersection(left.columns).intersection(right.columns))),
-                            df_partial_list)
-            else:
-                raise ValueError("Unknown type for transformer")
+            with SERVICE.profiler.profile("transform", rows_in=len(df)) as record:
+                trained_data, df = self.transform(df=df, data=data, context=context, feature=feature,
+                                                  scope=scope, trained_data=trained_data)
+                record.rows_out = len(df)
 
         # 6. filter it
         if feature.filter:
-            df = data.filter(df=df, **feature.filter)
+            with SERVICE.profiler.profile("filter", rows_in=len(df)) as record:
+                df = data.filter(df=df, **feature.filter)
+                record.rows_out = len(df)
 
         return trained_data, df, list(set(data.index_names).intersection(df.columns))
 
+    @staticmethod
+    def transform(df: pd.DataFrame, data, context: MetaContext, feature: Feature, scope: str,
+                  trained_data: dict) -> Tuple[dict, pd.DataFrame]:
+        """
+        Transform the data frame with the feature engineering methods of the feature
+
+        :param df: DataFrame loaded
+        :param data: Data object of the feature
+        :param context: context of the run
+        :param feature: Feature object
+        :param scope: scope of the run
+        :param trained_data: data dictionary with the trained data from feature engineering steps
+        :return: trained data and DataFrame transformed
+        """
+        if feature.transformer["type"] == "series":
+            for transf_ in feature.transformer["transformers"]:
+                if "trained" in transf_.keys():
+                    if transf_["trained"] and scope == "training":
+                        output_trained_data, df = \
+                            data.transformer(df=df,
+                                             is_training=context.is_training,
+                                             **transf_)
+                        trained_data[transf_["transformer"].__name__] = output_trained_data
+                    elif transf_["trained"] and scope == "prediction":
+                        df = data.transformer(df=df, is_training=context.is_training,
+                                              trained_data=trained_data[
+                                                  transf_["transformer"].__name__], **transf_)
+                else:
+                    df = data.transformer(df=df, **transf_)
+        elif feature.transformer["type"] == "parallel":
+            df_partial_list = [data.transformer(df=df, **transf_) for transf_ in
+                               feature.transformer["transformers"]]
+            df = reduce(lambda left, right: pd.merge(left, right, on=list(
+                set(data.index_names).intersection(left.columns).intersection(right.columns))),
+                        df_partial_list)
+        else:
+            raise ValueError("Unknown type for transformer")
+        return trained_data, df
+
     @staticmethod
     def fetch_data(input_data, scope: str, context, scenario) -> None:
         """
@@ -274,4 +449,6 @@ class DataPipeline:
                                                  scenario=scenario,
                                                  file_name=input_data_.name)
             if need_fetching:
-                input_data_.fetch_data(context=context, dst=dst)
+                input_data_.fetch_data(context=context, dst=dst,
+                                       partition=input_data_.get_partition(scenario), load=False)
+                SERVICE.log.debug(f"Database connection pool: {SERVICE.db.pool_status()}")
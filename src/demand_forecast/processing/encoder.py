@@ -0,0 +1,123 @@
+"""
+This script contains the one-hot encoder of the categorical features
+
+The vocabulary of each categorical column (its categories, in the order of pd.get_dummies) is
+fitted once. The one-hot columns of every categorical column are then written in a single
+allocation, a uint8 array or a CSR matrix, from the codes of the values in the vocabulary: the
+categories unseen at training have no code, their rows are zeros, without reindexing.
+"""
+
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+DTYPE = np.uint8
+
+
+def feature_name(column: str, category) -> str:
+    """Name of the one-hot column of a category, as pd.get_dummies without spaces"""
+    return f"{column}_{category}".strip().replace(" ", "")
+
+
+class CategoricalEncoder:
+    """
+    One-hot encoder of the categorical columns of a DataFrame
+    """
+
+    def __init__(self, categories: Dict[str, pd.Index], by_name: Optional[List[str]] = None):
+        """
+        :param categories: vocabulary of each categorical column
+        :param by_name: columns whose vocabulary was recovered from the names of the one-hot
+        columns, their values are matched by their string
+        """
+        self.categories = categories
+        self.by_name = by_name or []
+        self.feature_names = {column: [feature_name(column, category) for category in categories_]
+                              for column, categories_ in categories.items()}
+
+    @classmethod
+    def fit(cls, data: pd.DataFrame, columns: Optional[list] = None) -> "CategoricalEncoder":
+        """
+        Fit the vocabulary of the categorical columns
+
+        :param data: DataFrame containing columns to be encoded
+        :param columns: columns to encode, the category and object columns if not set
+        :return: the encoder fitted
+        """
+        if columns is None:
+            columns = list(data.select_dtypes(include=['category', 'object']).columns)
+        # The categories of a categorical column, the sorted values otherwise (without NaN)
+        return cls(categories={column: pd.Categorical(data[column]).categories for column in columns})
+
+    @classmethod
+    def from_dict(cls, trained_data: Dict[str, List[str]]) -> "CategoricalEncoder":
+        """
+        Get the encoder of the trained data of the previous versions, the names of the
+        pd.get_dummies columns of each categorical column
+
+        :param trained_data: dictionary column: names of its one-hot columns
+        :return: the encoder
+        """
+        return cls(categories={column: pd.Index([name[len(column) + 1:] for name in names], dtype=object)
+                               for column, names in trained_data.items()},
+                   by_name=list(trained_data))
+
+    @property
+    def columns(self) -> List[str]:
+        """Categorical columns encoded"""
+        return list(self.feature_names)
+
+    @property
+    def output_columns(self) -> List[str]:
+        """Names of the one-hot columns, by categorical column"""
+        return [name for names in self.feature_names.values() for name in names]
+
+    def codes(self, data: pd.DataFrame, column: str) -> np.ndarray:
+        """
+        Get the code of the values of a categorical column in its vocabulary
+
+        :param data: DataFrame containing the column
+        :param column: categorical column
+        :return: array of codes, -1 for the missing values and the categories unseen at training
+        """
+        if column in self.by_name:
+            values = data[column].astype(str).where(data[column].notnull())
+            return pd.Categorical(values, categories=self.categories[column]).codes
+        return pd.Categorical(data[column], categories=self.categories[column]).codes
+
+    def transform(self, data: pd.DataFrame, sparse: bool = False) -> Union[np.ndarray, "scipy.sparse.csr_matrix"]:
+        """
+        One-hot encode the categorical columns
+
+        :param data: DataFrame containing the categorical columns
+        :param sparse: to get a CSR matrix instead of a dense array
+        :return: uint8 matrix, one row by row of data and the columns of output_columns
+        """
+        n_rows, offset = len(data), 0
+        rows, indices = [], []
+        for column in self.columns:
+            codes = self.codes(data, column)
+            known = codes >= 0
+            rows.append(np.flatnonzero(known))
+            indices.append(codes[known].astype(np.int64) + offset)
+            offset += len(self.feature_names[column])
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+
+        if sparse:
+            from scipy import sparse as sp
+            return sp.csr_matrix((np.ones(len(rows), dtype=DTYPE), (rows, indices)), shape=(n_rows, offset))
+        matrix = np.zeros((n_rows, offset), dtype=DTYPE)
+        matrix[rows, indices] = 1
+        return matrix
+
+    def encode(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Replace the categorical columns of a DataFrame by their one-hot columns
+
+        :param data: DataFrame containing the categorical columns
+        :return: DataFrame with the other columns, then the one-hot columns
+        """
+        one_hot = pd.DataFrame(self.transform(data), columns=self.output_columns, index=data.index)
+        return pd.concat([data.drop(self.columns, axis=1), one_hot], axis=1)
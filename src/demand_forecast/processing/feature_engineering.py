@@ -3,12 +3,13 @@ This script contains script to process features and
 """
 
 from collections import namedtuple
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
 
 from src.services.service_provider import ServiceProviderHandler
+from .encoder import CategoricalEncoder
 
 SERVICE = ServiceProviderHandler()
 
@@ -23,11 +24,11 @@ class FeatureEng:
     @staticmethod
     def normalize_data(
             data: pd.DataFrame,
-            scaler: Optional[StandardScaler] = None,
+            scaler: Optional["StandardScaler"] = None,
             not_scale: Optional[list] = None,
             with_mean: Optional[bool] = True,
             with_std: Optional[bool] = True
-    ) -> Tuple[pd.DataFrame, StandardScaler]:
+    ) -> Tuple[pd.DataFrame, "StandardScaler"]:
         """
         Scaling DataFrame features
 
@@ -44,6 +45,8 @@ class FeatureEng:
         col_names = list(data_to_scale.columns)
         # If scaler is not available, it means it has to be fitted
         if not scaler:
+            from sklearn.preprocessing import StandardScaler
+
             scaler = StandardScaler(with_mean=with_mean, with_std=with_std)
             data_to_scale = scaler.fit_transform(data_to_scale)
         else:
@@ -59,16 +62,17 @@ class FeatureEng:
     @staticmethod
     def encode_data(
             data: pd.DataFrame, is_training: bool, trained: str,
-            trained_data: Optional[dict] = None,
-    ) -> Tuple[dict, pd.DataFrame]:
+            trained_data: Optional[Union[CategoricalEncoder, dict]] = None,
+    ) -> Union[Tuple[CategoricalEncoder, pd.DataFrame], pd.DataFrame]:
         """
         Encode categorical columns
 
         :param data: DataFrame containing columns to be encoded
         :param is_training: bool true whether if the run is at the training step
-        :param trained_data:  LabelEncoder dictionary containing column and labels encoded
-        :return: DataFrame with encoded columns and dictionary with labels for each column and
-                 LabelEncoder dictionary if the run is at training step.
+        :param trained_data: CategoricalEncoder fitted at the training step, or dictionary
+                             column: one-hot columns of the models trained by previous versions
+        :return: DataFrame with encoded columns, and the CategoricalEncoder fitted if the run is at
+                 training step.
         """
 
         SERVICE.log.info(f"Encoding features")
@@ -76,35 +80,21 @@ class FeatureEng:
         if is_training:
             assert trained_data is None, \
                 "Fitting categorical encoding, 'trained_data' should be None"
-            cat_cols = list(data.select_dtypes(include=['category', 'object']).columns)
-            train = True
-            trained_data = {}
+            SERVICE.log.info(f"Fitting categorical features encoding")
+            encoder = CategoricalEncoder.fit(data)
         else:
             assert trained_data is not None, \
-                "Encoding categorical variable needs an input 'trained_data' dictionary"
-            cat_cols = trained_data.keys()
-            train = False
-
-        for column in cat_cols:
-            try:
-                encoded_col = pd.get_dummies(data[column], prefix=column)
-                if train:
-                    SERVICE.log.info(f"Fitting categorical features encoding")
-                    trained_data[column] = list(encoded_col.columns)
-                else:
-                    # Deal with unknown classes
-                    SERVICE.log.info(f"Encoding categorical features")
-                    encoded_col = encoded_col.reindex(columns=trained_data[column], fill_value=0)
-
-                data = (
-                    pd.concat([data, encoded_col.rename(
-                        columns=lambda col: col.strip().replace(" ", ""))], axis=1)
-                        .drop([column], axis=1)
-                )
-            except Exception as e:
-                raise ArithmeticError(f"Could not encode column {column} : {e}")
-        if train:
-            return trained_data, data
+                "Encoding categorical variable needs an input 'trained_data' encoder"
+            SERVICE.log.info(f"Encoding categorical features")
+            encoder = trained_data if isinstance(trained_data, CategoricalEncoder) \
+                else CategoricalEncoder.from_dict(trained_data)
+
+        try:
+            data = encoder.encode(data)
+        except Exception as e:
+            raise ArithmeticError(f"Could not encode columns {encoder.columns} : {e}")
+        if is_training:
+            return encoder, data
 
         return data
 
@@ -141,6 +131,52 @@ class FeatureEng:
         data = data.rename(columns={col_: col_ + "_" + agg for col_ in col})
         return data
 
+    @staticmethod
+    def pivot_with_totals(data: pd.DataFrame, index: list, col: list, agg: str) -> pd.DataFrame:
+        """
+        Pivot a variable at article x period level and aggregate it at article level, in a single
+        pass: same output as the merge of pivot_values and agg_value on the article. The rows are
+        grouped by the integer codes of the article and of the period with np.bincount, the
+        aggregation at article level is the sum of the pivot.
+
+        :param data: DataFrame at article x daily (or weekly) level containing values to be aggregated
+        :param index: [article column, period column]
+        :param col: aggregation columns
+        :param agg: type of aggregation, sum or count (the other aggregations are computed by
+                    pivot_values and agg_value)
+        :return: DataFrame at article level with a column for each column and period, then the
+                 aggregation of each column
+        """
+        if agg not in ("sum", "count"):
+            return pd.merge(FeatureEng.pivot_values(data, index=index, col=col, agg=agg),
+                            FeatureEng.agg_value(data, index=index[:1], col=col, agg=agg), on=index[0])
+
+        row_key, column_key = index
+        # The rows with a missing key are dropped, as by groupby
+        data = data.dropna(subset=index)
+        row_codes, rows = pd.factorize(data[row_key], sort=True)
+        column_codes, columns = pd.factorize(data[column_key], sort=True)
+        cells = row_codes * len(columns) + column_codes
+        shape = (len(rows), len(columns))
+
+        pivots, totals = [], []
+        for col_ in col:
+            values = data[col_].to_numpy()
+            present = ~pd.isnull(values)
+            weights = present if agg == "count" else np.where(present, values, 0)
+            pivot = np.bincount(cells, weights=weights, minlength=shape[0] * shape[1]).reshape(shape)
+            # bincount sums in float64: the counts and the integer sums are exact, cast back as groupby
+            if agg == "count":
+                pivot = pivot.astype(np.int64)
+            elif pd.api.types.is_integer_dtype(data[col_].dtype):
+                pivot = pivot.astype(data[col_].dtype)
+            pivots.append(pd.DataFrame(pivot, columns=[f"{col_}_{column}" for column in columns]))
+            totals.append(pd.DataFrame(pivot.sum(axis=1), columns=[f"{col_}_{agg}"]))
+
+        # The pivots, then the totals of each column
+        df = pd.concat([pd.DataFrame({row_key: rows})] + pivots + totals, axis=1)
+        return df
+
     @staticmethod
     def manage_nan_features(data: pd.DataFrame, strategy) -> pd.DataFrame:
         """
@@ -0,0 +1,76 @@
+"""
+This script contains the builder of the cartesian index of the prediction (products x stores x weeks)
+
+The row r of the product of DataFrames of n_1, ..., n_k rows is made of the row
+(r // (n_{i+1} * ... * n_k)) % n_i of each DataFrame i, as a cross merge of the DataFrames in their
+order. The whole index is built with np.repeat / np.tile of the values of each DataFrame, and its
+chunks with integer arithmetic on their range of rows, without building the whole index.
+"""
+
+from typing import Iterator, List
+
+import numpy as np
+import pandas as pd
+
+
+class IndexBuilder:
+    """
+    Cartesian product of the index DataFrames of each granularity
+    """
+
+    def __init__(self, frames: List[pd.DataFrame]):
+        """
+        :param frames: DataFrames of the index values of each granularity, in the order of the
+        columns of the index
+        """
+        self.frames = [frame.reset_index(drop=True) for frame in frames]
+        self.sizes = [len(frame) for frame in self.frames]
+        # Number of rows of the index for a row of each DataFrame
+        self.strides = [int(np.prod(self.sizes[position + 1:], dtype=np.int64))
+                        for position in range(len(self.frames))]
+
+    def __len__(self) -> int:
+        return int(np.prod(self.sizes, dtype=np.int64)) if self.frames else 0
+
+    @property
+    def columns(self) -> list:
+        """Columns of the index"""
+        return [column for frame in self.frames for column in frame.columns]
+
+    def take(self, start: int = 0, stop: int = None) -> pd.DataFrame:
+        """
+        Get rows of the index
+
+        :param start: first row
+        :param stop: row after the last row, the end of the index if not set
+        :return: DataFrame of the rows, with the columns of each DataFrame
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        start = min(start, stop)
+        whole = start == 0 and stop == len(self) and len(self) > 0
+        rows = None if whole else np.arange(start, stop, dtype=np.int64)
+        columns = {}
+        for frame, size, stride in zip(self.frames, self.sizes, self.strides):
+            for column in frame.columns:
+                values = frame[column].to_numpy()
+                if whole:
+                    # Each value is repeated for the rows of the next DataFrames, and the block is
+                    # tiled for the rows of the previous DataFrames
+                    columns[column] = np.tile(np.repeat(values, stride), len(self) // (size * stride))
+                else:
+                    columns[column] = values[(rows // stride) % size]
+        return pd.DataFrame(columns, columns=self.columns)
+
+    def build(self) -> pd.DataFrame:
+        """Get the whole index"""
+        return self.take()
+
+    def chunks(self, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """
+        Get the index by chunks of rows
+
+        :param chunk_size: number of rows of the chunks
+        :return: iterator of the chunks, in the order of the index rows
+        """
+        for start in range(0, len(self), max(1, chunk_size)):
+            yield self.take(start=start, stop=start + chunk_size)
@@ -0,0 +1,168 @@
+"""
+This script contains the dictionary encoding of the granularity keys (products, location, time)
+
+The vocabulary of each key column (its sorted values) is set once per pipeline run, from the
+index of the pipeline. The key columns are then carried as int32 codes: the codes of several keys
+are combined into a single integer, so that a join on the keys is an array lookup of the rows of
+the right DataFrame, and a group-by is a group-by on one integer column. The codes keep the order
+of the values, the outputs are in the order of the joins and group-bys on the values.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DTYPE = np.int32
+
+# Largest number of key combinations joined with a dense lookup table, by row joined
+DENSE_LOOKUP_RATIO = 8
+
+
+def combine_codes(codes: List[np.ndarray], sizes: List[int]) -> np.ndarray:
+    """
+    Combine the codes of several keys into a single integer, in the order of the keys
+
+    :param codes: codes of each key, -1 for a missing value
+    :param sizes: number of values of each key
+    :return: int64 array, -1 if one of the codes is missing
+    """
+    combined = np.zeros(len(codes[0]) if codes else 0, dtype=np.int64)
+    missing = np.zeros(len(combined), dtype=bool)
+    for codes_, size in zip(codes, sizes):
+        combined = combined * size + codes_
+        missing |= codes_ < 0
+    combined[missing] = -1
+    return combined
+
+
+def group_by_keys(df: pd.DataFrame, keys: list, columns: list, agg) -> pd.DataFrame:
+    """
+    Same as df.groupby(keys, as_index=False)[columns].agg(agg), grouped on a single integer
+    combining the codes of the keys
+
+    :param df: input DataFrame
+    :param keys: columns to group by
+    :param columns: columns to aggregate
+    :param agg: aggregation, i.e sum, mean, ...
+    :return: DataFrame with the keys then the aggregated columns, sorted by keys
+    """
+    codes, uniques = zip(*(pd.factorize(df[key], sort=True) for key in keys)) if keys else ((), ())
+    combined = combine_codes(list(codes), [len(uniques_) for uniques_ in uniques])
+    # The rows with a missing key are dropped, as by groupby
+    valid = combined >= 0
+    values = df[columns] if valid.all() else df.loc[valid, columns]
+    grouped = values.groupby(combined[valid], sort=True).agg(agg)
+
+    key_codes = np.unravel_index(grouped.index.to_numpy(), [len(uniques_) for uniques_ in uniques])
+    keys_df = pd.DataFrame({key: uniques_.take(codes_) for key, uniques_, codes_ in zip(keys, uniques, key_codes)})
+    return pd.concat([keys_df, grouped.reset_index(drop=True)], axis=1)
+
+
+class KeyEncoder:
+    """
+    Dictionary encoding of the key columns of the DataFrames of a pipeline
+    """
+
+    def __init__(self, vocabularies: Dict[str, pd.Index]):
+        """
+        :param vocabularies: sorted values of each key column
+        """
+        self.vocabularies = vocabularies
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame, keys: list) -> "KeyEncoder":
+        """
+        Set the vocabulary of the key columns
+
+        :param df: DataFrame containing every value of the keys, i.e the index of the pipeline
+        :param keys: key columns
+        :return: the encoder
+        """
+        return cls(vocabularies={key: pd.Index(pd.unique(df[key].dropna())).sort_values() for key in keys})
+
+    @property
+    def keys(self) -> list:
+        """Key columns encoded"""
+        return list(self.vocabularies)
+
+    def encode(self, df: pd.DataFrame, keys: Optional[list] = None, drop_unknown: bool = False) -> pd.DataFrame:
+        """
+        Replace the values of the key columns of a DataFrame by their codes
+
+        :param df: DataFrame with some of the key columns
+        :param keys: key columns to encode, every key column of the DataFrame if not set
+        :param drop_unknown: to drop the rows with a value which isn't in the vocabulary,
+        otherwise its code is -1
+        :return: DataFrame with int32 codes
+        """
+        keys = [key for key in (self.keys if keys is None else keys) if key in df.columns]
+        codes = {key: self.vocabularies[key].get_indexer(df[key]).astype(DTYPE) for key in keys}
+        df = df.assign(**codes)
+        if drop_unknown and keys:
+            known = np.logical_and.reduce([codes_ >= 0 for codes_ in codes.values()])
+            if not known.all():
+                df = df[known].reset_index(drop=True)
+        return df
+
+    def decode(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Replace the codes of the key columns of a DataFrame by their values"""
+        return df.assign(**{key: self.vocabularies[key].take(df[key].to_numpy()) for key in self.keys
+                            if key in df.columns})
+
+    def codes(self, df: pd.DataFrame, on: list) -> Tuple[np.ndarray, int]:
+        """
+        Get the combined codes of the key columns of an encoded DataFrame
+
+        :param df: encoded DataFrame
+        :param on: key columns
+        :return: int64 codes, and number of combinations of the keys
+        """
+        sizes = [len(self.vocabularies[key]) for key in on]
+        return combine_codes([df[key].to_numpy() for key in on], sizes), int(np.prod(sizes, dtype=np.float64))
+
+    def join(self, left: pd.DataFrame, right: pd.DataFrame, on: list, how: str = "inner") -> pd.DataFrame:
+        """
+        Join two encoded DataFrames on key columns, as left.merge(right, on=on, how=how). When the
+        keys of the right DataFrame are unique, the rows of the right DataFrame are looked up by
+        the codes of the left keys, otherwise the DataFrames are merged.
+
+        :param left: encoded DataFrame
+        :param right: encoded DataFrame
+        :param on: key columns
+        :param how: inner or left
+        :return: joined DataFrame, in the order of the left rows
+        """
+        columns = [column for column in right.columns if column not in on]
+        positions = self.lookup(left, right, on) \
+            if on and set(on) <= set(self.keys) and how in ("inner", "left") \
+            and not set(columns).intersection(left.columns) else None
+        if positions is None or (how == "left" and (positions < 0).any()):
+            return left.merge(right, on=on, how=how)
+
+        found = positions >= 0
+        if not found.all():
+            left, positions = left[found], positions[found]
+        return pd.concat([left.reset_index(drop=True), right[columns].iloc[positions].reset_index(drop=True)],
+                         axis=1)
+
+    def lookup(self, left: pd.DataFrame, right: pd.DataFrame, on: list) -> Optional[np.ndarray]:
+        """
+        Get the position in the right DataFrame of the keys of each left row
+
+        :return: positions, -1 if the keys aren't in the right DataFrame, None if the keys of the
+        right DataFrame aren't unique
+        """
+        left_codes, size = self.codes(left, on)
+        right_codes, _ = self.codes(right, on)
+        right_positions = np.flatnonzero(right_codes >= 0)
+        right_codes = right_codes[right_positions]
+        if len(pd.unique(right_codes)) < len(right_codes):
+            return None
+
+        if size <= DENSE_LOOKUP_RATIO * (len(left) + len(right)):
+            table = np.full(int(size), -1, dtype=np.int64)
+            table[right_codes] = right_positions
+            return np.where(left_codes >= 0, table[np.maximum(left_codes, 0)], -1)
+        positions = pd.Index(right_codes).get_indexer(left_codes)
+        return np.where(positions >= 0, right_positions[positions], -1)
@@ -3,9 +3,13 @@ This script contains configuration file handler
 """
 
 import collections
+import contextlib
+import copy
 import importlib
 import logging
 import os
+import pathlib as pl
+import types
 
 import yaml
 
@@ -15,7 +19,12 @@ class ConfigHandler:
     Class to handle different config file.
     Each file from the yaml directory will be instantiate as a Config object and set as an attribute
     of the ConfigHandler object
+
+    The version is incremented each time the configs change (invalidate, override), so that the
+    configs can be cached by their users.
     """
+
+    version = 0
     @staticmethod
     def __new__(cls, yaml_directory=None):
         """
@@ -48,6 +57,38 @@ class ConfigHandler:
 
         return cls._config
 
+    @classmethod
+    def invalidate(cls) -> None:
+        """Forget the configs loaded, the next instantiation loads the configs of its yaml directory"""
+        if hasattr(cls, "_config"):
+            del cls._config
+        cls.version += 1
+
+    @classmethod
+    @contextlib.contextmanager
+    def override(cls, **configs):
+        """
+        Override configs until the context exits, i.e with ConfigHandler.override(model_config=path):
+
+        :param configs: name of the config: Config object or path of its yaml file
+        """
+        if not hasattr(cls, "_config"):
+            raise RuntimeError("ConfigHandler must be instantiated before overriding its configs")
+        handler = cls._config
+        previous = {name: handler.__dict__.get(name) for name in configs}
+        for name, config in configs.items():
+            setattr(handler, name, config if isinstance(config, Config) else Config(pl.Path(config)))
+        cls.version += 1
+        try:
+            yield handler
+        finally:
+            for name, config in previous.items():
+                if config is None:
+                    delattr(handler, name)
+                else:
+                    setattr(handler, name, config)
+            cls.version += 1
+
 
 class Config(collections.Mapping):
     """
@@ -102,3 +143,105 @@ class Config(collections.Mapping):
     def to_dict(self):
         """return data as a dictionary"""
         return self.__data.to_dict()
+
+
+def freeze(value):
+    """Get a read-only deep copy of a config value: the mappings are FrozenConfig, the lists tuples"""
+    if isinstance(value, collections.Mapping):
+        return FrozenConfig(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return copy.deepcopy(value)
+
+
+class FrozenConfig(collections.Mapping):
+    """
+    Read-only copy of a subtree of the config, whose values are read as items or attributes
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: collections.Mapping):
+        object.__setattr__(self, "_data", types.MappingProxyType({key: freeze(value) for key, value in data.items()}))
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getattr__(self, name):
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("FrozenConfig is read-only")
+
+    def __delattr__(self, item):
+        raise AttributeError("FrozenConfig is read-only")
+
+    def __reduce__(self):
+        return FrozenConfig, (dict(self._data),)
+
+    def __repr__(self):
+        return f"FrozenConfig({dict(self._data)})"
+
+
+class ConfigSnapshot:
+    """
+    Frozen snapshot of the fields of the model config read in the hot paths (loops on data,
+    contexts, features), to read them as plain attributes. The values are read-only copies (see
+    freeze), they don't share any object with the config.
+    """
+
+    __slots__ = ("granularity", "target", "features", "range_week_sales", "nan_strategy",
+                 "information_horizon", "run_mode", "training_context", "prediction_context")
+
+    def __init__(self, config: Config):
+        demand_forecast = config.demand_forecast
+        values = {
+            "granularity": demand_forecast.granularity,
+            "target": demand_forecast.target,
+            "features": demand_forecast.features,
+            "range_week_sales": demand_forecast.range_week_sales,
+            "nan_strategy": demand_forecast.nan_strategy,
+            "information_horizon": config.run_info.information_horizon,
+            "run_mode": config.run_info.run_mode,
+            "training_context": demand_forecast.training_context,
+            "prediction_context": demand_forecast.prediction_context,
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, freeze(value))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("ConfigSnapshot is read-only")
+
+    def __delattr__(self, item):
+        raise AttributeError("ConfigSnapshot is read-only")
+
+
+def apply_overrides(config: dict, overrides: dict) -> dict:
+    """
+    Override values of the config
+
+    :param config: config as a dictionary
+    :param overrides: dictionary dotted key: value, i.e run_info.information_horizon: 2019-05-30
+    :return: the config overridden, the input config is not modified
+    """
+    config = copy.deepcopy(config)
+    for key, value in overrides.items():
+        *parents, name = key.split(".")
+        node = config
+        for parent in parents:
+            if not isinstance(node.get(parent), dict):
+                raise KeyError(f"{key} is not a key of the config")
+            node = node[parent]
+        if name not in node:
+            raise KeyError(f"{key} is not a key of the config")
+        node[name] = value
+    return config
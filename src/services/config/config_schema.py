@@ -1,6 +1,6 @@
 import datetime
 
-from schema import Schema, Optional
+from schema import Schema, Optional, Or
 
 model_config = Schema({
     'run_info': {
@@ -12,10 +12,29 @@ model_config = Schema({
         'random_seed': int,
         'use_cross_validation': bool,
         'nb_folds': int,
+        Optional('cv_splitter'): Or('kfold', 'time_series'),
+        Optional('data_format'): Or('csv', 'parquet', 'feather'),
+        Optional('fetch_partition'): Or(None, 'day', 'week', 'month'),
+        Optional('prediction_chunksize'): Or(None, int),
+        Optional('prediction_workers'): Or(None, int),
     },
 
     'demand_forecast': {
-        'model': dict,
+        'model': {
+            'name': str,
+            'params': dict,
+            Optional('entry_point'): str,
+            Optional('n_threads'): Or(None, int),
+            Optional('matrix'): Or('dense', 'sparse'),
+            Optional('search'): {
+                'enabled': bool,
+                Optional('method'): Or('random', 'halving'),
+                Optional('n_trials'): int,
+                Optional('factor'): int,
+                Optional('metric'): Or('smape', 'bias'),
+                'space': dict,
+            },
+        },
         'features': dict,
         'range_week_sales': int,
         'nan_strategy': str,
@@ -52,6 +71,33 @@ infra_config = Schema({
         'user': str,
         'password': str,
         'database': str,
+        Optional('chunksize'): int,
+        Optional('url'): str,
+        Optional('pool'): {
+            Optional('size'): int,
+            Optional('max_overflow'): int,
+            Optional('recycle'): int,
+            Optional('pre_ping'): bool,
+        },
+    },
+    Optional('data_cache'): {
+        Optional('max_size_mb'): int,
+    },
+    Optional('parallel'): {
+        Optional('executor'): Or('thread', 'process', 'serial'),
+        Optional('max_workers'): int,
+    },
+    Optional('fetch_store'): {
+        Optional('path'): str,
+    },
+    Optional('profiler'): {
+        Optional('cprofile'): bool,
+        Optional('tracemalloc'): bool,
+    },
+    Optional('operator_cache'): {
+        Optional('enabled'): bool,
+        Optional('path'): str,
+        Optional('max_size'): Or(None, int, float),
     }
 })
 
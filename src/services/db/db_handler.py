@@ -2,10 +2,12 @@
 This script contains database handler
 """
 
-from traceback import print_exc
+import csv
+import io
+import os
+import threading
 
 import pandas as pd
-from sqlalchemy import create_engine
 
 from src.services.config.config_handler import ConfigHandler
 
@@ -13,49 +15,117 @@ from src.services.config.config_handler import ConfigHandler
 class DbHandler:
     """
     Class containing database handler object.
+
+    The SQLAlchemy engine, and its pool of connections, is created once by process and database,
+    then shared by every DbHandler of the process.
     """
 
+    # Default number of rows by chunk when a query result is streamed
+    CHUNKSIZE = 100000
+
+    # Default settings of the connection pool, overridden by db.pool in the infra config
+    POOL = {"size": 5, "max_overflow": 10, "recycle": 3600, "pre_ping": True}
+
+    # Engines by (process id, database url)
+    _engines = {}
+    _engines_lock = threading.Lock()
+
     def __init__(self):
 
         # Loading infra configuration file
         _config = ConfigHandler().infra_config
+        self.chunksize = _config.db.get("chunksize", self.CHUNKSIZE)
+        self._engine = self.get_engine(_config.db)
 
-        conn_string = (
-            f"postgresql://{_config.db.user}:{_config.db.password}@"
-            f"{_config.db.host}:{_config.db.port}/{_config.db.database}"
+    @staticmethod
+    def get_url(db_config) -> str:
+        """Returns the url of the database: db.url if set (i.e a SQLite file), else the postgres url"""
+        if db_config.get("url"):
+            return db_config.url
+        return (
+            f"postgresql://{db_config.user}:{db_config.password}@"
+            f"{db_config.host}:{db_config.port}/{db_config.database}"
         )
-        self._engine = create_engine(conn_string)
+
+    @classmethod
+    def get_engine(cls, db_config):
+        """Returns the engine of the process for the database, created on first access
+
+        :param db_config: db section of the infra config
+        """
+        from sqlalchemy import create_engine
+
+        url = cls.get_url(db_config)
+        key = (os.getpid(), url)
+        with cls._engines_lock:
+            if key not in cls._engines:
+                # The engines of a parent process can't be used in a forked process: their
+                # connections are shared with the parent. They are dropped without being disposed.
+                cls._engines = {key_: engine for key_, engine in cls._engines.items()
+                                if key_[0] == os.getpid()}
+                cls._engines[key] = create_engine(url, **cls.get_pool_kwargs(url, db_config.get("pool")))
+            return cls._engines[key]
+
+    @classmethod
+    def get_pool_kwargs(cls, url: str, pool_config: dict = None) -> dict:
+        """Returns the pool parameters of `create_engine`, from the pool config and the defaults"""
+        pool = {**cls.POOL, **(pool_config or {})}
+        kwargs = {"pool_recycle": pool["recycle"], "pool_pre_ping": pool["pre_ping"]}
+        # SQLite engines use their own pool implementation, without size
+        if not url.startswith("sqlite"):
+            kwargs.update(pool_size=pool["size"], max_overflow=pool["max_overflow"])
+        return kwargs
+
+    @classmethod
+    def dispose_engines(cls) -> None:
+        """Closes the connections of the engines of the process and forgets them"""
+        with cls._engines_lock:
+            for (pid, _), engine in cls._engines.items():
+                if pid == os.getpid():
+                    engine.dispose()
+            cls._engines = {}
+
+    def pool_status(self) -> dict:
+        """Returns the metrics of the connection pool of the engine"""
+        pool = self._engine.pool
+        status = {"pool": pool.__class__.__name__}
+        for metric in ("size", "checkedin", "checkedout", "overflow"):
+            if callable(getattr(pool, metric, None)):
+                status[metric] = getattr(pool, metric)()
+        return status
+
+    @property
+    def dialect(self) -> str:
+        """Returns the name of the SQL dialect of the database, i.e postgresql or sqlite"""
+        return self._engine.dialect.name
 
     @property
     def connection(self):
-        import psycopg2
-        """Returns a connection to the database"""
-        _config = ConfigHandler().infra_config
-        return psycopg2.connect(
-            host=_config.db.host,
-            port=_config.db.port,
-            user=_config.db.user,
-            password=_config.db.password,
-            database=_config.db.database,
-        )
+        """Returns a DBAPI connection of the pool, closing it gives it back to the pool"""
+        return self._engine.raw_connection()
 
     def execute(self, sql):
-        """Executes a SQL query
+        """Executes a SQL query, on a connection of the pool
 
         :param sql : SQL query
         """
-        import psycopg2
+        # Imported here, the service provider imports this module
+        from src.services.service_provider import ServiceProviderHandler  # pylint: disable=import-outside-toplevel
+        service = ServiceProviderHandler()
         connection = self.connection
+        cur = None
         try:
-            with connection.cursor() as cur:
-                cur.execute(sql)
-                connection.commit()
-                print(sql)
-        except (Exception, psycopg2.DatabaseError) as error:
-            print(f"\033[91mError: {error}\033[0m")
-            print_exc()
+            cur = connection.cursor()
+            cur.execute(sql)
+            connection.commit()
+            service.log.debug(sql)
+        except Exception as error:  # pylint: disable=broad-except
+            connection.rollback()
+            service.log.error(f"Error: {error}\n{sql}", exc_info=True)
         finally:
-            cur.close()
+            if cur is not None:
+                cur.close()
+            connection.close()
 
     def write(self, df, table_name, *args, **kwargs):
         """Writes a DataFrame to the db
@@ -65,6 +135,49 @@ class DbHandler:
         """
         df.to_sql(name=table_name, con=self._engine, *args, **kwargs)
 
+    def bulk_write(self, df, table_name, if_exists="replace", index=False, chunksize: int = None):
+        """Writes a large DataFrame to the db by chunks.
+        On postgres, each chunk is loaded with COPY FROM STDIN from an in-memory csv buffer, which
+        is much faster than INSERT statements. Other databases use multi-rows INSERT statements (executemany on SQLite).
+
+        :param df: pandas DataFrame to write
+        :param table_name: name of the table
+        :param if_exists: behavior if the table exists (see `pandas.DataFrame.to_sql`)
+        :param index: whether the index is written as a column
+        :param chunksize: number of rows by chunk, if None the chunksize of the infra config
+        """
+        chunksize = chunksize or self.chunksize
+        if self.dialect == "postgresql":
+            method = self.copy_from_stdin
+        elif self.dialect == "sqlite":
+            # executemany is the fastest insert of SQLite, which limits the variables of a statement
+            method = None
+        else:
+            method = "multi"
+
+        # Create the table from the types of the DataFrame, then load the rows
+        df.head(0).to_sql(name=table_name, con=self._engine, if_exists=if_exists, index=index)
+        df.to_sql(name=table_name, con=self._engine, if_exists="append", index=index,
+                  chunksize=chunksize, method=method)
+
+    @staticmethod
+    def copy_from_stdin(table, connection, keys, data_iter):
+        """Inserts rows with COPY FROM STDIN, used as `method` of `pandas.DataFrame.to_sql`
+
+        :param table: pandas SQLTable to insert into
+        :param connection: SQLAlchemy connection
+        :param keys: names of the columns
+        :param data_iter: iterable of the rows to insert
+        """
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(data_iter)
+        buffer.seek(0)
+
+        columns = ", ".join(f'"{key}"' for key in keys)
+        table_name = f'"{table.schema}"."{table.name}"' if table.schema else f'"{table.name}"'
+        with connection.connection.cursor() as cur:
+            cur.copy_expert(sql=f"COPY {table_name} ({columns}) FROM STDIN WITH CSV", file=buffer)
+
     def read(self, sql, *args, **kwargs):
         """Reads a DataFrame from a SQL query, using pd.read_sql
 
@@ -72,3 +185,27 @@ class DbHandler:
         :returns: the SQL table as a pandas DataFrame
         """
         return pd.read_sql(sql, self._engine, *args, **kwargs)
+
+    def read_chunks(self, sql, chunksize: int = None):
+        """Reads DataFrame chunks from a SQL query, using a server-side cursor so that only one
+        chunk of the result set is held in memory (on the client and in the driver buffer)
+
+        :param sql: query to execute to retrieve the DataFrame
+        :param chunksize: number of rows by chunk, if None the chunksize of the infra config
+        :returns: generator of pandas DataFrames, at least one (empty if the query returns no row)
+        """
+        from sqlalchemy import text
+
+        chunksize = chunksize or self.chunksize
+        with self._engine.connect() as connection:
+            result = connection.execution_options(stream_results=True).execute(text(sql))
+            columns = list(result.keys())
+            empty = True
+            while True:
+                rows = result.fetchmany(chunksize)
+                if not rows:
+                    break
+                empty = False
+                yield pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+            if empty:
+                yield pd.DataFrame(columns=columns)
@@ -16,6 +16,8 @@ class Container:
     INFO = "info.yaml"
     CONFIG = "model_config.yaml"
     OUTPUT = "output.yaml"
+    PROFILE = "profile.yaml"
+    PROFILE_STATS = "profile"
 
     # TRAINING & PREDICTION FILES:
     TRAINING = "training"
@@ -26,12 +28,18 @@ class Container:
     DATA_INPUT = "data_input.csv"
     DEMAND_MODEL = "demand.pkl"
     TRAINING_CONTEXT = "training_context.yaml"
+    CV_METRICS = "cross_validation.yaml"
+    SEARCH = "search.yaml"
 
     DEMAND_PREDICTION = "demand_predictions.csv"
     PREDICTION_CONTEXT = "prediction_context.yaml"
 
     DEMAND_BACKTEST = "demand_backtest.csv"
 
+    # DATA FORMATS: extension of the DataFrame files, depending on the format of the scenario
+    DATA_FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+    DEFAULT_DATA_FORMAT = "csv"
+    DATA_FILES = ["PRODUCTS", "TRANSACTIONS", "DATA_INPUT", "DEMAND_PREDICTION", "DEMAND_BACKTEST"]
 
     TRAINING_INIT_STAGE = Stage(name=Stage.TRAINING_INIT,
                                 parent=TRAINING,
@@ -80,10 +88,18 @@ class Container:
                                         parent=PREDICTION,
                                         children=[DEMAND_BACKTEST])
 
-    def __init__(self, location):
+    def __init__(self, location, data_format: str = DEFAULT_DATA_FORMAT):
+
+        if data_format not in self.DATA_FORMATS:
+            raise ValueError(f"Data format {data_format} unknown, use one of {list(self.DATA_FORMATS)}")
 
         self.build_hierarchy()
         self.storage_location = location
+        self.data_format = data_format
+
+        # DataFrame files follow the data format of the container
+        for file_name in self.DATA_FILES:
+            setattr(self, file_name, self.format_file(getattr(Container, file_name), data_format))
 
     @classmethod
     def build_hierarchy(cls):
@@ -105,6 +121,19 @@ class Container:
 
         return stages
 
+    @classmethod
+    def format_file(cls, file_name: str, data_format: str) -> str:
+        """Return the file name with the extension of the data format if it is a DataFrame file"""
+        path = pl.Path(file_name)
+        if path.suffix in cls.DATA_FORMATS.values():
+            return path.stem + cls.DATA_FORMATS[data_format]
+        return file_name
+
+    @classmethod
+    def is_data_file(cls, file_name: Union[str, pl.Path]) -> bool:
+        """Return whether the file is a DataFrame file"""
+        return pl.Path(file_name).suffix in cls.DATA_FORMATS.values()
+
     @classmethod
     def get_stage(cls, stage: str):
         if stage in Stage.STAGES:
@@ -1,7 +1,11 @@
 import os
 import pathlib as pl
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from shutil import copyfile
 
+from ..profiler.profiler_handler import ProfilerHandler
+from .partition import PartitionedData
 from .read_service import DataReadService
 from .write_service import DataWriteService
 
@@ -14,6 +18,24 @@ class FileSystemHandler:
         self._read_service = DataReadService()
         self._write_service = DataWriteService()
 
+    @staticmethod
+    def _count_read(func):
+        """Wrap a function of the DataReadService, to count the bytes read in the current profile"""
+        def read(src, *args, **kwargs):
+            obj = func(src, *args, **kwargs)
+            ProfilerHandler().add(bytes_read=os.path.getsize(src))
+            return obj
+        return read
+
+    @staticmethod
+    def _count_write(func):
+        """Wrap a function of the DataWriteService, to count the bytes written in the current profile"""
+        def write(obj, dst, *args, **kwargs):
+            result = func(obj, dst, *args, **kwargs)
+            ProfilerHandler().add(bytes_written=os.path.getsize(dst))
+            return result
+        return write
+
     @staticmethod
     def exists(path: str) -> bool:
         """
@@ -36,6 +58,39 @@ class FileSystemHandler:
 
         copyfile(path_from, os_path)
 
+    @staticmethod
+    def stat(path: str) -> os.stat_result:
+        """
+        Get the status of a file, the watermark gives the version of a partitioned DataFrame
+        """
+        if PartitionedData.is_partitioned(path):
+            return os.stat(pl.Path(path) / PartitionedData.WATERMARK)
+        return os.stat(path)
+
+    @staticmethod
+    def partitions(dst: pl.Path, fmt="csv") -> PartitionedData:
+        """Get the date-partitioned DataFrame stored under dst"""
+        return PartitionedData(path=dst, fmt=fmt)
+
+    def write_partitions(self, df, dst, start, end, column: str, freq: str, fmt="csv",
+                         read_kwargs: dict = None, **write_kwargs):
+        """
+        Write the rows of the date range [start, end] of a DataFrame in the partitions under dst,
+        the rows of this range already stored are replaced
+
+        :param read_kwargs: parameters to read the partitions to complete
+        """
+        write_func = getattr(self._write_service, fmt, None)
+        read_func = getattr(self._read_service, fmt, None)
+        if write_func is None or read_func is None:
+            raise NameError("Format %s not recognized" % fmt)
+        write_func, read_func = self._count_write(write_func), self._count_read(read_func)
+
+        read_kwargs = read_kwargs or {}
+        return self.partitions(dst, fmt=fmt).write(
+            df, start=start, end=end, column=column, freq=freq, write=write_func,
+            read=lambda src: read_func(src, **read_kwargs), **write_kwargs)
+
     def write(self, obj, dst, fmt="csv", **write_kwargs):
         """Utility to write objects to the file system, using the DataWriteService"""
         # Get the function that generates the output
@@ -46,18 +101,89 @@ class FileSystemHandler:
         # Get the relative path
         pl.Path(dst.parent).mkdir(parents=True, exist_ok=True)
 
-        return func(
+        return self._count_write(func)(
             obj,
             dst,
             **write_kwargs,
         )
 
+    def write_chunks(self, chunks, dst, fmt="csv", **write_kwargs) -> int:
+        """
+        Utility to write DataFrame chunks in a single file as they come, using the DataWriteService,
+        so that only one chunk is held in memory
+
+        :return: number of rows written
+        """
+        func = getattr(self._write_service, f"{fmt}_chunks", None)
+        if func is None:
+            raise NameError("Format %s not recognized" % fmt)
+
+        pl.Path(dst.parent).mkdir(parents=True, exist_ok=True)
+
+        return self._count_write(func)(
+            chunks,
+            dst,
+            **write_kwargs,
+        )
+
+    def write_chunks_many(self, chunks, dsts: list, fmt="csv", **write_kwargs) -> list:
+        """
+        Utility to write tuples of DataFrame chunks in several files as they come: the i-th DataFrame
+        of each tuple is appended to the i-th file. Each file is written by a thread from a queue of
+        a single chunk, so that only one tuple is held in memory.
+
+        :return: number of rows written in each file
+        """
+        queues = [queue.Queue(maxsize=1) for _ in dsts]
+        record = ProfilerHandler().current()
+
+        def write(queue_, dst):
+            with ProfilerHandler().attach(record):
+                return self.write_chunks(self._drain(queue_), dst, fmt=fmt, **write_kwargs)
+
+        with ThreadPoolExecutor(max_workers=len(dsts)) as pool:
+            futures = [pool.submit(write, queue_, dst) for queue_, dst in zip(queues, dsts)]
+            try:
+                for parts in chunks:
+                    for queue_, future, part in zip(queues, futures, parts):
+                        if not self._put(queue_, future, part):
+                            future.result()
+            finally:
+                for queue_, future in zip(queues, futures):
+                    self._put(queue_, future, None)
+            return [future.result() for future in futures]
+
+    @staticmethod
+    def _drain(queue_: queue.Queue):
+        """Get the chunks of a queue until the end of the chunks (None)"""
+        while True:
+            chunk = queue_.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    @staticmethod
+    def _put(queue_: queue.Queue, future, chunk) -> bool:
+        """Put a chunk in the queue of a writer, return False if the writer has stopped"""
+        while not future.done():
+            try:
+                queue_.put(chunk, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
     def read(self, dst, fmt="csv", **read_kwargs):
         """Utility to read objects from the file system, using the DataWriteService"""
         # Get the function that reads from the fs
         func = getattr(self._read_service, fmt, None)
         if func is None:
             raise NameError("Format %s not recognized" % fmt)
+        func = self._count_read(func)
+
+        # Partitioned DataFrame
+        if os.path.isdir(dst):
+            return self.partitions(dst, fmt=fmt).read(func, **read_kwargs)
 
         return func(
             dst,
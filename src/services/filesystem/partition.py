@@ -0,0 +1,221 @@
+"""
+This script contains the date-partitioned storage of DataFrames.
+
+A partitioned DataFrame is a directory named like the data file (i.e `transactions.parquet/`)
+containing one file by period, named by the first day of the period (i.e `2020-01-06.parquet`),
+and a watermark file giving the date range covered by the partitions.
+
+Partitions shared by several processes (see `DataProcess.fetch_partitions`) are updated under the
+file lock of the partitioned DataFrame, on POSIX platforms.
+"""
+
+import contextlib
+import os
+import pathlib as pl
+from shutil import rmtree
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+import yaml
+
+
+class PartitionedData:
+    """
+    Date-partitioned storage of a DataFrame, with a watermark to fetch only the missing periods
+    """
+
+    WATERMARK = "_watermark.yaml"
+
+    # Pandas period frequency of each partition
+    FREQUENCIES = {"day": "D", "week": "W", "month": "M"}
+
+    def __init__(self, path: pl.Path, fmt: str):
+        self.path = pl.Path(path)
+        self.fmt = fmt
+
+    @classmethod
+    def is_partitioned(cls, path) -> bool:
+        """Return whether the path is a partitioned DataFrame"""
+        return os.path.isfile(pl.Path(path) / cls.WATERMARK)
+
+    @property
+    def watermark(self) -> dict:
+        """Get the watermark: partition column, frequency, date range covered and query filters"""
+        if not self.is_partitioned(self.path):
+            return {}
+        with open(self.path / self.WATERMARK, "r") as _file:
+            return yaml.safe_load(_file)
+
+    @watermark.setter
+    def watermark(self, watermark: dict):
+        """Write the watermark, it must be written after the partitions"""
+        with open(self.path / self.WATERMARK, "w") as _file:
+            yaml.safe_dump(watermark, _file, default_flow_style=False)
+
+    def partitions(self) -> List[pl.Path]:
+        """Return the partition files, sorted by period"""
+        if not self.path.is_dir():
+            return []
+        return sorted(path for path in self.path.iterdir() if path.suffix == f".{self.fmt}")
+
+    def partition_path(self, period: pd.Period) -> pl.Path:
+        """Return the path of the file of the period"""
+        return self.path / f"{period.start_time.strftime('%Y-%m-%d')}.{self.fmt}"
+
+    @contextlib.contextmanager
+    def lock(self):
+        """
+        Lock the partitions against the other processes (and threads), until the context exits.
+        Without fcntl (non-POSIX platforms), the partitions are not locked.
+        """
+        try:
+            import fcntl
+        except ImportError:
+            yield self
+            return
+
+        lock_path = self.path.with_name(f".{self.path.name}.lock")
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield self
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def reset(self) -> None:
+        """Remove every partition (or the single file if the DataFrame was not partitioned)"""
+        if self.path.is_dir():
+            rmtree(self.path)
+        elif self.path.exists():
+            os.remove(self.path)
+
+    def missing_ranges(self, start: pd.Timestamp, end: pd.Timestamp, freq: str,
+                       filters: dict) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """
+        Get the date ranges of [start, end] not covered by the watermark.
+        The partitions are reset when they cannot be completed by a contiguous range, or were
+        fetched with other filters or frequency.
+
+        :param start: first date needed
+        :param end: last date needed
+        :param freq: partition frequency, one of FREQUENCIES
+        :param filters: filters of the query (products, location, ...)
+        :return: list of (start, end) ranges to fetch, both included
+        """
+        watermark = self.watermark
+        if not watermark or watermark.get("freq") != freq or watermark.get("filters") != filters:
+            self.reset()
+            return [(start, end)]
+
+        low, high = pd.Timestamp(watermark["low"]), pd.Timestamp(watermark["high"])
+        one_day = pd.Timedelta(days=1)
+        if start > high + one_day or end < low - one_day:
+            self.reset()
+            return [(start, end)]
+
+        ranges = []
+        if start < low:
+            ranges.append((start, low - one_day))
+        # The last day covered is fetched again, it may have been partially loaded
+        if end >= high:
+            ranges.append((high, end))
+        return ranges
+
+    def write(self, df: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp, column: str,
+              freq: str, write: Callable, read: Callable, **write_kwargs) -> None:
+        """
+        Write the rows of a date range in the partitions: the rows of the range already stored
+        are replaced by the rows of df
+
+        :param df: DataFrame of the range
+        :param start: first date of the range
+        :param end: last date of the range
+        :param column: date column to partition on
+        :param freq: partition frequency, one of FREQUENCIES
+        :param write: function writing a DataFrame, write(df, dst, **write_kwargs)
+        :param read: function reading a partition, read(src)
+        :param write_kwargs: parameters to be passed to the write function
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        periods = df[column].dt.to_period(self.FREQUENCIES[freq])
+
+        for period in pd.period_range(start=start, end=end, freq=self.FREQUENCIES[freq]):
+            dst = self.partition_path(period)
+            partition = df[periods == period]
+            if dst.exists():
+                stored = read(dst)
+                stored = stored[(stored[column] < start) | (stored[column] > end)]
+                partition = pd.concat([stored, partition], ignore_index=True)
+            if partition.empty:
+                if dst.exists():
+                    os.remove(dst)
+                continue
+
+            partition = partition.sort_values(column, kind="mergesort").reset_index(drop=True)
+            # Write then rename, so that a partition is never partially written
+            tmp = dst.with_name(f".{dst.name}.tmp")
+            write(partition, tmp, **write_kwargs)
+            os.replace(tmp, dst)
+
+    def update_watermark(self, start: pd.Timestamp, end: pd.Timestamp, column: str, freq: str,
+                         filters: dict, max_date: Optional[pd.Timestamp]) -> None:
+        """
+        Extend the watermark with a fetched range. The high watermark is the last date observed,
+        so that the dates without data yet are fetched again on the next run.
+
+        :param start: first date fetched
+        :param end: last date fetched
+        :param column: date column of the partitions
+        :param freq: partition frequency
+        :param filters: filters of the query
+        :param max_date: last date observed in the fetched data, None if no data
+        """
+        watermark = self.watermark
+        low = min(start, pd.Timestamp(watermark["low"])) if watermark else start
+        high = pd.Timestamp(watermark["high"]) if watermark else start
+        if max_date is not None and not pd.isnull(max_date):
+            high = max(high, min(pd.Timestamp(max_date), end))
+
+        self.watermark = {"column": column, "freq": freq, "filters": filters,
+                          "low": low.strftime("%Y-%m-%d"), "high": high.strftime("%Y-%m-%d")}
+
+    def read(self, read: Callable, columns: list = None, filters: list = None,
+             **kwargs) -> pd.DataFrame:
+        """
+        Read the partitions. The partitions out of the date filters are not read.
+
+        :param read: function reading a partition, read(src, columns=, filters=, **kwargs)
+        :param columns: columns to read, None means every column
+        :param filters: list of (column, op, value) to filter rows with
+        :param kwargs: other parameters to read partitions with
+        :return: DataFrame with data loaded
+        """
+        watermark = self.watermark
+        partitions = self.partitions()
+        if not partitions:
+            return pd.DataFrame(columns=columns)
+
+        selected = [path for path in partitions if self._match(path, watermark, filters)]
+        if not selected:
+            return read(partitions[0], columns=columns, filters=filters, **kwargs).iloc[:0]
+
+        return pd.concat([read(path, columns=columns, filters=filters, **kwargs) for path in selected],
+                         ignore_index=True)
+
+    def _match(self, path: pl.Path, watermark: dict, filters: list = None) -> bool:
+        """Return whether the period of the partition can match the date filters"""
+        if not filters or not watermark:
+            return True
+
+        period = pd.Period(path.stem, freq=self.FREQUENCIES[watermark["freq"]])
+        period_start, period_end = period.start_time, period.end_time
+        for column, op, value in filters:
+            if column != watermark["column"]:
+                continue
+            value = pd.Timestamp(value)
+            if op in (">=", ">") and period_end < value:
+                return False
+            if op in ("<=", "<") and period_start > value:
+                return False
+        return True
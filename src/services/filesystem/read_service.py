@@ -2,6 +2,7 @@
 This script contains service to read files
 """
 
+import operator
 import pickle
 from typing import Any
 
@@ -12,8 +13,18 @@ import yaml
 class DataReadService:
     """
     Service aiming to read files
+
+    DataFrame readers accept a column projection (`columns`) and a row predicate (`filters`),
+    pushed down into the reader as much as the format allows. Filters are a list of
+    (column, op, value) tuples combined with AND, i.e [("date", ">=", start), ("date", "<=", end)]
     """
 
+    # Number of rows read at once when a csv file is filtered
+    CSV_CHUNKSIZE = 500000
+
+    OPERATORS = {"==": operator.eq, "=": operator.eq, "!=": operator.ne, "<": operator.lt,
+                 "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
     @staticmethod
     def _read_df(func, src: str, **kwargs) -> pd.DataFrame:
         """
@@ -22,29 +33,121 @@ class DataReadService:
         return func(src, **kwargs)
 
     @staticmethod
-    def csv(src: str, **kwargs) -> pd.DataFrame:
+    def _filter_df(df: pd.DataFrame, filters: list = None) -> pd.DataFrame:
+        """
+        Keep the rows of the DataFrame matching every filter
+
+        :param df: DataFrame to filter
+        :param filters: list of (column, op, value), op is one of OPERATORS or "in"
+        :return: DataFrame filtered
         """
-        Read csv file
+        if not filters:
+            return df
+
+        mask = pd.Series(True, index=df.index)
+        for column, op, value in filters:
+            if op == "in":
+                mask &= df[column].isin(value)
+            else:
+                mask &= DataReadService.OPERATORS[op](df[column], value)
+        return df.loc[mask]
+
+    @staticmethod
+    def _filter_columns(columns: list = None, filters: list = None) -> list:
+        """
+        Columns to read to apply the filters: the columns requested and the filtered columns
+
+        :param columns: columns requested, None means every column
+        :param filters: list of (column, op, value)
+        :return: columns to read, None means every column
+        """
+        if columns is None:
+            return None
+        return list(dict.fromkeys(list(columns) + [column for column, _, _ in filters or []]))
+
+    @staticmethod
+    def csv(src: str, columns: list = None, filters: list = None, **kwargs) -> pd.DataFrame:
+        """
+        Read csv file. When filters are given, the file is read by chunks and each chunk is
+        filtered, so that only the rows needed are materialized.
 
         :param src: path where the file is stored
+        :param columns: columns to read, None means every column
+        :param filters: list of (column, op, value) to filter rows with
         :param kwargs: other parameters to read file with
         :return: DataFrame with data loaded
         """
+        if columns is not None:
+            kwargs["usecols"] = columns
+
+        if not filters:
+            return DataReadService._read_df(func=pd.read_csv, src=src, **kwargs)
+
+        if columns is not None:
+            kwargs["usecols"] = DataReadService._filter_columns(columns, filters)
+        kwargs.setdefault("chunksize", DataReadService.CSV_CHUNKSIZE)
+        chunks = [DataReadService._filter_df(chunk, filters)
+                  for chunk in DataReadService._read_df(func=pd.read_csv, src=src, **kwargs)]
+        if chunks:
+            df = pd.concat(chunks, ignore_index=True)
+        else:
+            kwargs.pop("chunksize")
+            df = DataReadService._read_df(func=pd.read_csv, src=src, nrows=0, **kwargs)
+        # The filtered columns not requested are dropped, the columns keep the order of the file
+        return df if columns is None else df[[column for column in df.columns if column in columns]]
+
+    @staticmethod
+    def parquet(src: str, columns: list = None, filters: list = None, **kwargs) -> pd.DataFrame:
+        """
+        Read parquet file, columns are typed with the schema stored in the file.
+        Only the columns requested (and the filtered columns) are read, then the rows are filtered.
+        The filters aren't passed to pyarrow: its legacy reader (pyarrow 0.17) only accepts filters on
+        the partition keys of a partitioned dataset, and fails on a single file.
+
+        :param src: path where the file is stored
+        :param columns: columns to read, None means every column
+        :param filters: list of (column, op, value) to filter rows with
+        :param kwargs: other parameters to read file with
+        :return: DataFrame with data loaded
+        """
+        df = DataReadService._read_df(func=pd.read_parquet, src=src,
+                                      columns=DataReadService._filter_columns(columns, filters),
+                                      memory_map=True, **kwargs)
+        df = DataReadService._filter_df(df, filters).reset_index(drop=True)
+        return df if columns is None else df[columns]
+
+    @staticmethod
+    def feather(src: str, columns: list = None, filters: list = None, **kwargs) -> pd.DataFrame:
+        """
+        Read feather (Arrow IPC) file, columns are typed with the schema stored in the file.
+        The file is memory-mapped so that only the columns requested are read from disk.
+
+        :param src: path where the file is stored
+        :param columns: columns to read, None means every column
+        :param filters: list of (column, op, value) to filter rows with
+        :param kwargs: other parameters to be passed to `pyarrow.feather.read_table`
+        :return: DataFrame with data loaded
+        """
+        from pyarrow import feather
 
-        return DataReadService._read_df(func=pd.read_csv, src=src, **kwargs)
+        table = feather.read_table(src, columns=DataReadService._filter_columns(columns, filters),
+                                   memory_map=True, **kwargs)
+        df = DataReadService._filter_df(table.to_pandas(), filters).reset_index(drop=True)
+        return df if columns is None else df[columns]
 
     @staticmethod
-    def pickle(src: str, **kwargs) -> Any:
+    def pickle(src: str, unpickler: type = pickle.Unpickler, **kwargs) -> Any:
         """
         Read pickle object
 
         :param src: path where the object is saved
-        :param kwargs: other parameters to be passed to `pickle.load`
+        :param unpickler: subclass of pickle.Unpickler resolving the classes of the object
+        :param kwargs: other parameters to be passed to the unpickler
         :return: Object stores under src
         """
 
         with open(src, "rb") as _file:
-            data = pickle.load(_file, **kwargs)
+            data = unpickler(_file, **kwargs).load()
         return data
 
     @staticmethod
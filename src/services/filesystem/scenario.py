@@ -5,12 +5,11 @@ import hashlib
 import os
 import pathlib as pl
 import time
-import git
 import pandas as pd
 import yaml
 from typing import Union
 
-from src.services.config.config_handler import Config
+from src.services.config.config_handler import Config, apply_overrides
 from src.services.filesystem.container import Container
 from src.services.service_provider import ServiceProviderHandler
 from src.tasks.stages import Stage
@@ -33,17 +32,21 @@ class Scenario(Container):
     config, code, data, model, score,...
     """
 
-    extension = {".pkl": "pickle", ".csv": "csv", ".yaml": "yaml"}
+    extension = {".pkl": "pickle", ".csv": "csv", ".parquet": "parquet", ".feather": "feather",
+                 ".yaml": "yaml"}
 
     def __init__(self, input_path: str = None, name: str = None,
                  config: "Config" = None,
                  init: bool = True):
 
-        super(Scenario, self).__init__(location=pl.Path(f"{input_path}/{name}"))
+        data_format = self.get_data_format(config if init else self._config)
+        super(Scenario, self).__init__(location=pl.Path(f"{input_path}/{name}"),
+                                       data_format=data_format)
 
         if init:
             self._config = config
             self._output = {}
+            self._overrides = {}
             self._name = name
             self._storage_location = self.storage_location
             self._dtcreated = time.time()
@@ -53,6 +56,11 @@ class Scenario(Container):
             self._hash = self.hash
         else:
             self.__dict__.update(self._info)
+            # A loaded scenario is located where it has been loaded from
+            self.storage_location = self._storage_location
+            output_path = self.storage_location / Container.OUTPUT
+            self._output = (SERVICE.fs.read(output_path, fmt="yaml") or {}) if output_path.is_file() else {}
+            self._overrides = {}
 
     @classmethod
     def load(cls, scenario_path: str):
@@ -72,6 +80,13 @@ class Scenario(Container):
                 f" {invalid_file} are missing")
         return cls(init=False)
 
+    @staticmethod
+    def get_data_format(config: "Config") -> str:
+        """Get the storage format of the DataFrame files from the config (csv by default)"""
+        if config is None:
+            return Container.DEFAULT_DATA_FORMAT
+        return config.run_param.get("data_format") or Container.DEFAULT_DATA_FORMAT
+
     @property
     def stage(self) -> Union[str, "Stage"]:
         """Get the current stage of the scenario"""
@@ -122,6 +137,11 @@ class Scenario(Container):
         """Update output dictionary"""
         self._output.update({key: value})
 
+    @property
+    def overrides(self) -> dict:
+        """Get the overrides applied to the config by update_config, dotted key: value"""
+        return self._overrides
+
     @property
     def location(self):
         """Get the location of the scenario (path)"""
@@ -155,6 +175,8 @@ class Scenario(Container):
     @property
     def git_hash(self):
         """Get the current commit hash"""
+        import git
+
         repo = git.Repo(search_parent_directories=True)
         sha = repo.head.object.hexsha
         return sha
@@ -169,11 +191,35 @@ class Scenario(Container):
         dst = self.relpath(path=Container.CONFIG)
         SERVICE.fs.write(self._config.to_dict(), dst, fmt="yaml")
 
+    def update_config(self, overrides: dict) -> None:
+        """
+        Override values of the config, then save it in location / model_config.yml
+
+        :param overrides: dictionary dotted key: value, i.e demand_forecast.model.params: {...}
+        """
+        dst = self.relpath(path=Container.CONFIG)
+        SERVICE.fs.write(apply_overrides(self._config.to_dict(), overrides), dst, fmt="yaml")
+        self._config = Config(pl.Path(dst))
+        self._overrides.update(overrides)
+
     def save_output(self) -> None:
         """Save the output in location / output.yml"""
         dst = self.relpath(path=Container.OUTPUT)
         SERVICE.fs.write(self._output, dst, fmt="yaml")
 
+    def save_profile(self, record: "ProfileRecord") -> None:
+        """
+        Save the measures of a profiled run in location / profile.yaml, and the cProfile stats of
+        its records in location / profile / <record name>.prof
+        """
+        dst = self.relpath(path=Container.PROFILE)
+        SERVICE.fs.write(record.to_dict(), dst, fmt="yaml")
+        for record_ in SERVICE.profiler.cprofile_records(record):
+            name = "".join(char if char.isalnum() else "_" for char in record_.name)
+            dst = self.relpath(path=pl.Path(Container.PROFILE_STATS) / f"{name}.prof")
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            record_.cprofile.dump_stats(str(dst))
+
     def save(self) -> None:
         """save different meta info file"""
         self.save_config()
@@ -190,20 +236,22 @@ class Scenario(Container):
         :param stage:
         :return: invalid file
         """
+        data_format = Scenario.get_data_format(config)
         for stage_ in Scenario.stages():
             for file_ in stage_.children:
 
-                file_ = path / stage_.path / file_
+                file_ = path / stage_.path / Scenario.format_file(file_, data_format)
                 # Input data are not required, continue
                 if stage_.name in [Stage.TRAINING_FETCHED,
                                    Stage.PREDICTION_FETCHED]:
-                    if file_.suffix == ".csv":
+                    if Scenario.is_data_file(file_):
                         continue
                 if config.run_info.run_mode != "backtest" and stage_ in [
                     Stage.PREDICTION_BACKTESTINGFETCHED,
                     Stage.PREDICTION_BACKTESTED]:
                     continue
-                check = file_.is_file()
+                # DataFrames can be stored in a directory of partitions
+                check = file_.is_file() or file_.is_dir()
                 if not check:
                     yield file_
 
@@ -246,15 +294,17 @@ class Scenario(Container):
                 raise Warning('Model configs are different')
 
             for file_ in stage.children:
-                file_path = pl.Path(file_)
+                file_path = pl.Path(self.format_file(file_, self.data_format))
+                other_file_path = pl.Path(scenario.format_file(file_, scenario.data_format))
                 if stage.name in [Stage.TRAINING_FETCHED, Stage.PREDICTION_FETCHED]:
-                    if pl.Path(file_path).suffix == ".csv":
+                    if self.is_data_file(file_path):
                         continue
                 file_to_check = SERVICE.fs.read(
-                    self.location / stage.path / file_, fmt=self.extension[file_path.suffix])
+                    self.location / stage.path / file_path,
+                    fmt=self.extension[file_path.suffix])
                 file_checked = SERVICE.fs.read(
-                    scenario.location / stage.path / file_,
-                    fmt=scenario.extension[file_path.suffix])
+                    scenario.location / stage.path / other_file_path,
+                    fmt=scenario.extension[other_file_path.suffix])
 
                 if isinstance(file_to_check, pd.DataFrame):
                     # equality == drop_duplicates is null
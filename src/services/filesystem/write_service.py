@@ -3,9 +3,8 @@ This script contains service to write files
 """
 
 import pickle
-from typing import Any
+from typing import Any, Iterable
 
-import matplotlib.pyplot as plt
 import pandas as pd
 import yaml
 
@@ -34,6 +33,104 @@ class DataWriteService:
         """
         return DataWriteService._write_df("to_csv", df=df, dst=dst, **kwargs)
 
+    @staticmethod
+    def parquet(df: pd.DataFrame, dst: str, **kwargs) -> None:
+        """
+        Write parquet file, the types of the DataFrame are kept in the file schema
+
+        :param df: DataFrame to be saved
+        :param dst: destination path to save DataFrame
+        :param kwargs: parameters to be passed to save function
+        """
+        return DataWriteService._write_df("to_parquet", df=df, dst=dst, **kwargs)
+
+    @staticmethod
+    def feather(df: pd.DataFrame, dst: str, index: bool = False, **kwargs) -> None:
+        """
+        Write feather (Arrow IPC) file, the types of the DataFrame are kept in the file schema
+
+        :param df: DataFrame to be saved
+        :param dst: destination path to save DataFrame
+        :param index: whether the index is written as a column (feather does not store the index)
+        :param kwargs: parameters to be passed to save function
+        """
+        df = df.reset_index(drop=not index)
+        return DataWriteService._write_df("to_feather", df=df, dst=dst, **kwargs)
+
+    @staticmethod
+    def csv_chunks(chunks: Iterable[pd.DataFrame], dst: str, **kwargs) -> int:
+        """
+        Write DataFrame chunks in a csv file, appending each chunk to the file
+
+        :param chunks: iterable of DataFrames with the same columns
+        :param dst: destination path to save DataFrame
+        :param kwargs: parameters to be passed to save function
+        :return: number of rows written
+        """
+        nb_rows = 0
+        for index, chunk in enumerate(chunks):
+            DataWriteService.csv(chunk, dst, mode="w" if index == 0 else "a", header=index == 0, **kwargs)
+            nb_rows += len(chunk)
+        return nb_rows
+
+    @staticmethod
+    def parquet_chunks(chunks: Iterable[pd.DataFrame], dst: str, index: bool = False, **kwargs) -> int:
+        """
+        Write DataFrame chunks in a parquet file, each chunk is a row group of the file.
+        The schema of the file is the schema of the first chunk.
+
+        :param chunks: iterable of DataFrames with the same columns
+        :param dst: destination path to save DataFrame
+        :param index: whether the index is written as a column
+        :param kwargs: parameters to be passed to `pyarrow.parquet.ParquetWriter`
+        :return: number of rows written
+        """
+        import pyarrow as pa
+        from pyarrow import parquet
+
+        nb_rows, writer, schema = 0, None, None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=index, schema=schema)
+                if writer is None:
+                    schema = table.schema
+                    writer = parquet.ParquetWriter(str(dst), schema, **kwargs)
+                writer.write_table(table)
+                nb_rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        return nb_rows
+
+    @staticmethod
+    def feather_chunks(chunks: Iterable[pd.DataFrame], dst: str, index: bool = False, **kwargs) -> int:
+        """
+        Write DataFrame chunks in a feather (Arrow IPC) file, each chunk is a record batch.
+        The schema of the file is the schema of the first chunk.
+
+        :param chunks: iterable of DataFrames with the same columns
+        :param dst: destination path to save DataFrame
+        :param index: whether the index is written as a column
+        :param kwargs: parameters to be passed to `pyarrow.ipc.new_file`
+        :return: number of rows written
+        """
+        import pyarrow as pa
+
+        nb_rows, writer, schema = 0, None, None
+        try:
+            for chunk in chunks:
+                chunk = chunk.reset_index(drop=not index)
+                batch = pa.RecordBatch.from_pandas(chunk, preserve_index=False, schema=schema)
+                if writer is None:
+                    schema = batch.schema
+                    writer = pa.ipc.new_file(str(dst), schema, **kwargs)
+                writer.write_batch(batch)
+                nb_rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        return nb_rows
+
     @staticmethod
     def pickle(obj: Any, dst: str, **kwargs) -> None:
         """
@@ -48,7 +145,7 @@ class DataWriteService:
             pickle.dump(obj, _file, **kwargs)
 
     @staticmethod
-    def figure(figure: plt.Figure, dst: str) -> None:
+    def figure(figure: "plt.Figure", dst: str) -> None:
         """
         Write matplotlib Figure object
 
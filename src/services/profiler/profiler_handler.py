@@ -0,0 +1,219 @@
+"""
+This script contains the profiler handler.
+
+The profiler records a tree of measures: a record is opened around an Operator, a processing step
+of a DataPipeline, ... and its records are nested in the record opened around it in the same
+thread (or the record attached to the thread, see `attach`). Each record measures:
+    - wall_time_s: wall clock time
+    - cpu_time_s: CPU time of the process (including the other threads running meanwhile)
+    - peak_rss_delta_mb: increase of the peak resident memory of the process
+    - rows_in / rows_out: number of rows of the input / output DataFrame, set by the code profiled
+    - bytes_read / bytes_written: bytes read / written on the file system, including the nested
+      records
+
+The detailed records (i.e Operators) can also be profiled with cProfile and tracemalloc:
+
+    profiler:
+      cprofile: True     # the cProfile stats are saved next to the profile of the scenario
+      tracemalloc: True  # peak of the memory allocated by python and top allocation sites
+"""
+
+import contextlib
+import cProfile
+import logging
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from typing import List, Optional
+
+LOG = logging.getLogger(__name__)
+
+TRACEMALLOC_TOP = 10
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of the process, in MB"""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes on Linux
+    return max_rss / 1024 ** 2 if sys.platform == "darwin" else max_rss / 1024
+
+
+class ProfileRecord:
+    """
+    Measures of a profiled block of code, with the records of the blocks nested in it
+    """
+
+    def __init__(self, name: str, rows_in: int = None, rows_out: int = None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = rows_out
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.wall_time_s = None
+        self.cpu_time_s = None
+        self.peak_rss_delta_mb = None
+        self.traced_peak_mb = None
+        self.tracemalloc_top = None
+        self.cprofile = None
+        self.children = []
+        self._lock = threading.Lock()
+
+    def add(self, bytes_read: int = 0, bytes_written: int = 0) -> None:
+        """Count bytes read or written on the file system"""
+        with self._lock:
+            self.bytes_read += bytes_read
+            self.bytes_written += bytes_written
+
+    def walk(self):
+        """Iterate over the record and its nested records"""
+        yield self
+        for child in list(self.children):
+            yield from child.walk()
+
+    def to_dict(self) -> dict:
+        """Get the measures of the record and its nested records as a dictionary"""
+        measures = {"name": self.name}
+        for key in ("wall_time_s", "cpu_time_s", "peak_rss_delta_mb", "rows_in", "rows_out",
+                    "bytes_read", "bytes_written", "traced_peak_mb", "tracemalloc_top"):
+            value = getattr(self, key)
+            if value is not None:
+                measures[key] = round(value, 4) if isinstance(value, float) else value
+        if self.children:
+            measures["children"] = [child.to_dict() for child in list(self.children)]
+        return measures
+
+
+class ProfilerHandler:
+    """
+    Singleton profiler of the process
+    """
+
+    @staticmethod
+    def __new__(cls):
+        """Singleton for the profiler, shared by the threads of the process"""
+        if not hasattr(cls, "_profiler"):
+            cls._profiler = super(ProfilerHandler, cls).__new__(cls)
+            cls._profiler._local = threading.local()
+            cls._profiler._tracemalloc_lock = threading.Lock()
+            cls._profiler._tracemalloc_users = 0
+            cls._profiler._tracemalloc_started = False
+            cls._profiler.configured = False
+            cls._profiler.cprofile = False
+            cls._profiler.tracemalloc = False
+        return cls._profiler
+
+    def configure(self, cprofile: bool = False, tracemalloc: bool = False) -> None:
+        """
+        Set the optional profilers of the detailed records
+
+        :param cprofile: whether the detailed records are profiled with cProfile
+        :param tracemalloc: whether the python memory allocations of the detailed records are traced
+        """
+        self.cprofile = cprofile
+        self.tracemalloc = tracemalloc
+        self.configured = True
+
+    def current(self) -> Optional[ProfileRecord]:
+        """Get the record opened (or attached) in the current thread, None if there is none"""
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else None
+
+    @contextlib.contextmanager
+    def attach(self, record: Optional[ProfileRecord]):
+        """Nest the records of the current thread in a record opened in another thread"""
+        if record is None:
+            yield record
+            return
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(record)
+        try:
+            yield record
+        finally:
+            stack.pop()
+
+    def add(self, bytes_read: int = 0, bytes_written: int = 0) -> None:
+        """Count bytes read or written on the file system in the current record"""
+        record = self.current()
+        if record is not None:
+            record.add(bytes_read=bytes_read, bytes_written=bytes_written)
+
+    @contextlib.contextmanager
+    def profile(self, name: str, detailed: bool = False, log: str = None, **counters):
+        """
+        Profile a block of code, to use with 'with'. The record is nested in the current record.
+
+        :param name: name of the record
+        :param detailed: whether the block is profiled with cProfile and tracemalloc, if enabled
+        :param log: context of the log of the measures, if None the measures are not logged
+        :param counters: rows_in or rows_out if known before the block
+        :return: the record, to set the rows_in and rows_out of the block
+        """
+        parent = self.current()
+        record = ProfileRecord(name=name, **counters)
+        if parent is not None:
+            parent.children.append(record)
+
+        profiler = self._start_cprofile() if detailed and self.cprofile else None
+        traced = detailed and self.tracemalloc and self._start_tracemalloc()
+        rss_start, cpu_start, start = peak_rss_mb(), time.process_time(), time.perf_counter()
+
+        try:
+            with self.attach(record):
+                yield record
+        finally:
+            record.wall_time_s = time.perf_counter() - start
+            record.cpu_time_s = time.process_time() - cpu_start
+            record.peak_rss_delta_mb = peak_rss_mb() - rss_start
+            if profiler is not None:
+                profiler.disable()
+                record.cprofile = profiler
+            if traced:
+                self._stop_tracemalloc(record)
+            if parent is not None:
+                parent.add(bytes_read=record.bytes_read, bytes_written=record.bytes_written)
+            if log is not None:
+                LOG.info(f"\033[1m\n\n{log} - {name}: \n step completed with total wall clock duration "
+                         f"{record.wall_time_s:.3f} s, CPU {record.cpu_time_s:.3f} s, peak RSS "
+                         f"+{record.peak_rss_delta_mb:.1f} MB \n\033[0m")
+
+    @staticmethod
+    def _start_cprofile() -> Optional[cProfile.Profile]:
+        """Start a cProfile profiler in the current thread, None if another profiler is running"""
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            LOG.warning("cProfile not started: another profiler is running")
+            return None
+        return profiler
+
+    def _start_tracemalloc(self) -> bool:
+        """Start tracing the python memory allocations, shared by the concurrent records"""
+        with self._tracemalloc_lock:
+            if self._tracemalloc_users == 0:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self._tracemalloc_started = True
+                elif hasattr(tracemalloc, "reset_peak"):
+                    tracemalloc.reset_peak()
+            self._tracemalloc_users += 1
+        return True
+
+    def _stop_tracemalloc(self, record: ProfileRecord) -> None:
+        """Set the peak and the top allocation sites of the record, then stop tracing if no other
+        record is traced"""
+        with self._tracemalloc_lock:
+            record.traced_peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            statistics = tracemalloc.take_snapshot().statistics("lineno")[:TRACEMALLOC_TOP]
+            record.tracemalloc_top = [str(statistic) for statistic in statistics]
+            self._tracemalloc_users -= 1
+            if self._tracemalloc_users == 0 and self._tracemalloc_started:
+                tracemalloc.stop()
+                self._tracemalloc_started = False
+
+    @staticmethod
+    def cprofile_records(record: ProfileRecord) -> List[ProfileRecord]:
+        """Get the record and its nested records profiled with cProfile"""
+        return [record_ for record_ in record.walk() if record_.cprofile is not None]
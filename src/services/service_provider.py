@@ -2,14 +2,16 @@
 This script contains pipeline service provider
 """
 
-import contextlib
 import logging
+import os
 import pathlib
-import time
 
-from .config.config_handler import ConfigHandler
+from .config.config_handler import ConfigHandler, ConfigSnapshot
 from .db.db_handler import DbHandler
 from .filesystem.filesystem_handler import FileSystemHandler
+from .profiler.profiler_handler import ProfilerHandler
+
+CONFIGS_DIR = pathlib.Path(__file__).resolve().parents[2] / "configs"
 
 
 class ServiceProvider:
@@ -19,6 +21,7 @@ class ServiceProvider:
         - ability to log
         - database connection
         - access to filesystem
+        - profiling
     """
 
     @property
@@ -29,8 +32,40 @@ class ServiceProvider:
 
         :return: A Config object
         """
-        return ConfigHandler(
-            yaml_directory=pathlib.Path(__file__).resolve().parents[2] / "configs").model_config
+        return self._configs().model_config
+
+    @property
+    def infra_config(self):
+        """
+        Return the infrastructure config as Config object.
+
+        :return: A Config object
+        """
+        return self._configs().infra_config
+
+    @property
+    def snapshot(self):
+        """
+        Return the frozen snapshot of the hot fields of the model config (granularity, target,
+        features, ...), to use in loops instead of self.config.
+
+        :return: A ConfigSnapshot object
+        """
+        configs = self._configs()
+        if getattr(self, "_snapshot_version", None) != ConfigHandler.version:
+            self._snapshot = ConfigSnapshot(configs.model_config)
+            self._snapshot_version = ConfigHandler.version
+        return self._snapshot
+
+    def _configs(self) -> ConfigHandler:
+        """
+        Return the ConfigHandler of the process, cached until its configs change
+        (see ConfigHandler.invalidate and ConfigHandler.override)
+        """
+        if getattr(self, "_configs_version", None) != ConfigHandler.version:
+            self._config_handler = ConfigHandler(yaml_directory=CONFIGS_DIR)
+            self._configs_version = ConfigHandler.version
+        return self._config_handler
 
     @property
     def log(self):
@@ -44,11 +79,14 @@ class ServiceProvider:
     @property
     def db(self):
         """
-        Return the DbHandler object.
+        Return the DbHandler object, shared by the process: its engine holds the connection pool.
 
         :return: The DbHandler object
         """
-        return DbHandler()
+        if getattr(self, "_db_pid", None) != os.getpid():
+            self._db = DbHandler()
+            self._db_pid = os.getpid()
+        return self._db
 
     @property
     def fs(self):
@@ -60,26 +98,21 @@ class ServiceProvider:
         """
         return FileSystemHandler()
 
-    @contextlib.contextmanager
-    def timer(self, context: str, task: str,
-              fmt: str = "\033[1m\n\n{context} - {task}: \n step completed with total wall clock duration {durations:.3f} s \n\033[0m",
-              ):
-        """To enter before a callable using 'with'.
-
-        :param srv: ServiceProvider instance, to use for logs
-        :param context: task context
-        :param task: task name
-        :param format: format to use to display the task duration
-        """
-        start = time.time()
-        yield
-        self.log.info(
-            fmt.format(
-                context=context,
-                task=task,
-                durations=(time.time() - start),
-            ),
-        )
+    @property
+    def profiler(self):
+        """
+        Return the profiler of the process, configured with the infra config on first use
+        (unless configured before, i.e from the CLI).
+        Blocks of code are profiled with self.profiler.profile()
+
+        :return: The ProfilerHandler object
+        """
+        profiler = ProfilerHandler()
+        if not profiler.configured:
+            profiler_config = self.infra_config.get("profiler") or {}
+            profiler.configure(cprofile=bool(profiler_config.get("cprofile")),
+                               tracemalloc=bool(profiler_config.get("tracemalloc")))
+        return profiler
 
 
 class ServiceProviderHandler:  # pylint: disable=no-member
@@ -0,0 +1,240 @@
+"""
+This script contains the content-addressed cache of the Operator outputs, shared by the scenarios.
+
+The key of an Operator run is the hash of its inputs:
+    - the id of the Operator
+    - the subtree of the model config the Operator depends on
+    - the content of the files written by its upstream Operators
+    - the version of the code (the source files of the src package)
+
+The files written by a cached Operator are stored under the key, with the values it added to the
+output of the scenario and the overrides it applied to the config of the scenario. They are
+copied into the scenario on the next run with the same key instead of running the Operator again.
+The least recently used entries are removed when the cache is larger than max_size (in MB):
+
+    operator_cache:
+      enabled: True
+      path: tmp/operator_cache
+      max_size: 2048
+"""
+
+import copy
+import datetime
+import functools
+import hashlib
+import json
+import os
+import pathlib as pl
+import shutil
+import uuid
+from typing import Dict, List, Optional
+
+from src.services.service_provider import ServiceProviderHandler
+
+SERVICE = ServiceProviderHandler()
+
+SRC_DIR = pl.Path(__file__).resolve().parent.parent
+BLOCK_SIZE = 1024 ** 2
+
+
+@functools.lru_cache(maxsize=None)
+def code_version() -> str:
+    """Get the hash of the source files of the src package"""
+    sha = hashlib.sha256()
+    for path in sorted(SRC_DIR.rglob("*.py")):
+        sha.update(str(path.relative_to(SRC_DIR)).encode("utf8"))
+        sha.update(path.read_bytes())
+    return sha.hexdigest()
+
+
+class OperatorCache:
+    """
+    Content-addressed cache of the Operator outputs. An entry is a directory named by the key of
+    the Operator run, containing the files written by the Operator, relative to the scenario.
+    """
+
+    FILES = "files"
+    META = "_operator.yaml"
+
+    def __init__(self, path: pl.Path, max_size: Optional[float] = None):
+        """
+        :param path: directory of the cache
+        :param max_size: size of the cache in MB above which the least recently used entries are
+        removed, no limit if not set
+        """
+        self.path = pl.Path(path)
+        self.max_size = max_size
+
+    @classmethod
+    def from_config(cls) -> Optional["OperatorCache"]:
+        """Get the cache of the infra config, None if it is disabled"""
+        cache_config = SERVICE.infra_config.get("operator_cache") or {}
+        if not cache_config.get("enabled"):
+            return None
+        return cls(path=cache_config.get("path") or "tmp/operator_cache",
+                   max_size=cache_config.get("max_size"))
+
+    @staticmethod
+    def list_files(directory: pl.Path) -> Dict[pl.Path, tuple]:
+        """
+        List the files of a directory, hidden files (being written) excluded
+
+        :param directory: directory to list
+        :return: dictionary path: (modification time, size)
+        """
+        if not directory.is_dir():
+            return {}
+        files = {}
+        for path in directory.rglob("*"):
+            if path.is_file() and not path.name.startswith("."):
+                stat = path.stat()
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    @classmethod
+    def hash_directory(cls, directory: pl.Path, sha: "hashlib._Hash") -> None:
+        """Update the hash with the relative paths and the content of the files of a directory"""
+        for path in sorted(cls.list_files(directory)):
+            sha.update(str(path.relative_to(directory)).encode("utf8"))
+            with open(path, "rb") as _file:
+                for block in iter(lambda: _file.read(BLOCK_SIZE), b""):
+                    sha.update(block)
+
+    @staticmethod
+    def config_subtree(config: dict, keys: Optional[List[str]]) -> dict:
+        """
+        Get the subtree of the config the Operator depends on
+
+        :param config: model config as a dictionary
+        :param keys: dotted keys of the config (i.e demand_forecast.model), None means the whole config
+        :return: dictionary dotted key: value
+        """
+        if keys is None:
+            return config
+        subtree = {}
+        for key in keys:
+            value = config
+            for name in key.split("."):
+                value = value.get(name) if isinstance(value, dict) else None
+            subtree[key] = value
+        return subtree
+
+    def key(self, operator: "Operator", scenario: "Scenario", inputs: List["Stage"]) -> str:
+        """
+        Get the key of an Operator run
+
+        :param operator: Operator to run
+        :param scenario: scenario the Operator runs on
+        :param inputs: stages written by the upstream Operators
+        :return: hexadecimal key
+        """
+        sha = hashlib.sha256()
+        sha.update(operator.id.encode("utf8"))
+        subtree = self.config_subtree(scenario.config.to_dict(), operator.config_keys)
+        sha.update(json.dumps(subtree, sort_keys=True, default=str).encode("utf8"))
+        for stage in sorted(inputs, key=lambda stage: stage.index):
+            sha.update(stage.name.encode("utf8"))
+            self.hash_directory(scenario.storage_location / stage.path, sha)
+        sha.update(code_version().encode("utf8"))
+        return sha.hexdigest()
+
+    def entry(self, key: str) -> pl.Path:
+        """Get the directory of the entry of a key"""
+        return self.path / key[:2] / key
+
+    def restore(self, key: str, scenario: "Scenario") -> Optional[dict]:
+        """
+        Copy the files of the entry of a key into the scenario, then replay the changes of the
+        Operator run on the output and the config of the scenario
+
+        :return: metadata of the entry, None if the entry doesn't exist
+        """
+        files = self.entry(key) / self.FILES
+        meta_path = self.entry(key) / self.META
+        if not meta_path.is_file():
+            return None
+        for path in self.list_files(files):
+            dst = scenario.storage_location / path.relative_to(files)
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(path, dst)
+        meta = SERVICE.fs.read(meta_path, fmt="yaml")
+        scenario.output.update(meta.get("output") or {})
+        if meta.get("config"):
+            scenario.update_config(meta["config"])
+        # The time of last use of the entry, see prune
+        os.utime(meta_path)
+        return meta
+
+    @staticmethod
+    def side_effects(scenario: "Scenario") -> dict:
+        """Get the output and the config overrides of a scenario, to be compared after an Operator run"""
+        return {"output": copy.deepcopy(dict(scenario.output)),
+                "config": copy.deepcopy(dict(scenario.overrides))}
+
+    def store(self, key: str, scenario: "Scenario", operator: "Operator",
+              before: Dict[pl.Path, tuple], side_effects: Optional[dict] = None) -> None:
+        """
+        Store the files written by an Operator run under its key, with the values it set in the
+        output and the config of the scenario. The entry is written in a temporary directory then
+        renamed, so that an entry is never partially written.
+
+        :param key: key of the Operator run
+        :param scenario: scenario the Operator ran on
+        :param operator: Operator run
+        :param before: files of the outputs of the Operator before the run, see outputs_files
+        :param side_effects: output and config overrides of the scenario before the run, see
+        side_effects
+        """
+        after = self.outputs_files(operator, scenario)
+        written = [path for path, stat in after.items() if before.get(path) != stat]
+
+        entry = self.entry(key)
+        if entry.exists():
+            return
+        tmp = self.path / f".{key}.{uuid.uuid4().hex}.tmp"
+        for path in written:
+            dst = tmp / self.FILES / path.relative_to(scenario.storage_location)
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(path, dst)
+        meta = {"operator": operator.id, "scenario": str(scenario.storage_location),
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "files": sorted(str(path.relative_to(scenario.storage_location)) for path in written)}
+        if side_effects is not None:
+            # Values set by the run, replayed on restore
+            after = self.side_effects(scenario)
+            for name in ("output", "config"):
+                meta[name] = {key_: value for key_, value in after[name].items()
+                              if key_ not in side_effects[name] or side_effects[name][key_] != value}
+        SERVICE.fs.write(meta, tmp / self.META, fmt="yaml")
+
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # Stored concurrently by another run
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.prune()
+
+    def prune(self) -> None:
+        """Remove the least recently used entries until the cache is at most max_size MB"""
+        if self.max_size is None or not self.path.is_dir():
+            return
+        entries = []
+        for meta_path in self.path.glob(f"*/*/{self.META}"):
+            size = sum(stat[1] for stat in self.list_files(meta_path.parent).values())
+            entries.append((meta_path.stat().st_mtime, size, meta_path.parent))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_size * 1024 ** 2:
+                break
+            SERVICE.log.info(f"Removing {entry.name[:12]} from the operator cache")
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    @classmethod
+    def outputs_files(cls, operator: "Operator", scenario: "Scenario") -> Dict[pl.Path, tuple]:
+        """List the files of the stages written by an Operator, see list_files"""
+        files = {}
+        for stage in operator.outputs:
+            files.update(cls.list_files(scenario.storage_location / stage.path))
+        return files
@@ -35,6 +35,7 @@ FETCH_TRAINING_DATA_OPERATOR = Operator(
     "Fetches training data",
     final_stage=Stage.TRAINING_FETCHED,
     python_callable=fetch_training_data,
+    upstream=[],
 )
 
 
@@ -53,6 +54,16 @@ TRAIN_DEMAND_OPERATOR = Operator(
     "Trains Demand",
     final_stage=Stage.TRAINING_TRAINED,
     python_callable=train_demand,
+    upstream=[FETCH_TRAINING_DATA_OPERATOR.id],
+    cache=True,
+    outputs=[Stage.TRAINING_PREPROCESSED, Stage.TRAINING_TRAINED],
+    # The prediction context and the prediction params don't change the trained model
+    config_keys=["run_info", "run_param.random_seed", "run_param.use_cross_validation",
+                 "run_param.nb_folds", "run_param.cv_splitter", "run_param.data_format",
+                 "demand_forecast.model", "demand_forecast.features",
+                 "demand_forecast.range_week_sales", "demand_forecast.nan_strategy",
+                 "demand_forecast.granularity", "demand_forecast.target",
+                 "demand_forecast.training_context"],
 )
 
 
@@ -61,7 +72,8 @@ def fetch_prediction_data(scenario=None, stage=None, context=None):
     """Callable to fetch prediction data"""
     pred_context = PredictionContext()
     SERVICE.log.info("\033[1mFetching prediction data\033[0m")
-    DataPipeline.fetch_data(DemandForecast.input_data, scope="prediction", context=context, scenario=scenario)
+    DataPipeline.fetch_data(DemandForecast.input_data, scope="prediction", context=pred_context,
+                            scenario=scenario)
     pred_context.print_summary()
     return pred_context
 
@@ -70,6 +82,8 @@ FETCH_PREDICTION_DATA_OPERATOR = Operator(
     "Fetches prediction data",
     final_stage=Stage.PREDICTION_FETCHED,
     python_callable=fetch_prediction_data,
+    # The prediction data doesn't depend on the trained model: it is fetched during the training
+    upstream=[],
 )
 
 
@@ -78,8 +92,16 @@ def predict_demand(scenario=None, stage=None, context: "PredictionContext" = Non
     assert isinstance(context, PredictionContext)
     SERVICE.log.info("\033[1mPredicting demand\033[0m")
     demand_forecast = DemandForecast.load_cls(context=TrainingContext, scenario=scenario)
-    predictions = demand_forecast.predict(prediction_context=context, scenario=scenario)
-    demand_forecast.save_predictions(df=predictions, scenario=scenario)
+    chunk_size = SERVICE.config.run_param.get("prediction_chunksize")
+    if chunk_size:
+        # Streaming prediction: the chunks are predicted and saved as they come
+        workers = SERVICE.config.run_param.get("prediction_workers") or 1
+        chunks = demand_forecast.predict_chunks(prediction_context=context, scenario=scenario,
+                                                chunk_size=chunk_size, workers=workers)
+        demand_forecast.save_prediction_chunks(chunks=chunks, scenario=scenario)
+    else:
+        predictions = demand_forecast.predict(prediction_context=context, scenario=scenario)
+        demand_forecast.save_predictions(df=predictions, scenario=scenario)
     context.save(stage=context.file_name_stage, scenario=scenario)
     return context
 
@@ -88,6 +110,12 @@ PREDICT_DEMAND_OPERATOR = Operator(
     "Predicts demand",
     final_stage=Stage.PREDICTION_PREDICTED,
     python_callable=predict_demand,
+    # The last upstream operator gives the prediction context
+    upstream=[TRAIN_DEMAND_OPERATOR.id, FETCH_PREDICTION_DATA_OPERATOR.id],
+    cache=True,
+    # The predictions are also written with the backtesting data in backtest mode
+    outputs=[Stage.PREDICTION_PREPROCESSED, Stage.PREDICTION_PREDICTED,
+             Stage.PREDICTION_BACKTESTINGFETCHED],
 )
 
 
@@ -121,6 +149,7 @@ EVALUATE_OPERATOR = Operator(
     "Evaluates prediction",
     final_stage=Stage.PREDICTION_BACKTESTED,
     python_callable=evaluate,
+    upstream=[PREDICT_DEMAND_OPERATOR.id],
 )
 
 
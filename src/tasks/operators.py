@@ -17,15 +17,28 @@ class Operator:
     """
     An operator is a step in a pipeline, that executes a task, given a configuration, stage
     and data, and updates the stage.
-    Operators have dependencies. In our case we choose to define dependencies using a stage,
-    rather than pairwise dependencies.
+    Operators have dependencies: the upstream operators (by default the previous operator of the
+    pipeline) must be completed before the operator runs.
+    Cached operators are skipped when they already ran with the same inputs (see OperatorCache):
+    their outputs are copied from the cache.
     """
 
-    def __init__(self, operator_id: str, final_stage: "Stage", python_callable: callable):
+    def __init__(self, operator_id: str, final_stage: "Stage", python_callable: callable,
+                 upstream: list = None, cache: bool = False, outputs: list = None,
+                 config_keys: list = None):
         """Create an Operator.
 
         :param operator_id: ID of the operator
         :param final_stage: stage that the operator triggers on completion
+        :param upstream: IDs of the operators to complete before this one. If None, the operator
+            depends on the previous operator of the pipeline (linear pipeline)
+        :param cache: whether the outputs of the operator can be taken from the operator cache.
+            A cached operator must only depend on its inputs and return the context it is given.
+            Its changes of the Scenario output and config (see Scenario.update_config) are
+            replayed when it is restored
+        :param outputs: stages whose files the operator writes. If None, its final stage
+        :param config_keys: dotted keys of the model config the operator depends on
+            (i.e demand_forecast.model). If None, the whole config
         :param python_callable: function to use to run the Operator.
             The python_callable should take 3 keyword arguments:
             - stage: a Stage object
@@ -36,11 +49,18 @@ class Operator:
 
         self._id = str(operator_id)
         self._python_callable = python_callable
+        self.upstream = None if upstream is None else [str(operator) for operator in upstream]
+        self.cache = cache
+        self.config_keys = config_keys
 
         if isinstance(final_stage, str):
             final_stage = Container.get_stage(stage=final_stage)
         self.final_stage = final_stage
 
+        outputs = [final_stage] if outputs is None else outputs
+        self.outputs = [Container.get_stage(stage=stage) if isinstance(stage, str) else stage
+                        for stage in outputs]
+
     def __call__(self, stage: "Stage", context: "MetaContext", scenario: "Scenario"):
         """Executes the Operator.
 
@@ -53,7 +73,7 @@ class Operator:
 
         assert isinstance(stage, Stage)
 
-        with SERVICE.timer(context=str(context), task=self._id):
+        with SERVICE.profiler.profile(self._id, detailed=True, log=str(context)):
             output_context = self._python_callable(
                 stage=stage,
                 context=context,
@@ -61,3 +81,8 @@ class Operator:
             )
 
         return output_context
+
+    @property
+    def id(self) -> str:  # pylint: disable=invalid-name
+        """ID of the operator"""
+        return self._id
@@ -4,21 +4,32 @@ Define Pipeline class.
 A Pipeline is a set of tasks (Operators) organized with dependencies.
 Running a Pipeline will execute the Operators according to their dependencies.
 
-Here, dependencies are linear and linked to stages: the Pipeline starts from a begin_stage,
-then executes each Operator and moves to the next stage.
+Operators declare their upstream Operators (by default, the previous Operator of the Pipeline).
+The Pipeline starts from a begin_stage, executes the Operators as soon as their upstream
+Operators are completed, and moves the stage forward as Operators complete.
+
+Operators flagged as cached are not run again when their inputs are unchanged, even in another
+Scenario: their outputs are copied from the operator cache of the infra config (see OperatorCache).
+
+Each run is profiled (see ProfilerHandler): the measures of the Operators and of their steps are
+saved in the profile file of the Scenario.
 
 A Pipeline run in test mode will trigger a check of the Operator's output against a reference
 Scenario.
 """
 
 import collections
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from src.services.filesystem.scenario import Scenario
 from src.services.service_provider import ServiceProviderHandler
 from src.services.filesystem.container import Container
+from src.utils.parallel import get_parallel_config
+from .cache import OperatorCache
 from .stages import Stage
 
-log = ServiceProviderHandler().log
+SERVICE = ServiceProviderHandler()
+log = SERVICE.log
 
 
 class Pipeline(collections.Iterable):
@@ -80,57 +91,192 @@ class Pipeline(collections.Iterable):
 
         :param input_context: MetaContext or None, context to start the Pipeline
 
-        Each Operator is run sequentially.
-        If the current Pipeline stage is at or above an Operators' final stage, this stage
-        is skipped input_context is passed as 'context' kwarg.
-        Output_context (output of the Operator call) is used as the next Operators' context
-        (if not None) after each Operator is executed, the current_stage is updated to match the
-        Operators' final_stage. If the Pipeline runs in test mode, the Scenario & ScenarioTest are
-        compared at the current_stage.
-
-        Stops when the Pipeline's final_stage is reached or when the last Operator is run.
+        The Operators to run are the ones whose final stage is above the begin Stage and at or
+        below the final Stage. Operators run as soon as their upstream Operators are completed,
+        concurrently on a thread pool sized by the parallel section of the infra config.
+        An Operator gets as 'context' kwarg the output context of its last upstream Operator
+        (or the context this upstream Operator got, if it returned None); input_context if it has
+        no upstream Operator to run.
+        Cached Operators are taken from the operator cache if it is enabled, see run_operator.
+        When an Operator completes, the Scenario & ScenarioTest are compared at its final stage if
+        the Pipeline runs in test mode. The Scenario stage (and current_stage) moves to the final
+        stage of the last Operator such that every Operator before it is completed, and the
+        Scenario info is saved. Both are done in the calling thread.
+        The measures of the run are saved in the profile file of the Scenario.
         """
+        with SERVICE.profiler.profile("pipeline") as record:
+            self._run(input_context=input_context)
+        self.scenario.save_profile(record)
+
+    def _run(self, input_context=None):
+        """Runs the pipeline, see run"""
 
         self.current_stage = self.begin_stage
+        operators = self.operators_to_run()
+        upstream = self.get_upstream(operators)
 
-        # Loop through operators
-        for operator in self:
+        contexts = {}  # output context (or input context if None) of the completed operators
+        completed = set()
+        running = {}
+        cache = OperatorCache.from_config()
+
+        parallel_config = get_parallel_config()
+        max_workers = 1 if parallel_config["executor"] == "serial" else parallel_config["max_workers"]
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            while len(completed) < len(operators):
+
+                # Submit the operators whose upstream operators are completed
+                for operator in operators:
+                    if operator.id in completed or operator.id in running.values() or \
+                            not all(upstream_id in completed for upstream_id in upstream[operator.id]):
+                        continue
+                    context = contexts[upstream[operator.id][-1]] if upstream[operator.id] else input_context
+                    future = pool.submit(self.run_operator, operator=operator, stage=self.current_stage,
+                                         context=context, cache=cache, record=SERVICE.profiler.current())
+                    running[future] = operator.id
+                    contexts[operator.id] = context
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    operator_id = running.pop(future)
+                    operator = self.get_operator(operator_id)
+                    # Errors are raised once the running operators are completed
+                    output_context = future.result()
+                    if output_context is not None:
+                        contexts[operator_id] = output_context
 
+                    # If necessary, test the result
+                    if self.test:
+                        self.scenario.test = False
+                        self.scenario.compare(
+                            stage=operator.final_stage,
+                            scenario=self.scenario_test,
+                        )
+
+                    completed.add(operator_id)
+                    self.update_stage(operators=operators, completed=completed)
+
+        if self.current_stage >= self.final_stage:
+            log.info("Reached Pipeline final stage")
+
+        self.scenario.save()
+
+    def operators_to_run(self) -> list:
+        """Returns the operators whose final stage is above the begin stage and at or below the
+        final stage, in the order of the pipeline"""
+        operators = []
+        for operator in self:
             # Do not execute if we are at or above the operator final stage
             if self.current_stage >= operator.final_stage:
                 log.info(
-                    f"{operator._id} final stage already reached, going to next operator")
+                    f"{operator.id} final stage already reached, going to next operator")
+                continue
+            if operator.final_stage > self.final_stage:
                 continue
+            operators.append(operator)
+        return operators
+
+    def run_operator(self, operator: "Operator", stage: "Stage", context,
+                     cache: "OperatorCache" = None, record: "ProfileRecord" = None):
+        """
+        Runs an Operator on the Scenario. If the Operator is cached and the cache is enabled, the
+        outputs of a previous run with the same key are copied into the Scenario instead, its
+        changes of the Scenario output and config are replayed, and the input context is returned.
 
-            # Execute the operator, gather results
-            output_context = operator(
-                scenario=self.scenario,
-                stage=self.current_stage,
-                context=input_context,
-            )
-
-            # If necessary, test the result
-            if self.test:
-                self.scenario.test = False
-                self.scenario.compare(
-                    stage=operator.final_stage,
-                    scenario=self.scenario_test,
-                )
-
-            # Update/save the scenario
-            self.scenario.stage = operator.final_stage.name
-            self.scenario.save_info()
-            if self.test:
-                self.scenario.test = True
-
-            # Increment the stage
-            self.current_stage = operator.final_stage
-            if self.current_stage >= self.final_stage:
-                log.info("Reached Pipeline final stage")
+        :param operator: Operator to run
+        :param stage: current stage
+        :param context: MetaContext or None, input context of the Operator
+        :param cache: operator cache, None if disabled
+        :param record: profile record of the run, the Operator is profiled in it
+        :return: output context of the Operator
+        """
+        with SERVICE.profiler.attach(record):
+            return self._run_operator(operator=operator, stage=stage, context=context, cache=cache)
+
+    def _run_operator(self, operator: "Operator", stage: "Stage", context,
+                      cache: "OperatorCache" = None):
+        """Runs an Operator on the Scenario, see run_operator"""
+        if cache is None or not operator.cache:
+            return operator(scenario=self.scenario, stage=stage, context=context)
+
+        key = cache.key(operator=operator, scenario=self.scenario, inputs=self.get_inputs(operator))
+        with SERVICE.profiler.profile(f"{operator.id} (operator cache)"):
+            restored = cache.restore(key=key, scenario=self.scenario)
+        if restored is not None:
+            log.info(f"{operator.id} restored from the operator cache ({key[:12]})")
+            return context
+
+        before = cache.outputs_files(operator=operator, scenario=self.scenario)
+        side_effects = cache.side_effects(scenario=self.scenario)
+        output_context = operator(scenario=self.scenario, stage=stage, context=context)
+        cache.store(key=key, scenario=self.scenario, operator=operator, before=before,
+                    side_effects=side_effects)
+        return output_context
+
+    def declared_upstream(self, operator: "Operator") -> list:
+        """Returns the ids of the upstream operators declared by an operator, or of the previous
+        operator of the pipeline if none is declared"""
+        if operator.upstream is not None:
+            return operator.upstream
+        ids = [operator_.id for operator_ in self]
+        index = ids.index(operator.id)
+        return ids[index - 1:index] if index > 0 else []
+
+    def get_inputs(self, operator: "Operator") -> list:
+        """Returns the stages written by the upstream operators of an operator"""
+        inputs = []
+        for upstream_id in self.declared_upstream(operator):
+            inputs.extend(stage for stage in self.get_operator(upstream_id).outputs if stage not in inputs)
+        return inputs
+
+    def get_upstream(self, operators: list) -> dict:
+        """
+        Returns the upstream operators to run of each operator: the upstream operators declared,
+        or the previous operator of the pipeline if none is declared. Upstream operators already
+        completed (not to run) are ignored.
+
+        :param operators: operators to run
+        :return: dictionary operator id: list of upstream operator ids
+        """
+        ids = [operator.id for operator in self]
+        to_run = {operator.id for operator in operators}
+        upstream = {}
+        for operator in operators:
+            declared = self.declared_upstream(operator)
+            unknown = [upstream_id for upstream_id in declared if upstream_id not in ids]
+            if unknown:
+                raise ValueError(f"Upstream operators {unknown} of {operator.id} not in the pipeline")
+            upstream[operator.id] = [upstream_id for upstream_id in declared if upstream_id in to_run]
+        return upstream
+
+    def get_operator(self, operator_id: str) -> "Operator":
+        """Returns the operator of the pipeline from its id"""
+        return [operator for operator in self if operator.id == operator_id][0]
+
+    def update_stage(self, operators: list, completed: set) -> None:
+        """
+        Moves the current stage and the scenario stage to the final stage of the last operator
+        such that every operator before it (by final stage) is completed, then saves the scenario
+        info.
+
+        :param operators: operators to run
+        :param completed: ids of the completed operators
+        """
+        stage = None
+        for operator in sorted(operators, key=lambda operator: operator.final_stage.index):
+            if operator.id not in completed:
                 break
+            stage = operator.final_stage
+
+        if stage is None or stage <= self.current_stage:
+            return
 
-            # This operator's outputs are the next one's inputs
-            if output_context is not None:
-                input_context = output_context
+        # Update/save the scenario
+        self.scenario.stage = stage.name
+        self.scenario.save_info()
+        if self.test:
+            self.scenario.test = True
 
-        self.scenario.save()
\ No newline at end of file
+        # Increment the stage
+        self.current_stage = stage
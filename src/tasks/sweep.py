@@ -0,0 +1,172 @@
+"""
+This script contains the sweep of the demand forecast pipeline over a grid of config overrides.
+
+A sweep file gives, for dotted keys of the model config, the list of values to sweep. One scenario
+is created for each point of the grid (cartesian product of the values):
+
+    grid:
+      run_info.information_horizon: [2019-05-02, 2019-05-30]
+      demand_forecast.model.params.n_estimators: [100, 200]
+
+Each scenario runs the DemandForecastPipeline in its own process, so that it has its own config,
+in a bounded process pool. The processes share the fetched data through the fetch store of the
+infra config, and the trained models through the operator cache when it is enabled.
+"""
+
+import datetime
+import itertools
+import logging
+import multiprocessing
+import pathlib as pl
+import time
+import traceback
+from typing import List
+
+import yaml
+
+from src.services.config.config_handler import apply_overrides
+
+CONFIGS_DIR = pl.Path(__file__).resolve().parents[2] / "configs"
+SUMMARY = "summary.yaml"
+SUMMARY_OUTPUTS = ["Bias", "Smape"]
+
+
+def read_grid(path: pl.Path) -> List[dict]:
+    """
+    Read the points of the grid of a sweep file
+
+    :param path: path of the sweep file
+    :return: list of points, dictionary dotted key: value
+    """
+    with open(path, "r") as stream:
+        grid = (yaml.safe_load(stream) or {}).get("grid") or {}
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def write_configs(workdir: pl.Path, overrides: dict, fetch_store: pl.Path,
+                  base_configs: pl.Path = CONFIGS_DIR) -> pl.Path:
+    """
+    Write the configs of a point of the grid: the base model config overridden, and the base
+    infra config with the fetch store of the sweep
+
+    :param workdir: directory of the point
+    :param overrides: config overrides of the point
+    :param fetch_store: directory of the fetch store shared by the points
+    :param base_configs: directory of the configs to override
+    :return: directory of the configs
+    """
+    configs_dir = workdir / "configs"
+    configs_dir.mkdir(parents=True, exist_ok=True)
+
+    with open(base_configs / "model_config.yaml", "r") as stream:
+        model_config = apply_overrides(yaml.safe_load(stream), overrides)
+    with open(base_configs / "infra_config.yaml", "r") as stream:
+        infra_config = yaml.safe_load(stream)
+    infra_config["fetch_store"] = {"path": str(fetch_store)}
+
+    for name, config in (("model_config", model_config), ("infra_config", infra_config)):
+        with open(configs_dir / f"{name}.yaml", "w") as stream:
+            yaml.safe_dump(config, stream, default_flow_style=False)
+    return configs_dir
+
+
+def run_point(name: str, overrides: dict, sweep_dir: pl.Path, final_stage: str,
+              base_configs: pl.Path = CONFIGS_DIR) -> dict:
+    """
+    Run the pipeline of a point of the grid, in the current process.
+    The configs loaded by the process are replaced by the configs of the point.
+
+    :param name: name of the scenario of the point
+    :param overrides: config overrides of the point
+    :param sweep_dir: directory of the sweep
+    :param final_stage: final stage of the pipelines
+    :param base_configs: directory of the configs to override
+    :return: summary of the run: name, overrides, status, wall time and outputs of the scenario
+    """
+    start = time.perf_counter()
+    summary = {"name": name, "overrides": overrides}
+    try:
+        configs_dir = write_configs(sweep_dir / "configs" / name, overrides=overrides,
+                                    fetch_store=sweep_dir / "fetch_store", base_configs=base_configs)
+        from src.services.config.config_handler import ConfigHandler
+        ConfigHandler.invalidate()
+        ConfigHandler(yaml_directory=configs_dir)
+
+        from src.services.filesystem.scenario import Scenario
+        from src.services.service_provider import ServiceProviderHandler
+        from src.tasks.demand_forecast import DemandForecastPipeline
+
+        scenario = Scenario(input_path=str(sweep_dir), name=name, config=ServiceProviderHandler().config)
+        DemandForecastPipeline(scenario=scenario, begin_stage=scenario.stage, final_stage=final_stage).run()
+        summary.update(status="ok", output=dict(scenario.output))
+    except Exception:  # pylint: disable=broad-except
+        logging.error(f"Scenario {name} failed:\n{traceback.format_exc()}")
+        summary.update(status="failed", output={})
+    summary["wall_time_s"] = round(time.perf_counter() - start, 2)
+    return summary
+
+
+def seed(sweep_dir: pl.Path, base_configs: pl.Path = CONFIGS_DIR) -> None:
+    """
+    Seed the tables of the data warehouse with the base configs, in the current process,
+    so that the points of the grid don't seed them concurrently
+    """
+    configs_dir = write_configs(sweep_dir / "configs" / "seed", overrides={},
+                                fetch_store=sweep_dir / "fetch_store", base_configs=base_configs)
+    from src.services.config.config_handler import ConfigHandler
+    ConfigHandler.invalidate()
+    ConfigHandler(yaml_directory=configs_dir)
+
+    from src.data.mock_data.seed import seed_tables
+    seed_tables()
+
+
+def _run_point(kwargs: dict) -> dict:
+    """Run a point of the grid from its keyword arguments, see run_point"""
+    return run_point(**kwargs)
+
+
+def run_sweep(grid_path: pl.Path, sweep_dir: pl.Path, processes: int, final_stage: str,
+              base_configs: pl.Path = CONFIGS_DIR) -> List[dict]:
+    """
+    Run the pipeline for every point of the grid of a sweep file, in a pool of processes.
+    Each process runs a single point (the config is loaded once by process), the processes are
+    spawned so that they don't inherit the config or the connections of the parent process.
+
+    :param grid_path: path of the sweep file
+    :param sweep_dir: directory of the scenarios of the sweep
+    :param processes: maximum number of pipelines run at the same time
+    :param final_stage: final stage of the pipelines
+    :param base_configs: directory of the configs to override
+    :return: summaries of the runs, in the order of the grid
+    """
+    points = read_grid(grid_path)
+    sweep_dir.mkdir(parents=True, exist_ok=True)
+    kwargs_list = [{"name": f"point_{index:03d}", "overrides": overrides, "sweep_dir": sweep_dir,
+                    "final_stage": final_stage, "base_configs": pl.Path(base_configs).resolve()}
+                   for index, overrides in enumerate(points)]
+    logging.info(f"Running {len(points)} scenarios in {sweep_dir} with {processes} processes")
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=max(1, min(processes, len(points))), maxtasksperchild=1) as pool:
+        pool.apply(seed, kwds={"sweep_dir": sweep_dir, "base_configs": pl.Path(base_configs).resolve()})
+        summaries = pool.map(_run_point, kwargs_list, chunksize=1)
+
+    with open(sweep_dir / SUMMARY, "w") as stream:
+        yaml.safe_dump({"grid": str(grid_path), "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                        "scenarios": summaries}, stream, default_flow_style=False)
+    return summaries
+
+
+def format_summary(summaries: List[dict]) -> str:
+    """Format the summaries of the runs as a table: one row by scenario, with its overrides and outputs"""
+    keys = list(dict.fromkeys(key for summary in summaries for key in summary["overrides"]))
+    header = ["scenario"] + keys + ["status", "time (s)"] + SUMMARY_OUTPUTS
+    rows = [[summary["name"]] + [str(summary["overrides"].get(key)) for key in keys]
+            + [summary["status"], str(summary["wall_time_s"])]
+            + [str(summary["output"].get(output, "")) for output in SUMMARY_OUTPUTS]
+            for summary in summaries]
+    widths = [max(len(row[column]) for row in [header] + rows) for column in range(len(header))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths))
+                     for row in [header] + rows)
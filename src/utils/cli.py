@@ -15,6 +15,7 @@ def cli_set_up() -> ap.ArgumentParser:
         - `-d`, `--scenario`, path of the input scenario, `default=None`,
         - `-n`, `--name`, name of the scenario scenario, `default=None`
         - `-s`, `--final-stage`, final stage of the run, `default=Stage.PREDICTION_BACKTESTED`
+        - `-p`, `--profile`, profile the operators with cProfile and tracemalloc
 
     :return: Parser object
     """
@@ -29,6 +30,8 @@ def cli_set_up() -> ap.ArgumentParser:
         "-s", "--final-stage", default=Stage.PREDICTION_BACKTESTED,
         choices=Stage.STAGES,
         help='final stage of the pipeline')
+    parser.add_argument("-p", "--profile", action="store_true",
+                        help='profile the operators with cProfile and tracemalloc')
     return parser
 
 
@@ -37,7 +40,7 @@ def cli_read(parser: ap.ArgumentParser):
     Check if the cli arguments are valid then return their value.
 
     :param parser: Parser of the cli set up.
-    :return: scenario path and final_stage
+    :return: scenario path, scenario name, final_stage and whether to profile the operators
     """
 
     args = parser.parse_args()
@@ -54,4 +57,4 @@ def cli_read(parser: ap.ArgumentParser):
             raise AttributeError(f'{final_stage} is not a valid stage .\
              Stages : {list(map(lambda _: _.lower(), Stage.STAGES))}')
 
-    return args.scenario, args.name, final_stage
+    return args.scenario, args.name, final_stage, args.profile
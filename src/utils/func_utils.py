@@ -35,10 +35,10 @@ def filter_target(data: pd.DataFrame, level) -> pd.DataFrame:
     )
 
     # Aggregating at product level
-    df = data.groupby([Fields.PRODUCT_ID], as_index=False)[
-        SERVICE.config.demand_forecast.target].agg("sum")
+    target = SERVICE.snapshot.target
+    df = data.groupby([Fields.PRODUCT_ID], as_index=False)[target].agg("sum")
     bad_products = list(
-        df.loc[df[SERVICE.config.demand_forecast.target] < level][Fields.PRODUCT_ID]
+        df.loc[df[target] < level][Fields.PRODUCT_ID]
     )
     SERVICE.log.info(
         f"Dropping {len(bad_products)} products : {bad_products}")
@@ -88,8 +88,8 @@ def get_init_column(data_granularity: dict, all: bool = False) -> list:
     """
     from src.demand_forecast.processing.feature_engineering import Agg
     index_init_column = []
+    granularity = SERVICE.snapshot.granularity
     for gran, data_gran in data_granularity.items():
-        granularity = SERVICE.config.demand_forecast.granularity
         for value in data_gran.values():
             if granularity[gran]['value'] is not None or all:
                 if isinstance(value, Agg):
@@ -99,6 +99,36 @@ def get_init_column(data_granularity: dict, all: bool = False) -> list:
     return index_init_column
 
 
+def get_data_types(data_name: str = None) -> dict:
+    """
+    Get the types of the raw data from type.yml
+    :param data_name: name of the data (i.e transactions), if None all the types are returned
+    :return: dictionary with column: type, empty if the data has no type defined
+    """
+    with open(pl.Path(__file__).resolve().parents[1] / "data" / "data_fetch" / "type.yml") as f:
+        data_type = yaml.load(f, Loader=yaml.SafeLoader)
+    if data_name is None:
+        return data_type
+    return data_type.get(data_name) or {}
+
+
+def apply_types(df: pd.DataFrame, types: dict) -> pd.DataFrame:
+    """
+    Cast the columns of a DataFrame with the types from type.yml
+    :param df: input dataframe
+    :param types: dictionary with column: type
+    :return: dataframe with typed columns, columns missing in the dataframe are ignored
+    """
+    for column, type_ in types.items():
+        if column not in df.columns:
+            continue
+        if type_.startswith("datetime"):
+            df[column] = pd.to_datetime(df[column])
+        else:
+            df[column] = df[column].astype(type_)
+    return df
+
+
 def check_type(data_: str):
     """
     Check if a dataframe has a the right type from type.yml
@@ -107,9 +137,7 @@ def check_type(data_: str):
     def test_type_(func):
         def wrapper(*args, **kwargs):
             data = func(*args, **kwargs)
-            with open(pl.Path(__file__).resolve().parents[1] / "data" / "data_fetch" / "type.yml") \
-                    as f:
-                data_type = yaml.load(f, Loader=yaml.SafeLoader)
+            data_type = get_data_types()
             for column in data_type[data_].keys():
                 assert column in data.columns, f"column {column} is not in the data : {data_}"
                 assert data[column].dtype == data_type[data_][
@@ -0,0 +1,76 @@
+"""
+This script contains helpers to run independent tasks concurrently, on the executor of the infra
+config:
+
+    parallel:
+      executor: thread   # thread, process or serial
+      max_workers: 4     # if not set, the number of cores
+"""
+
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List
+
+from src.services.service_provider import ServiceProviderHandler
+
+SERVICE = ServiceProviderHandler()
+
+EXECUTORS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+DEFAULT_EXECUTOR = "thread"
+
+
+def get_parallel_config() -> dict:
+    """
+    Get the executor and the maximum number of workers from the infra config
+
+    :return: dictionary with executor and max_workers
+    """
+    parallel_config = SERVICE.infra_config.get("parallel") or {}
+    return {"executor": parallel_config.get("executor") or DEFAULT_EXECUTOR,
+            "max_workers": parallel_config.get("max_workers") or available_cores()}
+
+
+def available_cores() -> int:
+    """Get the number of cores the process can run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def run_parallel(func: Callable, kwargs_list: List[dict], executor: str = None,
+                 max_workers: int = None) -> list:
+    """
+    Run func for each dictionary of keyword arguments, concurrently.
+    The results are returned in the order of kwargs_list, whatever the order of completion.
+    With a thread executor, the calls are profiled in the current profile record (the records of
+    a process executor are not collected).
+
+    :param func: function to run, it must be picklable with a process executor
+    :param kwargs_list: list of keyword arguments of each call
+    :param executor: thread, process or serial, if None the executor of the infra config
+    :param max_workers: maximum number of workers, if None the one of the infra config
+    :return: list of results
+    """
+    parallel_config = get_parallel_config()
+    executor = executor or parallel_config["executor"]
+    max_workers = min(max_workers or parallel_config["max_workers"], len(kwargs_list))
+
+    if executor == "serial" or max_workers <= 1:
+        return [func(**kwargs) for kwargs in kwargs_list]
+
+    if executor not in EXECUTORS:
+        raise ValueError(f"Executor {executor} unknown, use one of {list(EXECUTORS) + ['serial']}")
+
+    if executor == "thread":
+        func = functools.partial(_run_attached, func, SERVICE.profiler.current())
+
+    with EXECUTORS[executor](max_workers=max_workers) as pool:
+        futures = [pool.submit(func, **kwargs) for kwargs in kwargs_list]
+        return [future.result() for future in futures]
+
+
+def _run_attached(func: Callable, record, **kwargs):
+    """Run func in a thread, its profile records nested in the record of the calling thread"""
+    with SERVICE.profiler.attach(record):
+        return func(**kwargs)
@@ -0,0 +1,34 @@
+"""
+Main script to run the demand forecast pipeline over a grid of config overrides
+
+    python sweep.py --grid configs/sweeps/horizons.yaml --processes 4
+"""
+
+import argparse as ap
+import logging
+import pathlib as pl
+
+from src.tasks.stages import Stage
+from src.tasks.sweep import format_summary, run_sweep
+
+if __name__ == "__main__":
+    # 1. Set the log
+    logging.basicConfig(level=logging.INFO)
+
+    # 2. Set up and read the CLI
+    parser = ap.ArgumentParser(description="Sweep of the Demand Forecast Package")
+    parser.add_argument("-g", "--grid", type=pl.Path, required=True,
+                        help="sweep file giving the values of the config keys to sweep")
+    parser.add_argument("-c", "--configs", type=pl.Path, default=pl.Path("configs"),
+                        help="directory of the configs to override")
+    parser.add_argument("-n", "--name", default="sweep", help="name of the sweep")
+    parser.add_argument("-p", "--processes", type=int, default=2,
+                        help="maximum number of pipelines run at the same time")
+    parser.add_argument("-s", "--final-stage", default=Stage.PREDICTION_BACKTESTED, choices=Stage.STAGES,
+                        help="final stage of the pipelines")
+    args = parser.parse_args()
+
+    # 3. Run the pipelines, then print the outputs of the scenarios
+    summaries = run_sweep(grid_path=args.grid, sweep_dir=pl.Path("./tmp").resolve() / args.name,
+                          processes=args.processes, final_stage=args.final_stage, base_configs=args.configs)
+    print(format_summary(summaries))
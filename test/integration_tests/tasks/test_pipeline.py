@@ -48,3 +48,40 @@ def test_pipeline_run(operator_call):
     n_calls = len(operator_call.mock_calls)
     assert n_calls == 1, f"Operator should be called once, got {n_calls} calls"
     assert pipeline.current_stage == pipeline.final_stage, f"Pipeline should be at its final stage"
+
+
+def test_pipeline_run_dependencies():
+    """Tests that a Pipeline runs Operators after their upstream Operators, with their context"""
+    calls = []
+
+    def python_callable(name):
+        def call(scenario=None, stage=None, context=None):
+            calls.append((name, context))
+            return f"{name}_context"
+        return call
+
+    fetch_training = Operator("fetch_training", final_stage=Stage.STAGES[1],
+                              python_callable=python_callable("fetch_training"), upstream=[])
+    train = Operator("train", final_stage=Stage.STAGES[3], python_callable=python_callable("train"),
+                     upstream=["fetch_training"])
+    fetch_prediction = Operator("fetch_prediction", final_stage=Stage.STAGES[5],
+                                python_callable=python_callable("fetch_prediction"), upstream=[])
+    predict = Operator("predict", final_stage=Stage.STAGES[7], python_callable=python_callable("predict"),
+                       upstream=["train", "fetch_prediction"])
+
+    pipeline = Pipeline(
+        scenario=mock.MagicMock(),
+        begin_stage=Stage.STAGES[0],
+        final_stage=Stage.STAGES[7],
+        operators=[fetch_training, train, fetch_prediction, predict],
+    )
+    pipeline.run(input_context="input_context")
+
+    contexts = dict(calls)
+    names = [name for name, _ in calls]
+    assert len(calls) == 4, f"Each Operator should be called once, got {names}"
+    assert names.index("train") > names.index("fetch_training")
+    assert names[-1] == "predict", "predict should wait for its upstream Operators"
+    assert contexts["fetch_prediction"] == "input_context"
+    assert contexts["predict"] == "fetch_prediction_context", "Context should come from the last upstream"
+    assert pipeline.current_stage == pipeline.final_stage, f"Pipeline should be at its final stage"
@@ -0,0 +1,40 @@
+"""Unit tests for the src.data.data_fetch.cache module"""
+
+import pandas as pd
+
+from src.data.data_fetch.cache import DataCache
+
+
+def _df(nb_rows: int) -> pd.DataFrame:
+    return pd.DataFrame({"value": range(nb_rows)}, dtype="int64")
+
+
+def test_cache_hit_returns_copy():
+    """Tests that cached DataFrames are returned as copies"""
+    cache = DataCache(max_bytes=10 ** 6)
+    assert cache.get("key") is None, "Empty cache should miss"
+
+    cache.put("key", _df(10))
+    df = cache.get("key")
+    df["value"] = 0
+
+    assert cache.get("key")["value"].sum() == sum(range(10)), "Cached DataFrame should not be modified"
+    assert cache.stats["hits"] == 2 and cache.stats["misses"] == 1
+
+
+def test_cache_lru_eviction():
+    """Tests that the least recently used entries are evicted when the cache is full"""
+    nbytes = int(_df(100).memory_usage(index=True, deep=True).sum())
+    cache = DataCache(max_bytes=2 * nbytes)
+
+    cache.put("first", _df(100))
+    cache.put("second", _df(100))
+    cache.get("first")
+    cache.put("third", _df(100))
+
+    assert cache.get("second") is None, "Least recently used entry should be evicted"
+    assert cache.get("first") is not None and cache.get("third") is not None
+    assert cache.evictions == 1 and cache.nbytes == 2 * nbytes
+
+    assert not cache.put("too_big", _df(1000)), "DataFrame bigger than the cache should not be cached"
+    assert not DataCache(max_bytes=0).put("key", _df(10)), "Disabled cache should not cache"
@@ -0,0 +1,81 @@
+"""Unit tests for the src.data.mock_data.seed module"""
+
+import numpy as np
+import pandas as pd
+from box import Box
+
+from src.data.mock_data.seed import generate_transactions, get_seasonality, scale_table
+from src.services.constant.fields import Fields
+
+DATES = pd.date_range(start="2018-12-28", end="2019-01-10")
+
+
+def loop_transactions(products: pd.DataFrame, stores: pd.DataFrame, dates: pd.DatetimeIndex,
+                      seed: int) -> pd.DataFrame:
+    """Transactions drawn by the previous generator, one poisson draw by product and store"""
+    random_state = np.random.RandomState(seed)
+    products = products.assign(poisson_parameter=random_state.uniform(low=0, high=5, size=len(products)))
+
+    transactions = []
+    for product in products.to_dict("records"):
+        for store in stores.to_dict("records"):
+            transactions.append(pd.DataFrame({
+                Fields.PRODUCT_ID: product[Fields.PRODUCT_ID],
+                Fields.STORE_ID: store[Fields.STORE_ID],
+                Fields.DATE: dates.copy(),
+                Fields.NB_SOLD_PIECES: random_state.poisson(lam=product["poisson_parameter"], size=len(dates))
+            }))
+    return pd.concat(transactions, ignore_index=True)
+
+
+def test_generate_transactions():
+    """Tests that the transactions are those of the previous per product and store loop, for the same seed"""
+    products = pd.DataFrame({Fields.PRODUCT_ID: [3, 1, 7, 2, 5]})
+    stores = pd.DataFrame({Fields.STORE_ID: [10, 11, 12]})
+    expected = loop_transactions(products, stores, DATES, seed=42)
+
+    random_state = np.random.RandomState(42)
+    lam = random_state.uniform(low=0, high=5, size=len(products))
+    transactions = generate_transactions(products[Fields.PRODUCT_ID].values, stores[Fields.STORE_ID].values,
+                                         DATES, lam=lam, random_state=random_state)
+    pd.testing.assert_frame_equal(transactions, expected)
+
+    # The draws don't depend on the blocks of products
+    random_state = np.random.RandomState(42)
+    lam = random_state.uniform(low=0, high=5, size=len(products))
+    blocks = [generate_transactions(products[Fields.PRODUCT_ID].values[block], stores[Fields.STORE_ID].values,
+                                    DATES, lam=lam[block], random_state=random_state)
+              for block in (slice(0, 2), slice(2, 4), slice(4, 6))]
+    pd.testing.assert_frame_equal(pd.concat(blocks, ignore_index=True), expected)
+
+
+def test_seasonality():
+    """Tests the seasonality factors of the dates, and that they scale the poisson parameter"""
+    assert get_seasonality(DATES, Box({"weekly": 0, "yearly": None})) is None
+
+    factors = get_seasonality(DATES, Box({"weekly": 0.5, "yearly": 0}))
+    assert factors.shape == (len(DATES),)
+    np.testing.assert_allclose(factors[DATES.dayofweek == 0], 1)
+    np.testing.assert_allclose(factors[DATES.dayofweek == 1], 1 + 0.5 * np.sin(2 * np.pi / 7))
+    yearly = get_seasonality(DATES, Box({"weekly": 0, "yearly": 1}))
+    np.testing.assert_allclose(yearly[DATES.dayofyear == 1], 1 + np.sin(2 * np.pi / 365.25))
+
+    # No sale on the dates with a null factor
+    seasonality = np.where(DATES.dayofweek == 6, 0, 1)
+    transactions = generate_transactions(np.array([1, 2]), np.array([1]), DATES, lam=np.array([4.0, 3.0]),
+                                         random_state=np.random.RandomState(0), seasonality=seasonality)
+    sundays = transactions[Fields.DATE].dt.dayofweek == 6
+    assert (transactions.loc[sundays, Fields.NB_SOLD_PIECES] == 0).all()
+    assert transactions.loc[~sundays, Fields.NB_SOLD_PIECES].sum() > 0
+
+
+def test_scale_table():
+    """Tests that the replicates of a table have new unique ids and names"""
+    stores = pd.DataFrame({Fields.STORE_ID: [1, 2, 3], "city": ["Paris", "Lyon", "Nice"], "country": "France"})
+    assert scale_table(stores, Fields.STORE_ID, "city", None) is stores
+    assert scale_table(stores, Fields.STORE_ID, "city", 1) is stores
+
+    scaled = scale_table(stores, Fields.STORE_ID, "city", 3)
+    assert scaled[Fields.STORE_ID].tolist() == list(range(1, 10))
+    assert scaled["city"].tolist()[:4] == ["Paris", "Lyon", "Nice", "Paris #1"]
+    assert scaled["city"].is_unique and (scaled["country"] == "France").all()
@@ -0,0 +1,107 @@
+"""Unit tests for the src.demand_forecast.processing.data_pipeline module"""
+
+import types
+import unittest.mock as mock
+
+import pandas as pd
+import pytest
+
+from src.data.data_fetch.data import DataProcess
+from src.demand_forecast.processing.data_pipeline import DataPipeline
+from src.demand_forecast.processing.feature_engineering import Map
+
+GRANULARITY = {"products": {"items": ["product_id"], "value": "product_id"},
+               "location": {"items": ["store_id", "country"], "value": None},
+               "time": {"items": ["week", "day"], "value": "week"}}
+LOAD = {"start": "information_horizon", "end": "end_date"}
+
+
+def add_discount(data: pd.DataFrame) -> pd.DataFrame:
+    """Transformer replacing the price by the discounted price"""
+    return data[["product_id"]].assign(discount_price=data["price"] * 0.9)
+
+
+def get_pipeline(tmp_path, features: list) -> DataPipeline:
+    """Get a pipeline of in-memory data indexed by 5 products x 4 weeks"""
+    products = {"products": {"product_id": Map(column="product_id")}}
+    weeks = {"time": {"week": Map(column="week")}}
+    sales = pd.DataFrame({"product_id": [1, 1, 2, 3, 4, 5, 5, 6], "week": [0, 1, 2, 3, 0, 1, 3, 0],
+                          "sales": range(8)})
+    pipeline = DataPipeline(scenario=types.SimpleNamespace(location=tmp_path), context=None,
+                            scope="prediction")
+    pipeline.granularity = GRANULARITY
+    pipeline.input_data = [
+        DataProcess(name="product_index", data_granularity=products, granularity=GRANULARITY,
+                    data=pd.DataFrame({"product_id": [5, 4, 3, 2, 1]})),
+        DataProcess(name="time_index", data_granularity=weeks, granularity=GRANULARITY,
+                    data=pd.DataFrame({"week": range(4)})),
+        DataProcess(name="prices", data_granularity=products, granularity=GRANULARITY,
+                    data=pd.DataFrame({"product_id": range(1, 6), "price": [1.0, 2.0, 3.0, 4.0, 5.0]})),
+        DataProcess(name="sales", data_granularity={**products, **weeks}, granularity=GRANULARITY, data=sales),
+    ]
+    pipeline.pipeline = features
+    pipeline.index = {"data": {
+        "products": DataPipeline.Feature(id="product_index", data_name="product_index", load=LOAD,
+                                         scope=["prediction"]),
+        "time": DataPipeline.Feature(id="time_index", data_name="time_index", load=LOAD, scope=["prediction"]),
+    }, "from": "data"}
+    return pipeline
+
+
+FEATURES = [
+    DataPipeline.Feature(id="discount", data_name="prices", load=LOAD, scope=["prediction"],
+                         transformer={"type": "series", "transformers": [{"transformer": add_discount}]},
+                         depends=["prices"]),
+    DataPipeline.Feature(id="prices", data_name="prices", load=LOAD, scope=["prediction"]),
+    DataPipeline.Feature(id="sales", data_name="sales", load=LOAD, scope=["prediction"], merge={"how": "left"}),
+]
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_run_steps(tmp_path, executor):
+    """Tests that the features processed concurrently are those of the serial run"""
+    with mock.patch("src.utils.parallel.get_parallel_config",
+                    return_value={"executor": "serial", "max_workers": 1}):
+        _, expected = get_pipeline(tmp_path, FEATURES).run(scope="prediction")
+    with mock.patch("src.utils.parallel.get_parallel_config",
+                    return_value={"executor": executor, "max_workers": 2}):
+        _, df = get_pipeline(tmp_path, FEATURES).run(scope="prediction")
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert list(df.columns) == ["product_id", "week", "discount_price", "price", "sales"]
+    assert len(df) == 20 and df["sales"].notnull().sum() == 7
+
+
+def test_run_steps_depends(tmp_path):
+    """Tests that the features are processed after their dependencies, and the cycles raised"""
+    pipeline = get_pipeline(tmp_path, FEATURES)
+    processed = []
+    run_step = pipeline.run_step
+
+    def record_step(feature, **kwargs):
+        processed.append(feature.id)
+        return run_step(feature=feature, **kwargs)
+
+    with mock.patch.object(pipeline, "run_step", side_effect=record_step), \
+            mock.patch("src.utils.parallel.get_parallel_config",
+                       return_value={"executor": "serial", "max_workers": 1}):
+        _, outputs = pipeline.run_steps(features=FEATURES, scope="prediction")
+    assert processed == ["prices", "sales", "discount"]
+    assert list(outputs) == ["prices", "sales", "discount"]
+
+    cyclic = [FEATURES[0]._replace(depends=["sales"]), FEATURES[1],
+              FEATURES[2]._replace(depends=["discount"])]
+    with pytest.raises(ValueError, match="Cyclic dependencies"):
+        pipeline.run_steps(features=cyclic, scope="prediction")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7])
+def test_run_chunks(tmp_path, chunk_size):
+    """Tests that the output chunks concatenated are the output of the whole index"""
+    features = FEATURES[1:] + [FEATURES[2]._replace(id="sales_inner", merge={})]
+    _, expected = get_pipeline(tmp_path, features).run(scope="prediction")
+    _, chunks = get_pipeline(tmp_path, features).run_chunks(scope="prediction", chunk_size=chunk_size)
+    chunks = list(chunks)
+
+    assert len(chunks) == -(-20 // chunk_size) and len(expected) == 7
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
@@ -0,0 +1,49 @@
+"""Unit tests for the src.demand_forecast.ml_model.demand_ml_model module"""
+
+import unittest.mock as mock
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.demand_forecast.ml_model.demand_ml_model import DemandMLModel
+
+
+def test_time_series_folds():
+    """Tests that the time_series folds are tested on the weeks following their training weeks"""
+    ml_model = DemandMLModel(name="random_forest", params={"n_estimators": 5, "random_state": 0})
+    ml_model.nb_folds, ml_model.cv_splitter = 3, "time_series"
+    weeks = pd.Series(np.repeat(np.arange(8), 4)).sample(frac=1, random_state=0).reset_index(drop=True)
+
+    folds = list(ml_model.split(np.zeros((len(weeks), 1)), dates=weeks))
+    assert len(folds) == 3
+    for train_index, test_index in folds:
+        assert weeks[train_index].max() < weeks[test_index].min()
+        assert set(weeks[test_index]).isdisjoint(weeks[train_index])
+
+
+def cross_validate(executor: str) -> dict:
+    """Cross validate a model on the executor, checking the joblib backend used"""
+    ml_model = DemandMLModel(name="random_forest", params={"n_estimators": 5, "random_state": 0})
+    ml_model.nb_folds, ml_model.cv_splitter = 3, "kfold"
+    features = pd.DataFrame(np.random.RandomState(0).rand(60, 3), columns=["a", "b", "c"])
+    target = features.sum(axis=1)
+
+    with mock.patch("src.demand_forecast.ml_model.demand_ml_model.get_parallel_config",
+                    return_value={"executor": executor, "max_workers": 2}), \
+            mock.patch("joblib.Parallel", wraps=joblib.Parallel) as parallel:
+        metrics = ml_model.cross_validate(features, target)
+    backend = {"serial": "loky", "thread": "threading", "process": "loky"}[executor]
+    assert parallel.call_args[1] == {"n_jobs": 1 if executor == "serial" else 2, "backend": backend}
+    return metrics
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_cross_validate(executor):
+    """Tests that the cross validation gives the metrics of each fold, those of the serial run"""
+    metrics = cross_validate(executor)
+    assert [fold["fold"] for fold in metrics["folds"]] == [1, 2, 3]
+    assert sum(fold["test_size"] for fold in metrics["folds"]) == 60
+    assert metrics["Smape"] == np.mean([fold["smape"] for fold in metrics["folds"]])
+    assert metrics["Smape"] == cross_validate("serial")["Smape"]
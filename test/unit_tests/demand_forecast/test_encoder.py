@@ -0,0 +1,27 @@
+"""Unit tests for the src.demand_forecast.processing.encoder module"""
+
+import numpy as np
+import pandas as pd
+
+from src.demand_forecast.processing.encoder import CategoricalEncoder
+
+
+def test_categorical_encoder():
+    """Tests that the one-hot columns are those of pd.get_dummies, unseen categories being zeros"""
+    train = pd.DataFrame({"product_id": [1, 2, 3], "color": ["Red", "Light Blue", np.nan],
+                          "size": pd.Categorical(["S", "M", "S"], categories=["S", "M", "L"])})
+    encoder = CategoricalEncoder.fit(train)
+    encoded = encoder.encode(train)
+    assert list(encoded.columns) == ["product_id", "color_LightBlue", "color_Red", "size_S", "size_M", "size_L"]
+    np.testing.assert_array_equal(encoded.iloc[:, 1:].to_numpy(), [[0, 1, 1, 0, 0], [1, 0, 0, 1, 0],
+                                                                    [0, 0, 1, 0, 0]])
+
+    pred = pd.DataFrame({"product_id": [4, 5], "color": ["Green", "Light Blue"], "size": ["L", "XL"]})
+    expected = [[4, 0, 0, 0, 0, 1], [5, 1, 0, 0, 0, 0]]
+    np.testing.assert_array_equal(encoder.encode(pred).to_numpy(), expected)
+    np.testing.assert_array_equal(encoder.transform(pred, sparse=True).toarray(), np.array(expected)[:, 1:])
+
+    # Names of the get_dummies columns saved by the previous versions
+    legacy = CategoricalEncoder.from_dict({"color": ["color_Light Blue", "color_Red"],
+                                           "size": ["size_S", "size_M", "size_L"]})
+    assert legacy.encode(pred).equals(encoder.encode(pred))
@@ -0,0 +1,21 @@
+"""Unit tests for the src.demand_forecast.processing.feature_engineering module"""
+
+import numpy as np
+import pandas as pd
+
+from src.demand_forecast.processing.feature_engineering import FeatureEng
+
+
+def test_pivot_with_totals():
+    """Tests that the single pass pivot is the merge of pivot_values and agg_value"""
+    random = np.random.RandomState(0)
+    data = pd.DataFrame({"product_id": random.randint(1, 20, 500), "week_id": random.randint(-7, 1, 500),
+                         "nb_sold_pieces": random.poisson(5, 500)})
+    for agg in ("sum", "count"):
+        expected = pd.merge(
+            FeatureEng.pivot_values(data, index=["product_id", "week_id"], col=["nb_sold_pieces"], agg=agg),
+            FeatureEng.agg_value(data, index=["product_id"], col=["nb_sold_pieces"], agg=agg), on="product_id")
+        df = FeatureEng.pivot_with_totals(data, index=["product_id", "week_id"], col=["nb_sold_pieces"], agg=agg)
+        pd.testing.assert_frame_equal(df, expected)
+    assert list(df.columns) == ["product_id"] + [f"nb_sold_pieces_{week}" for week in range(-7, 1)] \
+        + ["nb_sold_pieces_count"]
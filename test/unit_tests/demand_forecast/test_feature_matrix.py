@@ -0,0 +1,22 @@
+"""Unit tests for the src.demand_forecast.ml_model.feature_matrix module"""
+
+import numpy as np
+import pandas as pd
+
+from src.demand_forecast.ml_model.feature_matrix import compact_dtypes, to_matrix
+
+
+def test_compact_feature_matrix():
+    """Tests that the features are downcast and converted to the same float32 matrices"""
+    df = pd.DataFrame({"week_id": [201901, 201902, 201903], "color_Red": [True, False, True],
+                       "one_hot": [0, 1, 0], "price": [1.5, 2.0, 0.0]})
+    compact = compact_dtypes(df)
+    assert compact.dtypes.to_dict() == {"week_id": np.int32, "color_Red": np.uint8, "one_hot": np.uint8,
+                                        "price": np.float32}
+
+    dense = to_matrix(compact)
+    assert dense.dtype == np.float32 and dense.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(dense, df.to_numpy(dtype=np.float32))
+    sparse = to_matrix(compact, matrix_format="sparse")
+    assert sparse.format == "csr" and sparse.nnz == np.count_nonzero(dense)
+    np.testing.assert_array_equal(sparse.toarray(), dense)
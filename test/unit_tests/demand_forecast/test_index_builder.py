@@ -0,0 +1,22 @@
+"""Unit tests for the src.demand_forecast.processing.index_builder module"""
+
+from functools import reduce
+
+import pandas as pd
+
+from src.demand_forecast.processing.index_builder import IndexBuilder
+
+
+def test_index_builder():
+    """Tests that the index is the cross merge of the DataFrames, whole or by chunks"""
+    frames = [pd.DataFrame({"product_id": [7, 3, 5]}, index=[4, 5, 6]), pd.DataFrame({"store_id": [2, 1]}),
+              pd.DataFrame({"week_id": [-1, 0, 1, 2]})]
+    expected = reduce(lambda left, right: left.assign(key=1).merge(right.assign(key=1), on="key").drop(
+        columns=["key"]), frames)
+
+    builder = IndexBuilder(frames=frames)
+    assert len(builder) == 24 and builder.columns == ["product_id", "store_id", "week_id"]
+    pd.testing.assert_frame_equal(builder.build(), expected)
+    chunks = list(builder.chunks(chunk_size=5))
+    assert [len(chunk) for chunk in chunks] == [5, 5, 5, 5, 4]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
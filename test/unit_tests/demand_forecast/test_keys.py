@@ -0,0 +1,33 @@
+"""Unit tests for the src.demand_forecast.processing.keys module"""
+
+import numpy as np
+import pandas as pd
+
+from src.demand_forecast.processing.keys import KeyEncoder, group_by_keys
+
+
+def test_key_encoder_join():
+    """Tests that the joins on the encoded keys are the merges on the values"""
+    random = np.random.RandomState(0)
+    index = pd.DataFrame({"product_id": random.choice([3, 11, 42, 57], 200),
+                          "week_id": random.randint(-7, 1, 200)})
+    products = pd.DataFrame({"product_id": [57, 3, 11, 99], "price": [1.5, 2.0, 3.5, 4.0]})
+    sales = pd.DataFrame({"product_id": np.repeat([3, 11, 42], 4), "week_id": np.tile([-7, -3, -1, 0], 3),
+                          "nb_sold_pieces": np.arange(12)})
+
+    keys = KeyEncoder.fit(index, keys=["product_id", "week_id"])
+    encoded = keys.encode(index)
+    assert encoded["product_id"].dtype == np.int32 and keys.decode(encoded).equals(index)
+    for right, on in ((products, ["product_id"]), (sales, ["week_id", "product_id"])):
+        for how in ("inner", "left"):
+            joined = keys.join(encoded, keys.encode(right, keys=on, drop_unknown=True), on=on, how=how)
+            pd.testing.assert_frame_equal(keys.decode(joined), index.merge(right, on=on, how=how))
+
+
+def test_group_by_keys():
+    """Tests that the group-by on the combined codes is the group-by on the keys"""
+    df = pd.DataFrame({"product_id": [2, 1, 2, 1, np.nan], "week_id": [0, -1, 0, 0, 0],
+                       "nb_sold_pieces": [1, 2, 3, 4, 5]})
+    pd.testing.assert_frame_equal(group_by_keys(df, keys=["product_id", "week_id"], columns=["nb_sold_pieces"],
+                                                agg="sum"),
+                                  df.groupby(["product_id", "week_id"], as_index=False)[["nb_sold_pieces"]].sum())
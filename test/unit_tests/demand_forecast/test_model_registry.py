@@ -0,0 +1,93 @@
+"""Unit tests for the src.demand_forecast.ml_model.models.model module"""
+
+import io
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from box import Box
+
+from src.demand_forecast.demand_forecast import DemandForecast
+from src.demand_forecast.ml_model.demand_ml_model import DemandMLModel
+from src.demand_forecast.ml_model.models.model import MetaModel, ModelUnpickler
+from src.services.filesystem.scenario import Scenario
+from src.tasks.stages import Stage
+from src.utils.parallel import available_cores
+
+
+def test_registered_models():
+    """Tests that the models of the package are loaded by name, with their threads parameter"""
+    model = MetaModel.get("random_forest")
+    assert model is MetaModel.random_forest, "The model should be loaded once"
+    assert model.__module_name__ == "random_forest"
+    assert MetaModel.threads_param(model) == "n_jobs"
+    assert MetaModel.threads_param(MetaModel.get("hist_gb")) is None
+
+    with pytest.raises(ValueError):
+        MetaModel.get("unknown_model")
+
+
+def test_plugged_model():
+    """Tests that a model is plugged by its entry point, and its threads set by the DemandMLModel"""
+    ml_model = DemandMLModel(name="knn", params={"n_neighbors": 2},
+                             entry_point="sklearn.neighbors:KNeighborsRegressor", n_threads=3)
+    assert "knn" in MetaModel.names()
+    assert ml_model.threads_param == "n_jobs"
+    assert ml_model.model.get_params()["n_jobs"] == 3
+
+    ml_model = DemandMLModel(name="random_forest", params={"n_jobs": 1}, n_threads=3)
+    assert ml_model.model.n_jobs == 1, "The threads set in the params should be kept"
+
+
+class RequiredArgsModel:
+    """Model whose constructor requires arguments"""
+
+    def __init__(self, alpha, nthread=1):
+        self.alpha = alpha
+        self.nthread = nthread
+
+
+def test_threads_param_signature():
+    """Tests that the threads parameter is found without instantiating the model"""
+    assert MetaModel.threads_param(RequiredArgsModel) == "nthread"
+
+
+def test_legacy_pickle():
+    """Tests that the models pickled when they were defined in the model module are loaded"""
+    model = MetaModel.get("random_forest")(n_estimators=3)
+    data = pickle.dumps(model, protocol=2).replace(
+        f"{model.__class__.__module__}\nRandomForestDemandModel".encode(),
+        b"src.demand_forecast.ml_model.models.model\nRandomForestDemandModel")
+
+    with pytest.raises(AttributeError):
+        pickle.loads(data)
+    loaded = ModelUnpickler(io.BytesIO(data)).load()
+    assert type(loaded) is type(model) and loaded.n_estimators == 3
+
+
+def test_legacy_demand_forecast(tmp_path):
+    """Tests that a DemandForecast pickled by the previous versions is loaded and predicts"""
+    features = pd.DataFrame(np.random.RandomState(0).rand(30, 2), columns=["price", "week"])
+    ml_model = DemandMLModel(name="random_forest", params={"n_estimators": 3, "random_state": 0})
+    ml_model.fit(features, features.sum(axis=1))
+    expected = ml_model.predict(features)
+
+    # State of the models pickled before the matrix format, the threads and the cv splitter
+    for attribute in ("matrix_format", "model_cls", "n_threads", "threads_param", "cv_splitter", "cv_metrics"):
+        delattr(ml_model, attribute)
+    demand = DemandForecast.__new__(DemandForecast)
+    demand.__dict__.update(params=None, trained_data={}, ml_model=ml_model, granularity=None)
+
+    scenario = Scenario(input_path=str(tmp_path), name="scenario", config=Box({"run_param": {}}))
+    dst = scenario.relpath(path=scenario.DEMAND_MODEL, stage=Stage.TRAINING_TRAINED)
+    dst.parent.mkdir(parents=True)
+    dst.write_bytes(pickle.dumps(demand, protocol=2).replace(
+        f"{ml_model.model.__class__.__module__}\nRandomForestDemandModel".encode(),
+        b"src.demand_forecast.ml_model.models.model\nRandomForestDemandModel"))
+
+    loaded = DemandForecast.load_cls(context=None, scenario=scenario).ml_model
+    assert loaded.matrix_format == "dense" and loaded.cv_splitter == "kfold" and loaded.cv_metrics is None
+    assert loaded.model_cls is type(loaded.model) and loaded.threads_param == "n_jobs"
+    assert loaded.n_threads == available_cores()
+    np.testing.assert_array_equal(loaded.predict(features), expected)
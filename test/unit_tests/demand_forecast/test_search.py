@@ -0,0 +1,25 @@
+"""Unit tests for the src.demand_forecast.ml_model.search module"""
+
+import numpy as np
+import pandas as pd
+
+from src.demand_forecast.ml_model.demand_ml_model import DemandMLModel
+from src.demand_forecast.ml_model.search import HyperparameterSearch
+
+
+def test_halving_search():
+    """Tests that the halving search stops the worst trials and returns the best parameters"""
+    ml_model = DemandMLModel(name="random_forest", params={"n_estimators": 5, "random_state": 0})
+    ml_model.cv_splitter = "kfold"
+    search = HyperparameterSearch(ml_model=ml_model, method="halving", n_trials=9, factor=3, n_folds=5,
+                                  space={"max_depth": [1, 2, 3, 4, 5, 6, 7, 8, 9]}, random_state=0)
+    assert search.rungs() == [1, 3, 5]
+
+    features = pd.DataFrame(np.random.RandomState(0).rand(60, 3), columns=["a", "b", "c"])
+    result = search.run(features, features.sum(axis=1))
+    trials = result["trials"]
+    assert len(trials) == 9
+    assert [trial["status"] for trial in trials].count("completed") == 1
+    best = next(trial for trial in trials if trial["status"] == "completed")
+    assert len(best["folds"]) == 5 and best["params"] == result["best_params"]
+    assert all(len(trial["folds"]) < 5 for trial in trials if trial is not best)
@@ -0,0 +1,61 @@
+"""Unit tests for the src.services.config.config_handler module"""
+
+import datetime
+import pickle
+
+import pytest
+import yaml
+
+from src.services.config.config_handler import ConfigHandler, ConfigSnapshot, apply_overrides
+from src.services.service_provider import CONFIGS_DIR, ServiceProviderHandler
+
+SERVICE = ServiceProviderHandler()
+
+
+def test_config_cached_until_override(tmp_path):
+    """Tests that the config is cached, and replaced while it is overridden"""
+    config = SERVICE.config
+    assert SERVICE.config is config, "The config should be cached"
+    snapshot = SERVICE.snapshot
+    assert isinstance(snapshot, ConfigSnapshot) and SERVICE.snapshot is snapshot
+    with pytest.raises(AttributeError):
+        snapshot.target = "other"
+
+    with open(CONFIGS_DIR / "model_config.yaml", "r") as stream:
+        model_config = yaml.safe_load(stream)
+    model_config["demand_forecast"]["target"] = "other_target"
+    with open(tmp_path / "model_config.yaml", "w") as stream:
+        yaml.safe_dump(model_config, stream)
+
+    with ConfigHandler.override(model_config=tmp_path / "model_config.yaml"):
+        assert SERVICE.config.demand_forecast.target == "other_target"
+        assert SERVICE.snapshot.target == "other_target"
+    assert SERVICE.config is config, "The config should be restored"
+    assert SERVICE.snapshot.target == snapshot.target
+
+
+def test_config_snapshot_read_only():
+    """Tests that the values of the snapshot are read-only copies of the config"""
+    snapshot = SERVICE.snapshot
+    features = SERVICE.config.demand_forecast.features
+    assert dict(snapshot.features) == {key: tuple(value) for key, value in features.items()}
+    assert snapshot.prediction_context.location.value == (1, 2, 3)
+    with pytest.raises(AttributeError):
+        snapshot.features.products = ["other"]
+    with pytest.raises(TypeError):
+        snapshot.granularity["products"]["value"] = "other"
+    with pytest.raises(AttributeError):
+        snapshot.features.products.append("other")
+    assert pickle.loads(pickle.dumps(snapshot.training_context)) == snapshot.training_context
+
+
+def test_apply_overrides():
+    """Tests that the overrides replace the values of the dotted keys only"""
+    config = {"run_info": {"information_horizon": datetime.date(2019, 5, 30), "run_mode": "backtest"}}
+
+    overridden = apply_overrides(config, {"run_info.information_horizon": datetime.date(2019, 5, 2)})
+    assert overridden["run_info"] == {"information_horizon": datetime.date(2019, 5, 2), "run_mode": "backtest"}
+    assert config["run_info"]["information_horizon"] == datetime.date(2019, 5, 30), "The config should be copied"
+
+    with pytest.raises(KeyError):
+        apply_overrides(config, {"run_info.unknown": 1})
@@ -0,0 +1,96 @@
+"""Unit tests for the src.services.db.db_handler module"""
+
+import logging
+from unittest import mock
+
+import pandas as pd
+import pytest
+from box import Box
+from sqlalchemy import create_engine
+
+from src.services.db.db_handler import DbHandler
+from src.services.filesystem.filesystem_handler import FileSystemHandler
+
+
+def _infra_config(url: str) -> mock.Mock:
+    return mock.Mock(infra_config=Box({"db": {"url": url, "pool": {"recycle": 60}}}))
+
+
+def test_engine_created_once_by_process():
+    """Tests that the DbHandlers of a process share a single pooled engine"""
+    DbHandler.dispose_engines()
+    with mock.patch("src.services.db.db_handler.ConfigHandler",
+                    return_value=_infra_config("sqlite://")), \
+            mock.patch("sqlalchemy.create_engine", wraps=create_engine) as engine_factory:
+        handlers = [DbHandler() for _ in range(5)]
+        handlers[0].execute("CREATE TABLE products (product_id INTEGER)")
+        handlers[1].execute("INSERT INTO products VALUES (1)")
+
+        assert engine_factory.call_count == 1, "The engine should be created once"
+        assert all(handler._engine is handlers[0]._engine for handler in handlers)
+        assert handlers[2].read("SELECT * FROM products").product_id.tolist() == [1]
+        assert handlers[3].pool_status()["pool"] == handlers[0]._engine.pool.__class__.__name__
+    DbHandler.dispose_engines()
+
+
+def test_execute_logs_statements(caplog):
+    """Tests that the executed statements and the errors are logged, and a failed statement rolled back"""
+    DbHandler.dispose_engines()
+    with mock.patch("src.services.db.db_handler.ConfigHandler", return_value=_infra_config("sqlite://")):
+        handler = DbHandler()
+        with caplog.at_level(logging.DEBUG, logger="src.services.service_provider"):
+            handler.execute("CREATE TABLE products (product_id INTEGER)")
+            handler.execute("INSERT INTO missing_table VALUES (1)")
+
+        assert [record.levelname for record in caplog.records] == ["DEBUG", "ERROR"]
+        assert caplog.records[0].getMessage() == "CREATE TABLE products (product_id INTEGER)"
+        assert "missing_table" in caplog.records[1].getMessage() and caplog.records[1].exc_info
+        assert handler.read("SELECT * FROM products").empty
+    DbHandler.dispose_engines()
+
+
+def test_bulk_write(tmp_path):
+    """Tests that bulk writing a DataFrame by chunks, replaced then appended, gives the table of `write`"""
+    df = pd.DataFrame({"product_id": range(25), "price": [i / 4 for i in range(25)],
+                       "name": [f"product {i}" for i in range(25)]})
+    DbHandler.dispose_engines()
+    with mock.patch("src.services.db.db_handler.ConfigHandler",
+                    return_value=_infra_config(f"sqlite:///{tmp_path / 'db.sqlite'}")):
+        handler = DbHandler()
+        handler.write(df, "expected", index=False)
+        handler.bulk_write(df.iloc[:10], "products", chunksize=3)
+        handler.bulk_write(df.iloc[:10], "products", chunksize=3)
+        handler.bulk_write(df.iloc[10:], "products", if_exists="append", chunksize=4)
+
+        pd.testing.assert_frame_equal(handler.read("SELECT * FROM products"), handler.read("SELECT * FROM expected"))
+        assert handler.read("SELECT * FROM products").product_id.tolist() == list(range(25))
+    DbHandler.dispose_engines()
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_read_chunks_written(tmp_path, fmt):
+    """Tests that a query streamed to a file by small chunks gives the file of a single read and write"""
+    df = pd.DataFrame({"product_id": range(25), "price": [i / 4 for i in range(25)],
+                       "name": [f"product {i}" for i in range(25)]})
+    fs = FileSystemHandler()
+    DbHandler.dispose_engines()
+    with mock.patch("src.services.db.db_handler.ConfigHandler",
+                    return_value=_infra_config(f"sqlite:///{tmp_path / 'db.sqlite'}")):
+        handler = DbHandler()
+        handler.write(df, "products", index=False)
+        sql = "SELECT * FROM products ORDER BY product_id"
+
+        fs.write(handler.read(sql), tmp_path / f"expected.{fmt}", fmt=fmt, index=False)
+        assert fs.write_chunks(handler.read_chunks(sql, chunksize=4), tmp_path / f"chunks.{fmt}", fmt=fmt,
+                               index=False) == 25
+        if fmt == "csv":
+            assert (tmp_path / "chunks.csv").read_bytes() == (tmp_path / "expected.csv").read_bytes()
+        expected = fs.read(tmp_path / f"expected.{fmt}", fmt=fmt)
+        pd.testing.assert_frame_equal(fs.read(tmp_path / f"chunks.{fmt}", fmt=fmt), expected)
+        pd.testing.assert_frame_equal(expected, df)
+
+        # A query without rows gives a file with the columns only
+        empty = handler.read_chunks("SELECT * FROM products WHERE price < 0", chunksize=4)
+        assert fs.write_chunks(empty, tmp_path / f"empty.{fmt}", fmt=fmt, index=False) == 0
+        assert list(fs.read(tmp_path / f"empty.{fmt}", fmt=fmt).columns) == list(df.columns)
+    DbHandler.dispose_engines()
@@ -0,0 +1,23 @@
+"""Unit tests for the src.services.filesystem.filesystem_handler module"""
+
+import pandas as pd
+import pytest
+
+from src.services.filesystem.filesystem_handler import FileSystemHandler
+
+
+def test_write_chunks_many(tmp_path):
+    """Tests that the chunks of each tuple are appended to their file, and the errors raised"""
+    chunks = ((pd.DataFrame({"a": [3 * index, 3 * index + 1, 3 * index + 2]}), pd.DataFrame({"b": [index]}))
+              for index in range(4))
+    dsts = [tmp_path / "a.csv", tmp_path / "b.csv"]
+    assert FileSystemHandler().write_chunks_many(chunks, dsts, fmt="csv", index=False) == [12, 4]
+    assert pd.read_csv(dsts[0])["a"].tolist() == list(range(12))
+    assert pd.read_csv(dsts[1])["b"].tolist() == list(range(4))
+
+    def failing_chunks():
+        yield pd.DataFrame({"a": [0]}), pd.DataFrame({"b": [0]})
+        raise RuntimeError("chunk failed")
+
+    with pytest.raises(RuntimeError, match="chunk failed"):
+        FileSystemHandler().write_chunks_many(failing_chunks(), dsts, fmt="csv", index=False)
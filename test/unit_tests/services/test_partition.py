@@ -0,0 +1,99 @@
+"""Unit tests for the src.services.filesystem.partition module"""
+
+import pandas as pd
+
+from src.services.filesystem.partition import PartitionedData
+
+FILTERS = {"store_id": [1, 2]}
+
+
+def write_csv(df, dst, **kwargs):
+    """Write a partition"""
+    df.to_csv(dst, index=False)
+
+
+def read_csv(src, columns=None, filters=None, **kwargs):
+    """Read a partition, filtered by date"""
+    df = pd.read_csv(src, parse_dates=["date"], usecols=columns)
+    for column, op, value in filters or []:
+        df = df[df[column] >= value] if op == ">=" else df[df[column] <= value]
+    return df.reset_index(drop=True)
+
+
+def get_data(start, end):
+    """Get one transaction by day between two dates"""
+    dates = pd.date_range(start, end, freq="D")
+    return pd.DataFrame({"date": dates, "nb_sold_pieces": range(len(dates))})
+
+
+def fetch(partitions, start, end, filters=FILTERS, freq="week"):
+    """Fetch the missing ranges in the partitions, as DataProcess.fetch_partitions"""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    ranges = partitions.missing_ranges(start=start, end=end, freq=freq, filters=filters)
+    for range_start, range_end in ranges:
+        data = get_data(range_start, range_end)
+        partitions.write(data, start=range_start, end=range_end, column="date", freq=freq,
+                         write=write_csv, read=read_csv)
+        partitions.update_watermark(start=range_start, end=range_end, column="date", freq=freq,
+                                    filters=filters, max_date=data["date"].max())
+    return ranges
+
+
+def test_missing_ranges(tmp_path):
+    """Tests that moving the horizon by one week only fetches the new week"""
+    partitions = PartitionedData(tmp_path / "transactions.csv", fmt="csv")
+    assert fetch(partitions, "2020-01-06", "2020-01-26") == [(pd.Timestamp("2020-01-06"),
+                                                              pd.Timestamp("2020-01-26"))]
+    assert [path.stem for path in partitions.partitions()] == ["2020-01-06", "2020-01-13", "2020-01-20"]
+
+    # The last day covered is fetched again with the new week
+    assert fetch(partitions, "2020-01-13", "2020-02-02") == [(pd.Timestamp("2020-01-26"),
+                                                              pd.Timestamp("2020-02-02"))]
+    assert partitions.watermark["low"] == "2020-01-06"
+    assert partitions.watermark["high"] == "2020-02-02"
+    assert fetch(partitions, "2020-01-13", "2020-02-02") == [(pd.Timestamp("2020-02-02"),
+                                                              pd.Timestamp("2020-02-02"))]
+
+    data = partitions.read(read_csv)
+    assert data["date"].tolist() == list(pd.date_range("2020-01-06", "2020-02-02", freq="D"))
+
+
+def test_missing_ranges_reset(tmp_path):
+    """Tests that the partitions are fetched again when the filters or the frequency change"""
+    partitions = PartitionedData(tmp_path / "transactions.csv", fmt="csv")
+    fetch(partitions, "2020-01-06", "2020-01-26")
+
+    whole = [(pd.Timestamp("2020-01-06"), pd.Timestamp("2020-01-26"))]
+    assert partitions.missing_ranges(start=whole[0][0], end=whole[0][1], freq="week",
+                                     filters={"store_id": [1]}) == whole
+    assert partitions.partitions() == [], "The partitions of other filters should be removed"
+
+    fetch(partitions, "2020-01-06", "2020-01-26")
+    assert fetch(partitions, "2020-01-06", "2020-01-26", freq="month") == whole
+    assert [path.stem for path in partitions.partitions()] == ["2020-01-01"]
+
+    # A range which can't be contiguous to the partitions
+    assert fetch(partitions, "2020-03-02", "2020-03-08", freq="month") == [(pd.Timestamp("2020-03-02"),
+                                                                             pd.Timestamp("2020-03-08"))]
+    assert [path.stem for path in partitions.partitions()] == ["2020-03-01"]
+
+
+def test_read_pruning(tmp_path):
+    """Tests that only the partitions of the date filters are read"""
+    partitions = PartitionedData(tmp_path / "transactions.csv", fmt="csv")
+    fetch(partitions, "2020-01-06", "2020-01-26")
+
+    read = []
+
+    def read_partition(src, **kwargs):
+        read.append(src.stem)
+        return read_csv(src, **kwargs)
+
+    filters = [("date", ">=", pd.Timestamp("2020-01-14")), ("date", "<=", pd.Timestamp("2020-01-19"))]
+    data = partitions.read(read_partition, filters=filters)
+    assert read == ["2020-01-13"]
+    assert data["date"].tolist() == list(pd.date_range("2020-01-14", "2020-01-19", freq="D"))
+
+    read.clear()
+    data = partitions.read(read_partition, columns=["date"], filters=[("date", ">=", pd.Timestamp("2020-02-01"))])
+    assert read == ["2020-01-06"] and data.empty and list(data.columns) == ["date"]
@@ -0,0 +1,36 @@
+"""Unit tests for the src.services.profiler.profiler_handler module"""
+
+import threading
+
+import pandas as pd
+
+from src.services.filesystem.filesystem_handler import FileSystemHandler
+from src.services.profiler.profiler_handler import ProfilerHandler
+
+
+def test_profile_nested_records(tmp_path):
+    """Tests that the records are nested, in the same thread and in attached threads, with their measures"""
+    profiler = ProfilerHandler()
+    dst = tmp_path / "data.csv"
+
+    with profiler.profile("pipeline") as pipeline:
+        with profiler.profile("load", rows_in=3) as load:
+            FileSystemHandler().write(pd.DataFrame({"a": [1, 2, 3]}), dst, fmt="csv", index=False)
+            load.rows_out = len(FileSystemHandler().read(dst, fmt="csv"))
+
+        def step():
+            with profiler.attach(pipeline), profiler.profile("step"):
+                pass
+
+        thread = threading.Thread(target=step)
+        thread.start()
+        thread.join()
+
+    assert profiler.current() is None, "The records should be closed"
+    measures = pipeline.to_dict()
+    assert [child["name"] for child in measures["children"]] == ["load", "step"]
+    load_measures = measures["children"][0]
+    assert load_measures["rows_in"] == 3 and load_measures["rows_out"] == 3
+    assert load_measures["bytes_written"] == dst.stat().st_size == load_measures["bytes_read"]
+    assert measures["bytes_read"] == load_measures["bytes_read"], "Bytes should add up to the parent"
+    assert measures["wall_time_s"] >= load_measures["wall_time_s"]
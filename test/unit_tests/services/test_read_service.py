@@ -0,0 +1,76 @@
+"""Unit tests for the src.services.filesystem.read_service module"""
+
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from src.services.filesystem.read_service import DataReadService
+from src.services.filesystem.write_service import DataWriteService
+
+DF = pd.DataFrame({"date": pd.date_range("2020-01-01", periods=20, freq="D"),
+                   "store_id": [1, 2, 3, 4] * 5,
+                   "nb_sold_pieces": range(20)})
+
+FILTERS = [("date", ">=", pd.Timestamp("2020-01-04")), ("date", "<", pd.Timestamp("2020-01-15")),
+           ("store_id", "in", [1, 2])]
+
+
+def write(fmt: str, dst) -> None:
+    """Write DF, in 3 row groups or record batches for the columnar formats"""
+    if fmt == "csv":
+        DataWriteService.csv(DF, dst, index=False)
+    else:
+        getattr(DataWriteService, f"{fmt}_chunks")((DF.iloc[start:start + 7] for start in range(0, 20, 7)), dst)
+
+
+def read(fmt: str, src, **kwargs) -> pd.DataFrame:
+    """Read the file, parsing the dates of the csv when they are read"""
+    if fmt == "csv" and "date" in (DataReadService._filter_columns(kwargs.get("columns"), kwargs.get("filters"))
+                                   or ["date"]):
+        kwargs["parse_dates"] = ["date"]
+    return getattr(DataReadService, fmt)(src, **kwargs)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "feather"])
+def test_read_pushdown(tmp_path, fmt):
+    """Tests that the projection and the filters read the rows and columns of the filtered DataFrame"""
+    src = tmp_path / f"transactions.{fmt}"
+    write(fmt, src)
+    expected = DF[(DF["date"] >= "2020-01-04") & (DF["date"] < "2020-01-15") & DF["store_id"].isin([1, 2])]
+    expected = expected.reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(read(fmt, src), DF)
+    pd.testing.assert_frame_equal(read(fmt, src, filters=FILTERS), expected)
+    pd.testing.assert_frame_equal(read(fmt, src, columns=["date", "nb_sold_pieces"], filters=FILTERS),
+                                  expected[["date", "nb_sold_pieces"]])
+
+    # The filtered columns aren't returned when they aren't requested
+    pd.testing.assert_frame_equal(read(fmt, src, columns=["nb_sold_pieces"], filters=FILTERS),
+                                  expected[["nb_sold_pieces"]])
+
+    empty = read(fmt, src, columns=["store_id", "nb_sold_pieces"], filters=[("store_id", ">", 4)])
+    assert empty.empty and list(empty.columns) == ["store_id", "nb_sold_pieces"]
+
+
+@pytest.mark.parametrize("chunksize", [1, 3, 100])
+def test_read_csv_chunks(tmp_path, chunksize):
+    """Tests that the csv filtered by chunks is the csv filtered at once, whatever the chunk size"""
+    src = tmp_path / "transactions.csv"
+    write("csv", src)
+    expected = DF[DF["store_id"] == 3].reset_index(drop=True)
+
+    df = read("csv", src, filters=[("store_id", "==", 3)], chunksize=chunksize)
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_read_parquet_filters_not_pushed(tmp_path):
+    """Tests that the filters aren't passed to pyarrow, whose legacy reader fails on a single filtered file"""
+    src = tmp_path / "transactions.parquet"
+    write("parquet", src)
+
+    with mock.patch("pandas.read_parquet", wraps=pd.read_parquet) as read_parquet:
+        df = DataReadService.parquet(src, columns=["nb_sold_pieces"], filters=[("store_id", "==", 2)])
+    assert "filters" not in read_parquet.call_args[1]
+    assert read_parquet.call_args[1]["columns"] == ["nb_sold_pieces", "store_id"]
+    assert df["nb_sold_pieces"].tolist() == [1, 5, 9, 13, 17]
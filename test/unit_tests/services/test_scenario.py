@@ -0,0 +1,32 @@
+"""Unit tests for the src.services.filesystem.scenario module"""
+
+import pandas as pd
+import pytest
+from box import Box
+
+from src.services.filesystem.scenario import SERVICE, Scenario
+from src.tasks.stages import Stage
+from src.utils.func_utils import apply_types, get_data_types
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather"])
+def test_data_format_storage(tmp_path, fmt):
+    """Tests that the DataFrame files of a scenario are stored in its data format with their types"""
+    scenario = Scenario(input_path=str(tmp_path), name="scenario", config=Box({"run_param": {"data_format": fmt}}))
+    assert scenario.TRANSACTIONS == f"transactions.{fmt}"
+    assert scenario.format_file(scenario.DEMAND_MODEL, fmt) == scenario.DEMAND_MODEL
+
+    transactions = apply_types(pd.DataFrame({"product_id": ["1", "2", "3"], "store_id": [1.0, 1.0, 2.0],
+                                             "date": ["2020-01-01", "2020-01-02", "2020-01-03"],
+                                             "nb_sold_pieces": [0, 4, 2]}),
+                               get_data_types("transactions"))
+    assert [dtype.kind for dtype in transactions.dtypes] == ["i", "i", "M", "i"]
+
+    dst = scenario.relpath(scenario.TRANSACTIONS, stage=Stage.TRAINING_FETCHED)
+    assert dst == tmp_path / "scenario" / "training" / Stage.TRAINING_FETCHED / f"transactions.{fmt}"
+    SERVICE.fs.write(transactions, dst, fmt=scenario.data_format, index=False)
+
+    # The types are stored in the file schema, without the types of type.yml
+    pd.testing.assert_frame_equal(SERVICE.fs.read(dst, fmt=scenario.data_format), transactions)
+    pd.testing.assert_frame_equal(SERVICE.fs.read(dst, fmt=scenario.data_format, columns=["date"]),
+                                  transactions[["date"]])
@@ -0,0 +1,18 @@
+"""Unit tests of the imports of the src package"""
+
+import pathlib as pl
+import subprocess
+import sys
+
+ROOT_DIR = pl.Path(__file__).resolve().parents[3]
+
+HEAVY_MODULES = ["matplotlib", "sklearn", "xgboost", "git", "sqlalchemy", "jinja2"]
+
+
+def test_pipeline_import_is_lazy():
+    """Tests that importing the pipeline doesn't import the heavy dependencies"""
+    code = ("import sys; import src.tasks.demand_forecast; "
+            f"print(sorted(module for module in {HEAVY_MODULES} if module in sys.modules))")
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=str(ROOT_DIR),
+                                     universal_newlines=True)
+    assert output.strip() == "[]", f"Modules imported by the pipeline: {output}"
@@ -0,0 +1,87 @@
+"""
+Unit tests for the src.tasks.cache module
+"""
+
+import os
+import unittest.mock as mock
+
+from src.tasks.cache import OperatorCache
+from src.tasks.operators import Operator
+from src.tasks.pipeline import Pipeline
+from src.tasks.stages import Stage
+
+
+def get_scenario(location, config):
+    """Get a mock scenario located in a directory"""
+    scenario = mock.MagicMock()
+    scenario.storage_location = location
+    scenario.config.to_dict.return_value = config
+    scenario.output = {}
+    scenario.overrides = {}
+    scenario.update_config.side_effect = scenario.overrides.update
+    return scenario
+
+
+def test_operator_cache(tmp_path):
+    """Tests that a cached Operator is restored in another scenario with the same inputs"""
+    calls = []
+
+    def fetch(scenario=None, stage=None, context=None):
+        path = scenario.storage_location / "training" / Stage.TRAINING_FETCHED / "data.csv"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("a,b\n1,2\n")
+        return context
+
+    def train(scenario=None, stage=None, context=None):
+        calls.append(scenario.storage_location)
+        path = scenario.storage_location / "training" / Stage.TRAINING_TRAINED / "model.pkl"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("model")
+        scenario.output["cross_validation"] = {"Smape": 0.1}
+        scenario.update_config({"model.params": {"alpha": 1}})
+        return context
+
+    def run(name, config):
+        scenario = get_scenario(tmp_path / name, config)
+        pipeline = Pipeline(
+            scenario=scenario,
+            begin_stage=Stage.TRAINING_INIT,
+            final_stage=Stage.TRAINING_TRAINED,
+            operators=[
+                Operator("fetch", final_stage=Stage.TRAINING_FETCHED, python_callable=fetch),
+                Operator("train", final_stage=Stage.TRAINING_TRAINED, python_callable=train,
+                         cache=True, config_keys=["model"]),
+            ],
+        )
+        with mock.patch.object(OperatorCache, "from_config", return_value=OperatorCache(tmp_path / "cache")):
+            pipeline.run()
+        return scenario
+
+    run("first", {"model": {"alpha": 1}, "prediction": "a"})
+    scenario = run("second", {"model": {"alpha": 1}, "prediction": "b"})
+    assert len(calls) == 1, "The Operator should be restored from the cache"
+    restored = scenario.storage_location / "training" / Stage.TRAINING_TRAINED / "model.pkl"
+    assert restored.read_text() == "model", "The outputs should be copied into the scenario"
+    assert scenario.output == {"cross_validation": {"Smape": 0.1}}, "The output should be replayed"
+    assert scenario.overrides == {"model.params": {"alpha": 1}}, "The config overrides should be replayed"
+
+    run("third", {"model": {"alpha": 2}, "prediction": "b"})
+    assert len(calls) == 2, "The Operator should run again when its config changes"
+
+
+def test_operator_cache_prune(tmp_path):
+    """Tests that the least recently used entries are removed above the size of the cache"""
+    cache = OperatorCache(tmp_path / "cache", max_size=2.5)
+    operator = Operator("train", final_stage=Stage.TRAINING_TRAINED, python_callable=None)
+    for time_, key in enumerate(["a" * 64, "b" * 64, "c" * 64]):
+        scenario = get_scenario(tmp_path / key[:1], {})
+        path = scenario.storage_location / "training" / Stage.TRAINING_TRAINED / "model.pkl"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"0" * 1024 ** 2)
+        cache.store(key=key, scenario=scenario, operator=operator, before={})
+        os.utime(cache.entry(key) / OperatorCache.META, (time_, time_))
+        if key[:1] == "b":
+            assert cache.restore(key="a" * 64, scenario=scenario) is not None
+
+    # The entry "a" has been used after the entry "b"
+    assert [key[:1] for key in "abc" if cache.entry(key * 64).exists()] == ["a", "c"]
@@ -0,0 +1,21 @@
+"""
+Unit tests for the src.tasks.sweep module
+"""
+
+import datetime
+
+from src.tasks.sweep import read_grid
+
+
+def test_read_grid(tmp_path):
+    """Tests that the points of a sweep are the combinations of the values of the grid"""
+    grid_path = tmp_path / "sweep.yaml"
+    grid_path.write_text("grid:\n"
+                         "  run_info.information_horizon: [2019-05-02, 2019-05-30]\n"
+                         "  demand_forecast.model.params.n_estimators: [100, 200, 300]\n")
+
+    points = read_grid(grid_path)
+    assert len(points) == 6, f"The grid should have 6 points, got {len(points)}"
+    assert points[0] == {"run_info.information_horizon": datetime.date(2019, 5, 2),
+                         "demand_forecast.model.params.n_estimators": 100}
+